@@ -0,0 +1,180 @@
+"""
+Spatial index of the nodes and edges of a plotted graph, to find the ones under the
+mouse without testing all of them
+
+Every artist is seen as a segment with a reach: a node is a segment of length 0
+reaching its radius, an edge is the segments of its midline reaching half its width.
+The segments are sampled at most one cell apart on a regular grid, and each cell lists
+the items sampled in it. A point within the reach of a segment is at most one cell
+away from one of its samples, so only the 3x3 cells around the point are tested.
+"""
+
+import numpy as np
+from netgraph._artists import EdgeArtist, NodeArtist
+
+
+class SegmentIndex:
+    """Grid of items made of segments
+
+    The grid is built on the first query and rebuilt on the first query after
+    invalidate (call it when items move).
+
+    Parameters
+    ----------
+    get_segments : callable
+        returns the start and end of the segments (two (n, 2) arrays), their reach
+        and the position of the item each one belongs to
+    """
+
+    def __init__(self, get_segments):
+        self.get_segments = get_segments
+        self.stale = True
+        self.last_query = None
+        self.last_hits = None
+
+    def invalidate(self):
+        """Rebuild the grid on the next query"""
+        self.stale = True
+        self.last_query = None
+
+    def _build(self):
+        self.starts, self.ends, self.reaches, self.owners = self.get_segments()
+        self.stale = False
+        n_segments = len(self.owners)
+        if n_segments == 0:
+            self.cell_keys = np.zeros(0, dtype=np.int64)
+            return
+        lengths = np.sqrt(((self.ends - self.starts) ** 2).sum(axis=1))
+        # about a few samples per segment, the cells being at least twice the reach
+        self.cell_size = max(
+            2 * self.reaches.max(), lengths.sum() / (4 * n_segments), 1e-9
+        )
+        points = np.vstack((self.starts, self.ends))
+        self.origin = points.min(axis=0)
+        self.n_rows = int((points[:, 1].max() - self.origin[1]) // self.cell_size) + 1
+
+        n_samples = (
+            np.maximum(np.ceil(lengths / self.cell_size), 1).astype(np.int64) + 1
+        )
+        segment = np.repeat(np.arange(n_segments), n_samples)
+        first = np.cumsum(n_samples) - n_samples
+        fraction = (np.arange(n_samples.sum()) - first[segment]) / (
+            n_samples[segment] - 1
+        )
+        samples = (
+            self.starts[segment]
+            + (self.ends[segment] - self.starts[segment]) * fraction[:, None]
+        )
+        cells = ((samples - self.origin) // self.cell_size).astype(np.int64)
+        keys = cells[:, 0] * self.n_rows + cells[:, 1]
+        # each segment once per cell, sorted by cell
+        pairs = np.unique(np.column_stack((keys, segment)), axis=0)
+        self.cell_keys = pairs[:, 0]
+        self.cell_segments = pairs[:, 1]
+
+    def items_at(self, x, y):
+        """Items containing a point
+
+        Parameters
+        ----------
+        x, y : float
+            coordinates of the point (data coordinates)
+
+        Returns
+        -------
+        numpy.ndarray
+            sorted positions of the items within the reach of the point
+        """
+        if self.stale:
+            self._build()
+        if self.last_query == (x, y):
+            return self.last_hits
+        hits = np.zeros(0, dtype=np.int64)
+        if len(self.cell_keys):
+            column, row = ((np.array([x, y]) - self.origin) // self.cell_size).astype(
+                np.int64
+            )
+            rows = np.arange(max(row - 1, 0), min(row + 2, self.n_rows))
+            keys = (
+                np.arange(column - 1, column + 2)[:, None] * self.n_rows + rows
+            ).ravel()
+            lows = np.searchsorted(self.cell_keys, keys, side="left")
+            highs = np.searchsorted(self.cell_keys, keys, side="right")
+            candidates = np.unique(
+                np.concatenate(
+                    [self.cell_segments[low:high] for low, high in zip(lows, highs)]
+                    + [np.zeros(0, dtype=np.int64)]
+                )
+            ).astype(np.int64)
+            if len(candidates):
+                hits = self._hits(candidates, np.array([x, y]))
+        self.last_query = (x, y)
+        self.last_hits = hits
+        return hits
+
+    def _hits(self, candidates, point):
+        starts = self.starts[candidates]
+        direction = self.ends[candidates] - starts
+        squared_lengths = (direction**2).sum(axis=1)
+        along = ((point - starts) * direction).sum(axis=1) / np.where(
+            squared_lengths > 0, squared_lengths, 1
+        )
+        closest = starts + direction * along.clip(0, 1)[:, None]
+        distances = np.sqrt(((point - closest) ** 2).sum(axis=1))
+        return np.unique(self.owners[candidates[distances <= self.reaches[candidates]]])
+
+
+class ArtistIndex(SegmentIndex):
+    """Grid of node and edge artists
+
+    Parameters
+    ----------
+    artists : iterable
+        node and edge artists, in order of priority when several of them are under
+        the mouse
+    """
+
+    def __init__(self, artists):
+        self.artists = list(artists)
+        super().__init__(self._segments)
+
+    def _segments(self):
+        starts, ends, reaches, owners = [], [], [], []
+        for position, artist in enumerate(self.artists):
+            if isinstance(artist, NodeArtist):
+                points = np.array([artist.xy, artist.xy], dtype=float)
+                reach = artist.radius
+            elif isinstance(artist, EdgeArtist):
+                points = np.asarray(artist.midline, dtype=float)
+                reach = artist.width / 2
+            else:
+                continue
+            if len(points) < 2:
+                points = np.vstack((points, points))
+            starts.append(points[:-1])
+            ends.append(points[1:])
+            reaches.append(np.full(len(points) - 1, reach, dtype=float))
+            owners.append(np.full(len(points) - 1, position))
+        if not starts:
+            return np.zeros((0, 2)), np.zeros((0, 2)), np.zeros(0), np.zeros(0, int)
+        return (
+            np.concatenate(starts),
+            np.concatenate(ends),
+            np.concatenate(reaches),
+            np.concatenate(owners),
+        )
+
+    def artists_at(self, x, y):
+        """Artists containing a point, in order of priority
+
+        Parameters
+        ----------
+        x, y : float
+            coordinates of the point (data coordinates)
+
+        Returns
+        -------
+        list
+            artists within the reach of the point
+        """
+        return [self.artists[position] for position in self.items_at(x, y)]
@@ -0,0 +1,74 @@
+"""
+Compares the size and the load time of the intermediate formats (.json, .ndjson and .npz)
+
+Usage:
+=====
+    python3 -m benchmarks.formats file_name
+
+    file_name: name of the .pcap file used for the comparison
+"""
+
+import os
+import sys
+import tempfile
+from time import time
+
+from from_pcap_to_json import read_fields, read_packets, write_json, write_ndjson
+from main import load_json
+from packet_columns import PacketColumns, write_npz
+
+
+def measure(function, *args):
+    """Time a function
+
+    Returns
+    -------
+    float
+        duration of the call in seconds
+    any
+        result of the call
+    """
+    start = time()
+    result = function(*args)
+    return time() - start, result
+
+
+def load_all(file_name):
+    """Load a file the way main.py does and go through every packet"""
+    if file_name.endswith(".npz"):
+        packets = PacketColumns.load(file_name)
+    else:
+        packets = load_json(file_name)["paquets"]
+    n_packets = 0
+    for _ in packets:
+        n_packets += 1
+    return n_packets
+
+
+if __name__ == "__main__":
+    pcap_file_name = sys.argv[1]
+    with tempfile.TemporaryDirectory() as directory:
+        outputs = {
+            "json": (write_json, read_packets),
+            "ndjson": (write_ndjson, read_packets),
+            "npz": (write_npz, read_fields),
+        }
+        print(
+            "%-8s %12s %12s %14s %14s"
+            % ("format", "size (MB)", "write (s)", "columns (s)", "packets (s)")
+        )
+        for extension, (write, read) in outputs.items():
+            file_name = os.path.join(directory, "data." + extension)
+            write_time, n_packets = measure(write, read(pcap_file_name), file_name)
+            size = os.path.getsize(file_name) / 1e6
+            if extension == "npz":
+                columns_time, _ = measure(PacketColumns.load, file_name)
+                columns_time = "%14.3f" % columns_time
+            else:
+                columns_time = "%14s" % "-"
+            load_time, _ = measure(load_all, file_name)
+            print(
+                "%-8s %12.2f %12.3f %s %14.3f"
+                % (extension, size, write_time, columns_time, load_time)
+            )
+        print(n_packets, "packets")
@@ -0,0 +1,248 @@
+"""
+Writes a reproducible synthetic .pcap file to measure how the scripts scale
+
+The capture is made of one router and of hosts of a local network exchanging packets
+with external servers (through the router) and with each other, over IPv4 and IPv6.
+ARP packets stay in the local network. The same options and seed always give the same
+file.
+
+Usage:
+=====
+    python3 -m benchmarks.generate file_name [--packets N] [--hosts N] [--external N]
+                                   [--ipv6 RATIO] [--arp RATIO] [--ports N] [--seed N]
+
+    file_name: name of the .pcap file to write
+    --packets: number of packets, suffixes k, M and G are allowed (e.g. 10M), by
+        default 1M
+    --hosts: number of hosts of the local network, by default 50
+    --external: number of external IPv4 addresses, and of external IPv6 ones, by
+        default 1000
+    --ipv6: ratio of IPv6 packets, by default 0.1
+    --arp: ratio of ARP packets, by default 0.05
+    --ports: number of distinct client ports used by each host, by default 1000
+    --seed: seed of the random generator, by default 0
+"""
+
+import argparse
+import random
+import socket
+from time import time
+
+import dpkt
+
+ROUTER_MAC = bytes.fromhex("001122334455")
+ROUTER_IPV4 = socket.inet_aton("10.0.0.1")
+BROADCAST_MAC = b"\xff" * 6
+SERVER_PORTS = [80, 443, 53, 22, 123, 993]
+LAN_SERVER_PORTS = [22, 445, 3000]
+FIRST_CLIENT_PORT = 49152
+LAN_RATIO = 0.2
+START_TIME = 1687770000.0
+
+SUFFIXES = {"k": 10**3, "M": 10**6, "G": 10**9}
+
+
+def parse_count(value):
+    """Read a number of packets written with an optional suffix (e.g. '10M')
+
+    Parameters
+    ----------
+    value : str
+        number of packets
+
+    Returns
+    -------
+    int
+        number of packets
+    """
+    if value and value[-1] in SUFFIXES:
+        return int(float(value[:-1]) * SUFFIXES[value[-1]])
+    return int(value)
+
+
+class CaptureGenerator:
+    """Build the packets of a synthetic capture
+
+    Parameters
+    ----------
+    n_hosts : int
+        number of hosts of the local network
+    n_external : int
+        number of external IPv4 addresses, and of external IPv6 ones
+    ipv6_ratio : float
+        ratio of IPv6 packets
+    arp_ratio : float
+        ratio of ARP packets
+    n_ports : int
+        number of distinct client ports used by each host
+    seed : int
+        seed of the random generator
+    """
+
+    def __init__(self, n_hosts, n_external, ipv6_ratio, arp_ratio, n_ports, seed):
+        self.random = random.Random(seed)
+        self.ipv6_ratio = ipv6_ratio
+        self.arp_ratio = arp_ratio
+        self.n_ports = n_ports
+        self.hosts = []
+        for i in range(1, n_hosts + 1):
+            self.hosts.append(
+                (
+                    b"\x02" + i.to_bytes(5, "big"),
+                    (ROUTER_IPV4[0] << 24 | i + 1).to_bytes(4, "big"),
+                    bytes.fromhex("fd00") + bytes(10) + i.to_bytes(4, "big"),
+                )
+            )
+        self.external_ipv4 = [self.public_ipv4() for _ in range(n_external)]
+        self.external_ipv6 = [self.public_ipv6() for _ in range(n_external)]
+
+    def public_ipv4(self):
+        """Draw an IPv4 address outside of the private, loopback and multicast ranges"""
+        while True:
+            first = self.random.randint(1, 223)
+            if first not in (10, 127, 172, 192):
+                return bytes([first]) + self.random.randbytes(3)
+
+    def public_ipv6(self):
+        """Draw a global unicast IPv6 address (2000::/3)"""
+        return bytes([self.random.randint(0x20, 0x3F)]) + self.random.randbytes(15)
+
+    def transport(self, client_port, server_port, inbound):
+        """Build a TCP or UDP segment between a client and a server port"""
+        if inbound:
+            sport, dport = server_port, client_port
+        else:
+            sport, dport = client_port, server_port
+        if server_port in (53, 123):
+            return dpkt.udp.UDP(sport=sport, dport=dport), dpkt.ip.IP_PROTO_UDP
+        return dpkt.tcp.TCP(sport=sport, dport=dport), dpkt.ip.IP_PROTO_TCP
+
+    def ip_packet(self, ipv6, src_ip, dst_ip, segment, protocol):
+        """Build an IPv4 or IPv6 packet around a segment"""
+        if ipv6:
+            ip = dpkt.ip6.IP6(src=src_ip, dst=dst_ip, nxt=protocol, hlim=64)
+            ip.data = segment
+            ip.plen = len(segment)
+            return ip, dpkt.ethernet.ETH_TYPE_IP6
+        ip = dpkt.ip.IP(src=src_ip, dst=dst_ip, p=protocol, data=segment)
+        return ip, dpkt.ethernet.ETH_TYPE_IP
+
+    def frame(self):
+        """Build a random Ethernet frame
+
+        Returns
+        -------
+        bytes
+            the frame
+        """
+        rand = self.random.random()
+        mac, ipv4, ipv6_address = self.random.choice(self.hosts)
+        if rand < self.arp_ratio:
+            arp = dpkt.arp.ARP(sha=mac, spa=ipv4, tha=bytes(6), tpa=ROUTER_IPV4)
+            eth = dpkt.ethernet.Ethernet(
+                src=mac, dst=BROADCAST_MAC, type=dpkt.ethernet.ETH_TYPE_ARP, data=arp
+            )
+            return bytes(eth)
+
+        ipv6 = rand < self.arp_ratio + self.ipv6_ratio
+        if self.random.random() < LAN_RATIO:
+            peer_mac, peer_ipv4, peer_ipv6 = self.random.choice(self.hosts)
+            peer_ip = peer_ipv6 if ipv6 else peer_ipv4
+            server_port = self.random.choice(LAN_SERVER_PORTS)
+        else:
+            peer_mac = ROUTER_MAC
+            peer_ip = self.random.choice(
+                self.external_ipv6 if ipv6 else self.external_ipv4
+            )
+            server_port = self.random.choice(SERVER_PORTS)
+        client_port = FIRST_CLIENT_PORT + self.random.randrange(self.n_ports)
+        inbound = self.random.random() < 0.5
+        segment, protocol = self.transport(client_port, server_port, inbound)
+        host_ip = ipv6_address if ipv6 else ipv4
+        if inbound:
+            ip, eth_type = self.ip_packet(ipv6, peer_ip, host_ip, segment, protocol)
+            eth = dpkt.ethernet.Ethernet(src=peer_mac, dst=mac, type=eth_type, data=ip)
+        else:
+            ip, eth_type = self.ip_packet(ipv6, host_ip, peer_ip, segment, protocol)
+            eth = dpkt.ethernet.Ethernet(src=mac, dst=peer_mac, type=eth_type, data=ip)
+        return bytes(eth)
+
+    def write(self, file_name, n_packets):
+        """Write the capture
+
+        Parameters
+        ----------
+        file_name : str
+            name of the .pcap file
+        n_packets : int
+            number of packets
+        """
+        ts = START_TIME
+        with open(file_name, "wb") as f:
+            writer = dpkt.pcap.Writer(f)
+            for _ in range(n_packets):
+                ts += self.random.random() * 0.002
+                writer.writepkt(self.frame(), ts)
+
+
+def add_arguments(parser):
+    """Add the options of the generator to a parser
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser of the command line
+    """
+    parser.add_argument(
+        "--packets",
+        type=parse_count,
+        default=10**6,
+        help="number of packets (e.g. 1M, 10M, 100M)",
+    )
+    parser.add_argument(
+        "--hosts", type=int, default=50, help="number of hosts of the local network"
+    )
+    parser.add_argument(
+        "--external",
+        type=int,
+        default=1000,
+        help="number of external IPv4 (and IPv6) addresses",
+    )
+    parser.add_argument("--ipv6", type=float, default=0.1, help="ratio of IPv6 packets")
+    parser.add_argument("--arp", type=float, default=0.05, help="ratio of ARP packets")
+    parser.add_argument(
+        "--ports",
+        type=int,
+        default=1000,
+        help="number of distinct client ports used by each host",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the random generator"
+    )
+
+
+def generate(file_name, args):
+    """Write a capture with the options given on the command line
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    args : argparse.Namespace
+        options of the generator (see add_arguments)
+    """
+    generator = CaptureGenerator(
+        args.hosts, args.external, args.ipv6, args.arp, args.ports, args.seed
+    )
+    generator.write(file_name, args.packets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic .pcap file")
+    parser.add_argument("file_name", help="name of the .pcap file to write")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start = time()
+    generate(args.file_name, args)
+    print(args.packets, "packets written in", time() - start, "s")
@@ -0,0 +1,89 @@
+"""
+Compares the lookup of the nodes in a plain list and in a NodeRegistry as the number
+of distinct nodes grows
+
+Each packet endpoint is looked up the way process_data does it: added if it is not
+known yet, then turned into its index.
+
+Usage:
+=====
+    python3 -m benchmarks.nodes [--endpoints N] [--nodes N [N ...]]
+
+    --endpoints: number of endpoints looked up, by default 200000
+    --nodes: numbers of distinct nodes to compare, by default 1000 5000 20000
+"""
+
+import argparse
+import random
+from time import time
+
+from node_registry import NodeRegistry
+
+
+def intern(list_nodes, endpoints):
+    """Look the endpoints up like process_data
+
+    Parameters
+    ----------
+    list_nodes : list
+        identifiers of the nodes
+    endpoints : list
+        identifiers of the endpoints of the packets
+
+    Returns
+    -------
+    float
+        duration in seconds
+    """
+    start = time()
+    for device in endpoints:
+        if device not in list_nodes:
+            list_nodes.append(device)
+        index = list_nodes.index(device)
+    return time() - start
+
+
+def make_endpoints(n_endpoints, n_nodes, seed=0):
+    """Draw endpoints among a number of distinct IPv4 addresses
+
+    Returns
+    -------
+    list
+        identifiers of the endpoints
+    """
+    rand = random.Random(seed)
+    nodes = ["10.%d.%d.%d" % (i >> 16, (i >> 8) & 255, i & 255) for i in range(n_nodes)]
+    # every node appears at least once
+    endpoints = nodes + [rand.choice(nodes) for _ in range(n_endpoints - n_nodes)]
+    rand.shuffle(endpoints)
+    return endpoints
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare node lookups in a list and in a NodeRegistry"
+    )
+    parser.add_argument(
+        "--endpoints",
+        type=int,
+        default=200000,
+        help="number of endpoints looked up",
+    )
+    parser.add_argument(
+        "--nodes",
+        type=int,
+        nargs="+",
+        default=[1000, 5000, 20000],
+        help="numbers of distinct nodes",
+    )
+    args = parser.parse_args()
+
+    print("%-8s %12s %16s %10s" % ("nodes", "list (s)", "registry (s)", "speedup"))
+    for n_nodes in args.nodes:
+        endpoints = make_endpoints(max(args.endpoints, n_nodes), n_nodes)
+        list_time = intern([], endpoints)
+        registry_time = intern(NodeRegistry(), endpoints)
+        print(
+            "%-8d %12.3f %16.3f %10.1f"
+            % (n_nodes, list_time, registry_time, list_time / registry_time)
+        )
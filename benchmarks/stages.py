@@ -0,0 +1,228 @@
+"""
+Measures the wall time, the throughput and the peak memory of each stage on a
+synthetic capture (see generate.py)
+
+Each stage runs in its own process, as it would from the command line, so that its
+peak resident memory can be measured apart from the others.
+
+Usage:
+=====
+    python3 -m benchmarks.stages [--capture file_name] [--stages STAGE [STAGE ...]]
+                                 [--workers N] [--results file_name]
+                                 [generator options, see generate.py]
+
+    --capture: .pcap file to use instead of a generated one
+    --stages: stages to run, by default all of them (ingest-json, ingest-ndjson,
+        ingest-npz, graph-json, graph-ndjson, graph-npz, pipeline)
+    --workers: number of processes decoding the packets, by default 1
+    --results: .csv file where the measures are appended, to track them over time
+"""
+
+import argparse
+import csv
+from datetime import datetime
+import os
+import subprocess
+import sys
+import tempfile
+from time import time
+
+from benchmarks.generate import add_arguments, generate
+from pcap_file import iter_record_headers
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMATS = {"json": [], "ndjson": ["--ndjson"], "npz": ["--npz"]}
+STAGES = [
+    "ingest-json",
+    "ingest-ndjson",
+    "ingest-npz",
+    "graph-json",
+    "graph-ndjson",
+    "graph-npz",
+    "pipeline",
+]
+
+
+def stage_command(stage, capture, directory, workers):
+    """Command line running a stage
+
+    Parameters
+    ----------
+    stage : str
+        name of the stage
+    capture : str
+        name of the .pcap file
+    directory : str
+        directory of the intermediate files
+    workers : int
+        number of processes decoding the packets
+
+    Returns
+    -------
+    list
+        arguments of the command
+    """
+    step, _, data_format = stage.partition("-")
+    data_file = os.path.join(directory, "data." + data_format)
+    if step == "ingest":
+        return [
+            "from_pcap_to_json.py",
+            capture,
+            "-o",
+            data_file,
+            "--workers",
+            str(workers),
+        ] + FORMATS[data_format]
+    if step == "graph":
+        return ["main.py", data_file, os.path.join(directory, "graph")]
+    return [
+        "pcap_to_graph.py",
+        capture,
+        "--workers",
+        str(workers),
+        "--no-cache",
+    ]
+
+
+def run_stage(arguments):
+    """Run a script of the repository in a new process
+
+    Parameters
+    ----------
+    arguments : list
+        name of the script and its arguments
+
+    Returns
+    -------
+    float
+        wall time in seconds
+    float
+        peak resident memory of the process in MB
+
+    Raises
+    ------
+    RuntimeError
+        if the script fails
+    """
+    environment = dict(os.environ, MPLBACKEND="Agg")
+    start = time()
+    process = subprocess.Popen(
+        [sys.executable] + arguments,
+        cwd=REPOSITORY,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time() - start
+    # the process was waited for by os.wait4
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(" ".join(arguments) + " failed")
+    # ru_maxrss is in kB on Linux
+    return wall_time, usage.ru_maxrss / 1024
+
+
+def commit():
+    """Short hash of the commit of the repository, empty if it is unknown"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPOSITORY,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def save_results(file_name, rows):
+    """Append measures to a .csv file, writing the header if it is new
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .csv file
+    rows : list of dicts
+        measures of the stages
+    """
+    new_file = not os.path.exists(file_name)
+    with open(file_name, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure each stage on a synthetic capture"
+    )
+    parser.add_argument("--capture", help=".pcap file used instead of a generated one")
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        default=STAGES,
+        help="stages to run",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes decoding the packets",
+    )
+    parser.add_argument("--results", help=".csv file where the measures are appended")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture = args.capture
+        if capture is None:
+            capture = os.path.join(directory, "capture.pcap")
+            print("Generating", args.packets, "packets...")
+            start = time()
+            generate(capture, args)
+            print("Generated in %.1f s" % (time() - start))
+        capture = os.path.abspath(capture)
+        n_packets = sum(1 for _ in iter_record_headers(capture))
+
+        rows = []
+        date = datetime.now().isoformat(timespec="seconds")
+        print(
+            "%-14s %12s %14s %14s" % ("stage", "wall (s)", "packets/s", "peak RSS (MB)")
+        )
+        for stage in STAGES:
+            if stage not in args.stages:
+                continue
+            step, _, data_format = stage.partition("-")
+            data_file = os.path.join(directory, "data." + data_format)
+            if step == "graph" and not os.path.exists(data_file):
+                run_stage(
+                    stage_command(
+                        "ingest-" + data_format, capture, directory, args.workers
+                    )
+                )
+            wall_time, peak_rss = run_stage(
+                stage_command(stage, capture, directory, args.workers)
+            )
+            print(
+                "%-14s %12.2f %14.0f %14.1f"
+                % (stage, wall_time, n_packets / wall_time, peak_rss)
+            )
+            rows.append(
+                {
+                    "date": date,
+                    "commit": commit(),
+                    "stage": stage,
+                    "packets": n_packets,
+                    "hosts": args.hosts if args.capture is None else "",
+                    "external": args.external if args.capture is None else "",
+                    "workers": args.workers,
+                    "wall_time": round(wall_time, 3),
+                    "packets_per_s": round(n_packets / wall_time),
+                    "peak_rss_mb": round(peak_rss, 1),
+                }
+            )
+        print(n_packets, "packets")
+        if args.results is not None and rows:
+            save_results(args.results, rows)
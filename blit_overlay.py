@@ -0,0 +1,131 @@
+"""
+Hover and click feedback drawn over a cached image of the figure (blitting)
+
+Redrawing the whole graph so that a tooltip appears takes as long as drawing the graph.
+Instead, the image of the figure is saved after each full draw (which only happens
+when zooming, panning or dragging nodes), and the annotations, tables and emphasized
+nodes and edges are drawn over a copy of it.
+
+The emphasis fades everything else with a white rectangle of alpha 0.8 over the axes,
+then draws the emphasized artists again on top: on a white background, an artist
+under the rectangle looks like the artist drawn with a fifth of its alpha.
+
+Drawing a table of a few dozen rows takes about a second, so the pixels of opaque
+artists (the tables) are kept after their first draw and pasted back afterwards, until
+the next full draw.
+"""
+
+from collections import OrderedDict
+
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import Bbox
+
+FADE_ALPHA = 0.8
+# number of opaque artists whose pixels are kept
+RENDERED_CACHE_SIZE = 32
+
+
+class BlitOverlay:
+    """Artists drawn over the saved image of a figure
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        axes of the graph
+    """
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.fig = ax.get_figure()
+        self.blit = self.fig.canvas.supports_blit
+        self.background = None
+        self.artists = []
+        self.opaque = set()
+        self.rendered = OrderedDict()
+        self.emphasized = None
+        self.fade = Rectangle(
+            (0, 0),
+            1,
+            1,
+            transform=ax.transAxes,
+            facecolor="white",
+            edgecolor="none",
+            alpha=FADE_ALPHA,
+            animated=True,
+        )
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add(self, artist, opaque=False):
+        """Draw an artist (annotation, table) over the figure instead of with it
+
+        The pixels of opaque artists (whose bounding box is fully painted, like a
+        table) are only drawn once.
+        """
+        artist.set_animated(self.blit)
+        self.artists.append(artist)
+        if opaque:
+            self.opaque.add(artist)
+
+    def remove(self, artist):
+        """Stop drawing an artist added with add (the artist is not removed from the
+        axes)"""
+        if artist in self.artists:
+            self.artists.remove(artist)
+        self.opaque.discard(artist)
+
+    def emphasize(self, artists):
+        """Fade the figure but the given artists, None to stop"""
+        self.emphasized = (
+            None
+            if artists is None
+            else sorted(artists, key=lambda artist: artist.get_zorder())
+        )
+
+    def _on_draw(self, event):
+        # savefig draws the figure with another renderer (or canvas)
+        if event.canvas is not self.fig.canvas or self.fig.canvas.is_saving():
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        # the figure may have been resized
+        self.rendered.clear()
+        self._draw_overlay()
+
+    def _draw_overlay(self):
+        if self.emphasized is not None:
+            self.ax.draw_artist(self.fade)
+            for artist in self.emphasized:
+                self.ax.draw_artist(artist)
+        for artist in self.artists:
+            if not artist.get_visible():
+                continue
+            if artist in self.rendered:
+                self.rendered.move_to_end(artist)
+                self.fig.canvas.restore_region(self.rendered[artist])
+                continue
+            self.fig.draw_artist(artist)
+            if artist in self.opaque:
+                self._keep_rendered(artist)
+
+    def _keep_rendered(self, artist):
+        renderer = self.fig.canvas.get_renderer()
+        # the box of the cells of a table (Table.get_window_extent lays them out
+        # again, and moves them)
+        boxes = [child.get_window_extent(renderer) for child in artist.get_children()]
+        if not boxes:
+            boxes = [artist.get_window_extent(renderer)]
+        # with the half of the border line outside of the box
+        bbox = Bbox.intersection(Bbox.union(boxes).padded(1), self.fig.bbox)
+        if bbox is None:
+            return
+        self.rendered[artist] = self.fig.canvas.copy_from_bbox(bbox)
+        if len(self.rendered) > RENDERED_CACHE_SIZE:
+            self.rendered.popitem(last=False)
+
+    def update(self):
+        """Show the changes of the overlay"""
+        if not self.blit or self.background is None:
+            self.fig.canvas.draw_idle()
+            return
+        self.fig.canvas.restore_region(self.background)
+        self._draw_overlay()
+        self.fig.canvas.blit(self.fig.bbox)
@@ -0,0 +1,497 @@
+"""
+Graph drawn with one collection for all its nodes and one for all its edges
+
+netgraph draws every node and every edge as its own matplotlib artist, which takes
+minutes and gigabytes for tens of thousands of edges. CollectionGraph draws the same
+figure (same sizes, in data units, and colors as the netgraph figure) with a single
+EllipseCollection for the nodes and a single LineCollection for the edges. The colors
+and alphas of the nodes and edges are rows of arrays, and hovering and clicking find
+the node under the mouse with a spatial index (see artist_index.py): the nodes and
+edges are only known by their position in these arrays.
+
+The annotations, tables and emphasized nodes and edges are drawn over the saved image
+of the figure (see blit_overlay.py): the emphasized ones are copied into two small
+collections drawn on top of the faded figure.
+"""
+
+from matplotlib.collections import EllipseCollection, LineCollection
+from matplotlib.colors import to_rgba, to_rgba_array
+import matplotlib.pyplot as plt
+import numpy as np
+
+from artist_index import SegmentIndex
+from blit_overlay import BlitOverlay
+
+# sizes are given like in netgraph, in hundredths of data units
+BASE_SCALE = 1e-2
+NODE_EDGE_COLOR = "#2c404c"
+SELFLOOP_RADIUS = 0.05 * np.sqrt(2)
+
+
+class DataUnitsLineWidth:
+    """Collection whose line width is given in data units (like the netgraph artists)
+
+    Parameters
+    ----------
+    linewidth_data : float
+        line width in data units
+    """
+
+    def __init__(self, *args, linewidth_data, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.linewidth_data = linewidth_data
+
+    def draw(self, renderer):
+        points_per_unit = (
+            (
+                self.axes.transData.transform((1, 0))
+                - self.axes.transData.transform((0, 0))
+            )[0]
+            * 72
+            / self.figure.dpi
+        )
+        self.set_linewidth(self.linewidth_data * points_per_unit)
+        super().draw(renderer)
+
+
+class NodeCollection(DataUnitsLineWidth, EllipseCollection):
+    pass
+
+
+class EdgeCollection(DataUnitsLineWidth, LineCollection):
+    pass
+
+
+class CollectionGraph:
+    """Interactive graph drawn with two collections
+
+    Hovering over a node shows its annotation and its table, clicking on a node
+    emphasizes the nodes and edges of its mapping, like NewInteractiveGraph. Nodes
+    can not be dragged.
+
+    Parameters
+    ----------
+    graph : networkx.Graph
+        graph to plot
+    node_layout : dict
+        nodes linked to their (x, y) position
+    node_color : dict, optional
+        nodes linked to their color, by default white
+    edge_width : float, optional
+        width of the edges (in hundredths of data units), by default 0.6
+    edge_color : str, optional
+        color of the edges, by default "black"
+    tables : dict, optional
+        nodes linked to their table as a pandas.DataFrame, by default none
+    annotations : dict, optional
+        nodes linked to their annotation (a string or the keyword arguments of
+        matplotlib.axes.Axes.text), by default none
+    mapping : Mapping, optional
+        nodes linked to the nodes and edges to emphasize when clicking on them, by
+        default none
+    ax : matplotlib.axes.Axes, optional
+        axes to plot on, by default the current ones
+    node_size : float, optional
+        radius of the nodes (in hundredths of data units), by default 3
+    node_edge_width : float, optional
+        width of the border of the nodes (in hundredths of data units), by default 0.5
+    edge_alpha : float, optional
+        alpha of the edges, by default 0.5
+    annotation_fontdict : dict, optional
+        keyword arguments of the annotations, by default a white background
+
+    Attributes
+    ----------
+    nodes : list
+        nodes in the order of the rows of the node arrays
+    edges : list
+        edges in the order of the rows of the edge arrays
+    node_index : dict
+        nodes linked to their row
+    edge_index : dict
+        edges (in both directions) linked to their row
+    """
+
+    def __init__(
+        self,
+        graph,
+        node_layout,
+        node_color=None,
+        edge_width=0.6,
+        edge_color="black",
+        tables=None,
+        annotations=None,
+        mapping=None,
+        ax=None,
+        node_size=3,
+        node_edge_width=0.5,
+        edge_alpha=0.5,
+        annotation_fontdict=None,
+    ):
+        self.ax = plt.gca() if ax is None else ax
+        self.fig = self.ax.get_figure()
+        self.nodes = list(graph.nodes)
+        self.edges = list(graph.edges)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.edge_index = {}
+        for j, (source, target) in enumerate(self.edges):
+            self.edge_index[(source, target)] = j
+            self.edge_index[(target, source)] = j
+        self.node_positions = np.array(
+            [node_layout[node] for node in self.nodes], dtype=float
+        ).reshape(-1, 2)
+        self.node_radius = node_size * BASE_SCALE
+        self.edge_width = edge_width * BASE_SCALE
+
+        node_color = node_color or {}
+        self.base_node_colors = to_rgba_array(
+            [node_color.get(node, "w") for node in self.nodes]
+        ).reshape(-1, 4)
+        self.edge_rgba = to_rgba(edge_color, edge_alpha)
+        self.base_edge_colors = np.tile(self.edge_rgba, (len(self.edges), 1))
+        self.edge_colors = self.base_edge_colors.copy()
+        self.node_edge_color = to_rgba(NODE_EDGE_COLOR)
+        self.node_alphas = np.ones(len(self.nodes))
+        self.edge_alphas = np.ones(len(self.edges))
+        self.node_visible = np.ones(len(self.nodes), dtype=bool)
+        self.edge_visible = np.ones(len(self.edges), dtype=bool)
+        self.emphasized_rows = None
+
+        self.edge_paths = self._edge_paths(self.edges)
+        self.edge_collection = EdgeCollection(
+            self.edge_paths,
+            linewidth_data=self.edge_width,
+            zorder=1,
+        )
+        self.node_edge_width = node_edge_width * BASE_SCALE
+        self.node_collection = self._node_collection(self.node_positions)
+        # the emphasized nodes and edges, drawn again over the faded figure (see
+        # blit_overlay.py)
+        self.emphasis_collections = [
+            EdgeCollection([], linewidth_data=self.edge_width, zorder=1, animated=True),
+            self._node_collection(np.zeros((0, 2)), animated=True),
+        ]
+        self.update_colors()
+        self.ax.add_collection(self.edge_collection)
+        self.ax.add_collection(self.node_collection)
+        for collection in self.emphasis_collections:
+            self.ax.add_collection(collection, autolim=False)
+        self.ax.update_datalim(self.node_positions)
+        self.ax.autoscale_view()
+        # no frame nor ticks, like netgraph
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+        self.ax.set_aspect("equal")
+        for spine in self.ax.spines.values():
+            spine.set_visible(False)
+
+        self.index = SegmentIndex(self._segments)
+        self.mapping = mapping
+        self.emphasized = None
+        self.hovered = None
+        self.table = None
+        # tables already drawn, by row, with the DataFrame they were drawn from
+        self.table_artists = {}
+        self.set_hover_data(tables or {}, annotations or {})
+        self.annotation_fontdict = dict(backgroundcolor="white", clip_on=False)
+        if annotation_fontdict:
+            self.annotation_fontdict.update(annotation_fontdict)
+        self.annotation = self.ax.text(-2, 0, "", **self.annotation_fontdict)
+        self.annotation.set_visible(False)
+        self.overlay = BlitOverlay(self.ax)
+        self.overlay.add(self.annotation)
+
+        self.fig.canvas.mpl_connect("motion_notify_event", self._on_motion)
+        self.fig.canvas.mpl_connect("button_release_event", self._on_release)
+
+    def _node_collection(self, positions, **kwargs):
+        # the border is drawn inside the radius, like in netgraph
+        diameter = 2 * self.node_radius - self.node_edge_width
+        return NodeCollection(
+            widths=diameter,
+            heights=diameter,
+            angles=0,
+            units="xy",
+            offsets=positions,
+            offset_transform=self.ax.transData,
+            linewidth_data=self.node_edge_width,
+            zorder=2,
+            **kwargs,
+        )
+
+    def _edge_paths(self, edges):
+        """Points of each edge: its two nodes, or a circle for the self-loops (drawn
+        like in netgraph, away from the center of the graph)"""
+        sources = np.array([self.node_index[edge[0]] for edge in edges], dtype=int)
+        targets = np.array([self.node_index[edge[1]] for edge in edges], dtype=int)
+        positions = self.node_positions
+        paths = list(np.stack((positions[sources], positions[targets]), axis=1))
+        loops = np.flatnonzero(sources == targets)
+        if len(loops):
+            delta = positions[sources[loops]] - positions.mean(axis=0)
+            norms = np.sqrt((delta**2).sum(axis=1))
+            directions = np.where(
+                norms[:, None] > 0,
+                delta / np.where(norms > 0, norms, 1)[:, None],
+                [0, 1],
+            )
+            centers = positions[sources[loops]] + SELFLOOP_RADIUS * directions
+            angles = (
+                np.arctan2(directions[:, 1], directions[:, 0])[:, None]
+                + np.pi
+                + np.linspace(0, 2 * np.pi, 101)[None, 1:]
+            )
+            circles = centers[:, None, :] + SELFLOOP_RADIUS * np.stack(
+                (np.cos(angles), np.sin(angles)), axis=2
+            )
+            for loop, circle in zip(loops, circles):
+                paths[loop] = circle
+        return paths
+
+    def add(self, graph, node_layout, node_color=None):
+        """Draw the nodes and edges of a graph that are not drawn yet
+
+        They get the rows after the ones already drawn, which stay where they are. The
+        view is extended to the new nodes unless it was zoomed or panned.
+
+        Parameters
+        ----------
+        graph : networkx.Graph
+            graph containing the nodes and edges already drawn
+        node_layout : dict
+            nodes linked to their (x, y) position (at least the new ones)
+        node_color : dict, optional
+            nodes linked to their color, by default white
+        """
+        nodes = [node for node in graph.nodes if node not in self.node_index]
+        edges = [edge for edge in graph.edges if edge not in self.edge_index]
+        if not nodes and not edges:
+            return
+        node_color = node_color or {}
+        for node in nodes:
+            self.node_index[node] = len(self.nodes)
+            self.nodes.append(node)
+        for source, target in edges:
+            self.edge_index[(source, target)] = len(self.edges)
+            self.edge_index[(target, source)] = len(self.edges)
+            self.edges.append((source, target))
+
+        self.node_positions = np.vstack(
+            (
+                self.node_positions,
+                np.array([node_layout[node] for node in nodes], dtype=float).reshape(
+                    -1, 2
+                ),
+            )
+        )
+        self.base_node_colors = np.vstack(
+            (
+                self.base_node_colors,
+                to_rgba_array([node_color.get(node, "w") for node in nodes]).reshape(
+                    -1, 4
+                ),
+            )
+        )
+        new_edge_colors = np.tile(self.edge_rgba, (len(edges), 1))
+        self.base_edge_colors = np.vstack((self.base_edge_colors, new_edge_colors))
+        self.edge_colors = np.vstack((self.edge_colors, new_edge_colors))
+        self.node_alphas = np.append(self.node_alphas, np.ones(len(nodes)))
+        self.edge_alphas = np.append(self.edge_alphas, np.ones(len(edges)))
+        self.node_visible = np.append(
+            self.node_visible, np.ones(len(nodes), dtype=bool)
+        )
+        self.edge_visible = np.append(
+            self.edge_visible, np.ones(len(edges), dtype=bool)
+        )
+
+        self.edge_paths += self._edge_paths(edges)
+        self.edge_collection.set_segments(self.edge_paths)
+        self.node_collection.set_offsets(self.node_positions)
+        self.update_colors()
+        self.index.invalidate()
+        # the view only follows the graph until it is zoomed or panned
+        self.ax.update_datalim(self.node_positions[len(self.nodes) - len(nodes) :])
+        self.ax.autoscale_view()
+
+    def set_hover_data(self, tables, annotations):
+        """Replace the tables and annotations shown when hovering over the nodes
+
+        Parameters
+        ----------
+        tables : dict
+            nodes linked to their table as a pandas.DataFrame
+        annotations : dict
+            nodes linked to their annotation
+        """
+        self.node_tables = {
+            self.node_index[node]: table
+            for node, table in tables.items()
+            if node in self.node_index
+        }
+        self.node_annotations = {
+            self.node_index[node]: annotation
+            for node, annotation in annotations.items()
+            if node in self.node_index
+        }
+        # shown again on the next move of the mouse
+        self.hovered = None
+
+    def _segments(self):
+        n_nodes = len(self.nodes)
+        lengths = np.array([len(path) for path in self.edge_paths], dtype=int)
+        points = np.concatenate(self.edge_paths + [np.zeros((0, 2))])
+        # every point but the last one of each path starts a segment
+        starts = np.ones(len(points), dtype=bool)
+        starts[np.cumsum(lengths) - 1] = False
+        starts = np.flatnonzero(starts)
+        return (
+            np.vstack((self.node_positions, points[starts])),
+            np.vstack((self.node_positions, points[starts + 1])),
+            np.concatenate(
+                (
+                    np.full(n_nodes, self.node_radius),
+                    np.full(len(starts), self.edge_width / 2),
+                )
+            ),
+            np.concatenate(
+                (
+                    np.arange(n_nodes),
+                    n_nodes + np.repeat(np.arange(len(lengths)), lengths - 1),
+                )
+            ),
+        )
+
+    def items_at(self, event):
+        """Visible items under the mouse: rows of the nodes, then number of nodes plus
+        rows of the edges (the hidden ones are left out)"""
+        items = self.index.items_at(event.xdata, event.ydata)
+        n_nodes = len(self.nodes)
+        is_node = items < n_nodes
+        visible = np.empty(len(items), dtype=bool)
+        visible[is_node] = self.node_visible[items[is_node]]
+        visible[~is_node] = self.edge_visible[items[~is_node] - n_nodes]
+        return items[visible]
+
+    def node_at(self, event):
+        """Row of the visible node under the mouse, None if there is none"""
+        items = self.items_at(event)
+        if len(items) and items[0] < len(self.nodes):
+            return int(items[0])
+        return None
+
+    def update_colors(self):
+        """Apply the colors, alphas and visibility of the arrays to the collections"""
+        node_colors = self.base_node_colors.copy()
+        node_colors[:, 3] *= self.node_alphas * self.node_visible
+        node_edge_colors = np.tile(self.node_edge_color, (len(self.nodes), 1))
+        node_edge_colors[:, 3] *= self.node_alphas * self.node_visible
+        self.node_collection.set_facecolor(node_colors)
+        self.node_collection.set_edgecolor(node_edge_colors)
+        edge_colors = self.edge_colors.copy()
+        edge_colors[:, 3] *= self.edge_alphas * self.edge_visible
+        self.edge_collection.set_color(edge_colors)
+        if self.emphasized_rows is not None:
+            node_rows, edge_rows = self.emphasized_rows
+            edges, nodes = self.emphasis_collections
+            edges.set_color(edge_colors[edge_rows])
+            nodes.set_facecolor(node_colors[node_rows])
+            nodes.set_edgecolor(node_edge_colors[node_rows])
+
+    def set_nodes_visible(self, nodes, shown):
+        """Show or hide nodes (call update_colors to apply)"""
+        self.node_visible[[self.node_index[node] for node in nodes]] = shown
+
+    def set_edges_visible(self, edges, shown):
+        """Show or hide edges (call update_colors to apply)"""
+        self.edge_visible[[self.edge_index[edge] for edge in edges]] = shown
+
+    def set_edges_color(self, edges, color=None):
+        """Change the color of edges, None for their own (call update_colors to apply)"""
+        rows = [self.edge_index[edge] for edge in edges]
+        if color is None:
+            self.edge_colors[rows] = self.base_edge_colors[rows]
+        else:
+            self.edge_colors[rows] = to_rgba(color, self.base_edge_colors[0, 3])
+
+    def show_all(self, shown):
+        """Show or hide all nodes and edges (call update_colors to apply)"""
+        self.node_visible[:] = shown
+        self.edge_visible[:] = shown
+
+    def _on_motion(self, event):
+        if event.inaxes != self.ax:
+            return
+        node = self.node_at(event)
+        if node == self.hovered:
+            return
+        self.hovered = node
+
+        annotation = self.node_annotations.get(node)
+        if isinstance(annotation, str):
+            self.annotation.update(dict(self.annotation_fontdict, text=annotation))
+        elif isinstance(annotation, dict):
+            self.annotation.update(dict(self.annotation_fontdict, **annotation))
+        self.annotation.set_visible(annotation is not None)
+
+        if self.table is not None:
+            self.table.set_visible(False)
+            self.table = None
+        table = self.node_tables.get(node)
+        if table is not None and not table.empty:
+            cached_table, table_artist = self.table_artists.get(node, (None, None))
+            # the tables of follow.py are replaced when new packets are read
+            if cached_table is not table:
+                if table_artist is not None:
+                    table_artist.remove()
+                    self.overlay.remove(table_artist)
+                table_artist = self.ax.table(
+                    cellText=table.values.tolist(),
+                    rowLabels=table.index.values,
+                    colLabels=table.columns.values,
+                )
+                self.overlay.add(table_artist, opaque=True)
+                self.table_artists[node] = (table, table_artist)
+            self.table = table_artist
+            self.table.set_visible(True)
+        self.overlay.update()
+
+    def _emphasize(self, node):
+        """Emphasize the nodes and edges of the mapping of a node, None to stop"""
+        self.emphasized = node
+        if node is None:
+            self.emphasized_rows = None
+            self.node_alphas[:] = 1
+            self.edge_alphas[:] = 1
+            self.overlay.emphasize(None)
+            self.update_colors()
+            return
+        node_rows, edge_rows = [], []
+        for key in self.mapping[self.nodes[node]]:
+            if key in self.edge_index:
+                edge_rows.append(self.edge_index[key])
+            elif key in self.node_index:
+                node_rows.append(self.node_index[key])
+        self.emphasized_rows = (node_rows, edge_rows)
+        if self.overlay.blit:
+            edges, nodes = self.emphasis_collections
+            edges.set_segments([self.edge_paths[j] for j in edge_rows])
+            nodes.set_offsets(self.node_positions[node_rows].reshape(-1, 2))
+            self.overlay.emphasize(self.emphasis_collections)
+        else:
+            self.node_alphas[:] = 0.2
+            self.edge_alphas[:] = 0.2
+            self.node_alphas[node_rows] = 1
+            self.edge_alphas[edge_rows] = 1
+        self.update_colors()
+
+    def _on_release(self, event):
+        if event.inaxes != self.ax or self.mapping is None:
+            return
+        node = self.node_at(event)
+        if self.emphasized is not None:
+            self._emphasize(None)
+        elif node is not None and self.nodes[node] in self.mapping:
+            self._emphasize(node)
+        else:
+            return
+        self.overlay.update()
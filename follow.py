@@ -0,0 +1,295 @@
+"""
+Follows a .pcap (or .ndjson) file that is still being written (like `tail -f`) and
+updates the graph as new packets arrive
+
+Usage:
+=====
+    python3 follow.py file_name [--interval SECONDS] [--networks file_name]
+                      [--collections]
+
+    file_name: name of the .pcap file being written, or of the .ndjson file written by
+        from_pcap_to_json.py --resume
+    --interval: time between two reads of the file, by default 5 seconds
+    --networks: table of the CIDR blocks grouping the devices beyond the router (see
+        ip_networks.py), by default they are grouped by class
+    --collections: draw the nodes and the edges as two collections (see main.py)
+
+main.py and pcap_to_graph.py follow their input file the same way with --follow.
+"""
+
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from collection_graph import CollectionGraph
+from from_pcap_to_json import read_packets
+from ip_networks import NetworkTable
+from layout import extend_layout
+import main
+from modified_netgraph import NewInteractiveGraph
+from pcap_file import is_pcapng, scan_new_records
+from zoom import ZoomPan
+
+np.seterr(divide="ignore", invalid="ignore")
+
+
+class Follower:
+    """Reads the packets added to a .pcap or .ndjson file and keeps the graph of
+    main.py up to date
+
+    Only the new records (or lines) are decoded at each read. They are fed to a
+    main.GraphBuilder, which adds them to the graph (the nodes, tables and mapping
+    built before are kept). The new nodes are placed around the ones already drawn
+    (see layout.extend_layout) and drawn with the new edges, the nodes already drawn
+    staying where they are. The tables and annotations shown on hover are replaced,
+    the mapping is read from the builder when a node is clicked.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap or .ndjson file
+    ax : matplotlib.axes.Axes
+        axes where the graph is drawn
+    ethertypes_data : dict
+        ethertypes
+    networks : NetworkTable, optional
+        networks of the devices beyond the router, by default their classful
+        networks
+    collections : bool, optional
+        draw the graph with collections (see main.plot_graph), by default False
+    edge_width : float, optional
+        width of the edges, by default 0.6
+    edge_color : str, optional
+        color of the edges, by default "black"
+    """
+
+    def __init__(
+        self,
+        file_name,
+        ax,
+        ethertypes_data,
+        networks=None,
+        collections=False,
+        edge_width=0.6,
+        edge_color="black",
+    ):
+        self.file_name = file_name
+        self.ax = ax
+        self.builder = main.GraphBuilder(ethertypes_data, networks)
+        self.graph_class = CollectionGraph if collections else NewInteractiveGraph
+        self.edge_width = edge_width
+        self.edge_color = edge_color
+        self.checkpoint = None
+        self.offset = 0
+        self.graph = None
+        self.layout = None
+        self.plotted_graph = None
+
+    def read_new_packets(self):
+        """Decode the packets added to the file since the last read
+
+        Returns
+        -------
+        list
+            data about the new packets, empty if the file has no complete header yet
+            (the next read tries again)
+        """
+        try:
+            if self.file_name.endswith(".ndjson"):
+                packets, self.offset = main.NDJSONPackets(self.file_name).read_from(
+                    self.offset
+                )
+                return packets
+            self.checkpoint = scan_new_records(self.file_name, self.checkpoint)
+        except (OSError, ValueError) as error:
+            print("Can not read the capture yet (" + str(error) + "), waiting...")
+            return []
+        byte_range = (self.checkpoint["start"], self.checkpoint["end"])
+        return list(
+            read_packets(self.file_name, byte_ranges={self.file_name: byte_range})
+        )
+
+    def update(self):
+        """Add the new packets to the graph
+
+        The packets are kept in the builder until the router is found.
+
+        Returns
+        -------
+        bool
+            True if the graph changed
+        """
+        packets = self.read_new_packets()
+        if not packets:
+            return False
+        self.builder.feed(packets)
+        try:
+            self.graph = self.builder.finalize()
+        except main.RouterNotFoundError:
+            print("Router not found yet, waiting for more packets...")
+            return False
+        return True
+
+    def draw(self):
+        """Draw the graph the first time, then only its new nodes and edges"""
+        builder = self.builder
+        node_color = main.set_colors(self.graph, builder.subnetworks)
+        annotations = main.set_annotations(
+            builder.list_nodes, builder.mac, builder.ipv4
+        )
+        tables = main.change_table_type(builder.table)
+        if self.plotted_graph is None:
+            self.layout = main.set_layout(builder.subnetworks)
+            self.plotted_graph = self.graph_class(
+                self.graph,
+                node_layout=self.layout,
+                node_color=node_color,
+                edge_width=self.edge_width,
+                edge_color=self.edge_color,
+                tables=tables,
+                annotations=annotations,
+                mapping=builder.mapping,
+                ax=self.ax,
+            )
+            return
+        if self.graph.number_of_nodes() > len(self.layout):
+            self.layout = extend_layout(self.layout, builder.subnetworks)
+        self.plotted_graph.add(self.graph, self.layout, node_color)
+        self.plotted_graph.set_hover_data(tables, annotations)
+
+    def on_timer(self):
+        """Read the file and refresh the figure if needed"""
+        if self.update():
+            self.draw()
+            self.ax.figure.canvas.draw_idle()
+
+    def save(self, save_file_name):
+        """Save the graph drawn like main.py (see main.save_data)
+
+        Parameters
+        ----------
+        save_file_name : str
+            name of the file where data are saved (without the .fig.pckl extension)
+        """
+        if self.plotted_graph is None:
+            print("Nothing to save, the router was not found")
+            return
+        builder = self.builder
+        main.save_data(
+            save_file_name,
+            main.set_colors(self.graph, builder.subnetworks),
+            self.graph,
+            self.layout,
+            main.change_table_type(builder.table),
+            builder.mapping,
+            main.set_annotations(builder.list_nodes, builder.mac, builder.ipv4),
+            self.edge_width,
+            self.edge_color,
+        )
+
+
+def follow(
+    file_name,
+    ethertypes_data,
+    networks=None,
+    interval=5,
+    collections=False,
+    edge_width=0.6,
+    edge_color="black",
+):
+    """Plot the graph of a file that is still being written and update it until the
+    figure is closed
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap or .ndjson file
+    ethertypes_data : dict
+        ethertypes
+    networks : NetworkTable, optional
+        networks of the devices beyond the router, by default their classful
+        networks
+    interval : float, optional
+        time between two reads of the file (in seconds), by default 5
+    collections : bool, optional
+        draw the graph with collections, by default False
+    edge_width : float, optional
+        width of the edges, by default 0.6
+    edge_color : str, optional
+        color of the edges, by default "black"
+
+    Returns
+    -------
+    Follower
+        follower of the file, once the figure is closed
+    """
+    fig, ax = plt.subplots()
+    follower = Follower(
+        file_name, ax, ethertypes_data, networks, collections, edge_width, edge_color
+    )
+    follower.on_timer()
+
+    zp = ZoomPan()
+    figZoom = zp.zoom_factory(ax, base_scale=1.1)
+    figPan = zp.pan_factory(ax)
+
+    timer = fig.canvas.new_timer(interval=int(interval * 1000))
+    timer.add_callback(follower.on_timer)
+    timer.start()
+    plt.show()
+    timer.stop()
+    return follower
+
+
+def check_followed_file(file_name):
+    """Error message if a file can not be followed, None otherwise
+
+    Parameters
+    ----------
+    file_name : str
+        name of the file
+
+    Returns
+    -------
+    str or None
+        why the file can not be followed
+    """
+    if file_name.endswith((".json", ".npz")):
+        return "only .pcap and .ndjson files can be followed"
+    if os.path.exists(file_name) and is_pcapng(file_name):
+        return "only .pcap files can be followed, not .pcapng ones"
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Update the graph of a .pcap file while it is being written"
+    )
+    parser.add_argument("file_name", help="name of the .pcap or .ndjson file")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="time between two reads of the file (in seconds)",
+    )
+    parser.add_argument(
+        "--networks",
+        help="table of the CIDR blocks grouping the devices beyond the router",
+    )
+    parser.add_argument(
+        "--collections",
+        action="store_true",
+        help="draw the nodes and the edges as two collections (faster for large graphs)",
+    )
+    args = parser.parse_args()
+    error = check_followed_file(args.file_name)
+    if error is not None:
+        parser.error(error)
+
+    ethertypes_data = main.load_json("numbers/ethertypes.json")
+    networks = (
+        NetworkTable() if args.networks is None else NetworkTable.load(args.networks)
+    )
+    follow(args.file_name, ethertypes_data, networks, args.interval, args.collections)
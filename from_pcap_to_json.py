@@ -1,11 +1,27 @@
 """
-Takes a .pcap file and creates a .json file with data from the .pcap file
+Takes .pcap (or .pcapng) files and creates a .json file with data from the captures
 
 Usage:
 =====
-    python3 from_pcap_to_json.py file_name
+    python3 from_pcap_to_json.py file_name [file_name ...] [--ndjson | --npz] [--batch-size N]
+                                 [--workers N] [--chunk-size N]
+                                 [--start DATE] [--end DATE] [-o output] [--resume]
 
-    file_name: name of the file (with the relative path) from which we want data
+    file_name: name of the file (with the relative path) from which we want data. When
+        several files are given, their packets are merged in chronological order
+    --ndjson: write one packet per line (.ndjson) while decoding instead of one big .json
+    --npz: write typed columns (.npz, see packet_columns.py) instead of .json
+    --batch-size: number of lines written at once in --ndjson mode
+    --workers: number of processes decoding the packets
+    --chunk-size: number of packets decoded at once by each process
+    --start, --end: only keep the packets captured during this period (timestamp or
+        local date such as '2023-06-26 10:00'), using the file_name.idx.npz index
+    -o, --output: name of the output file, by default a new file in data/ (.npz is
+        added to it with --npz, like numpy does)
+    --resume: only decode the packets added since the last run (saved in
+        output.ckpt) and append them to --output (--ndjson or --npz only, not with
+        --start or --end). With --npz, each run writes its packets in a new part
+        (output.1.npz, output.2.npz...) listed in output.ckpt
 """
 
 __authors__ = "Clara Moy"
@@ -14,19 +30,43 @@ __copyright__ = "MIT"
 __date__ = "2023-06-26"
 
 
+import argparse
+from collections import deque
 from datetime import datetime
-import sys
+from functools import lru_cache
+import heapq
+from itertools import islice
+from multiprocessing import Pool
+from operator import itemgetter
+import os
 from time import time
 import dpkt
 import socket
 from dpkt.compat import compat_ord
 
 import json
+from packet_columns import part_file_name, write_npz
+from pcap_file import (
+    find_range,
+    in_period,
+    is_pcapng,
+    narrow_range,
+    read_capture_records,
+    read_records,
+    scan_new_records,
+    split_records,
+)
 
+# number of distinct addresses whose printable form is kept by mac_addr and inet_to_str
+ADDRESS_CACHE_SIZE = 65536
 
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
 def mac_addr(address):
     """Convert a MAC address to a readable/printable string
 
+    The result is cached per address (a capture only has a few thousand of them).
+
     Args:
         address (str): a MAC address in hex form (e.g. '\x01\x02\x03\x04\x05\x06')
     Returns:
@@ -35,9 +75,12 @@ def mac_addr(address):
     return ":".join("%02x" % compat_ord(b) for b in address)
 
 
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
 def inet_to_str(inet):
     """Convert inet object to a string
 
+    The result is cached per address (a capture only has a few thousand of them).
+
     Args:
         inet (inet struct): inet network address
     Returns:
@@ -50,60 +93,592 @@ def inet_to_str(inet):
         return socket.inet_ntop(socket.AF_INET6, inet)
 
 
-print("Extracting data...")
-start = time()
-file_name = sys.argv[1]
-data = {}
-data["paquets"] = []
-
-
-with open(file_name, "rb") as f:
-    pcap = dpkt.pcap.Reader(f)
-    index = 0
-    for ts, buf in pcap:
-        eth = dpkt.ethernet.Ethernet(buf)
-        ip = eth.data
-        data["paquets"].append(
-            {
-                "src": mac_addr(eth.src),
-                "dst": mac_addr(eth.dst),
-                "ts": str(datetime.fromtimestamp(ts)),
-            }
+def address_cache_info():
+    """Hit and miss counters of the address formatting caches (current process only)
+
+    Returns:
+        dict: name of the function linked to its functools cache info
+    """
+    return {
+        "mac_addr": mac_addr.cache_info(),
+        "inet_to_str": inet_to_str.cache_info(),
+    }
+
+
+def parse_time(value):
+    """Convert a date given on the command line to a timestamp
+
+    Args:
+        value (str): timestamp (e.g. '1687770000') or local date (e.g. '2023-06-26 10:00')
+    Returns:
+        float: timestamp
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def decode_fields(ts, buf, capture=None):
+    """Extract the interesting raw fields of one packet (nothing is formatted)
+
+    Args:
+        ts (float): timestamp of the packet
+        buf (bytes): raw ethernet frame
+        capture (str): name of the capture file the packet comes from
+    Returns:
+        tuple: (ts, MAC src, MAC dst, ethertype, IP src, IP dst, port src, port dst,
+            length, capture), addresses as bytes, missing values as None
+    """
+    eth = dpkt.ethernet.Ethernet(buf)
+    ip = eth.data
+
+    try:
+        eth_type = eth.type
+    except AttributeError:
+        eth_type = None
+
+    try:
+        ip_src = ip.src
+        ip_dst = ip.dst
+    except (AttributeError, IndexError):
+        ip_src = None
+        ip_dst = None
+
+    # try:
+    #     ttl = ip.ttl
+    # except (AttributeError, IndexError):
+    #     ttl = None
+
+    try:
+        tcp = ip.data
+        port_src = tcp.sport
+        port_dst = tcp.dport
+    except (AttributeError, IndexError):
+        port_src = None
+        port_dst = None
+
+    return (
+        ts,
+        eth.src,
+        eth.dst,
+        eth_type,
+        ip_src,
+        ip_dst,
+        port_src,
+        port_dst,
+        len(buf),
+        capture,
+    )
+
+
+def format_packet(fields):
+    """Format the raw fields of a packet into printable data
+
+    Args:
+        fields (tuple): raw fields returned by decode_fields
+    Returns:
+        dict: data about the packet
+    """
+    ts, src, dst, eth_type, ip_src, ip_dst, port_src, port_dst, length, capture = fields
+    packet = {
+        "src": mac_addr(src),
+        "dst": mac_addr(dst),
+        "ts": str(datetime.fromtimestamp(ts)),
+        "type": eth_type,
+    }
+    if ip_src is not None:
+        packet.update({"ip_src": inet_to_str(ip_src)})
+        packet.update({"ip_dst": inet_to_str(ip_dst)})
+    else:
+        packet.update({"ip_src": None})
+        packet.update({"ip_dst": None})
+    packet.update({"port_src": port_src})
+    packet.update({"port_dst": port_dst})
+    packet.update({"length": length})
+    packet.update({"capture": capture})
+    return packet
+
+
+def decode_packet(ts, buf, capture=None):
+    """Extract the interesting data of one packet
+
+    Args:
+        ts (float): timestamp of the packet
+        buf (bytes): raw ethernet frame
+        capture (str): name of the capture file the packet comes from
+    Returns:
+        dict: data about the packet
+    """
+    return format_packet(decode_fields(ts, buf, capture))
+
+
+def read_fields(
+    file_names,
+    workers=1,
+    chunk_size=100000,
+    start_time=None,
+    end_time=None,
+    byte_ranges=None,
+):
+    """Decode the raw fields of the packets of one or several captures one at a time
+
+    Args:
+        file_names (str or list): name(s) of the .pcap or .pcapng files
+        workers (int): number of processes decoding the packets
+        chunk_size (int): number of packets decoded at once by a process
+        start_time (float): only keep the packets captured from this timestamp
+        end_time (float): only keep the packets captured until this timestamp
+        byte_ranges (dict): name of a .pcap file linked to the (start, end) offsets
+            its reading is limited to
+    Yields:
+        tuple: raw fields of each packet (see decode_fields), in chronological order
+    """
+    yield from read_captures(
+        file_names, False, workers, chunk_size, start_time, end_time, byte_ranges
+    )
+
+
+def read_packets(
+    file_names,
+    workers=1,
+    chunk_size=100000,
+    start_time=None,
+    end_time=None,
+    byte_ranges=None,
+):
+    """Decode the packets of one or several captures one at a time
+
+    Args:
+        file_names (str or list): name(s) of the .pcap or .pcapng files
+        workers (int): number of processes decoding the packets
+        chunk_size (int): number of packets decoded at once by a process
+        start_time (float): only keep the packets captured from this timestamp
+        end_time (float): only keep the packets captured until this timestamp
+        byte_ranges (dict): name of a .pcap file linked to the (start, end) offsets
+            its reading is limited to
+    Yields:
+        dict: data about each packet, in chronological order
+    """
+    yield from read_captures(
+        file_names, True, workers, chunk_size, start_time, end_time, byte_ranges
+    )
+
+
+def read_captures(
+    file_names,
+    formatted,
+    workers=1,
+    chunk_size=100000,
+    start_time=None,
+    end_time=None,
+    byte_ranges=None,
+):
+    """Decode several captures and merge them on the timestamps of the packets
+
+    Each capture is read as a stream and the streams are merged packet by packet
+    (k-way merge), so the captures are never loaded at once. With a single capture,
+    the packets come out in file order.
+
+    Args:
+        file_names (str or list): name(s) of the .pcap or .pcapng files
+        formatted (bool): True to get dicts (decode_packet), False to get raw fields
+        workers (int): number of processes decoding the packets
+        chunk_size (int): number of packets decoded at once by a process
+        start_time (float): only keep the packets captured from this timestamp
+        end_time (float): only keep the packets captured until this timestamp
+        byte_ranges (dict): name of a .pcap file linked to the (start, end) offsets
+            its reading is limited to
+    Yields:
+        dict or tuple: decoded packets, tagged with the name of their capture
+    """
+    if isinstance(file_names, str):
+        file_names = [file_names]
+    if byte_ranges is None:
+        byte_ranges = {}
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        streams = [
+            read_capture(
+                file_name,
+                formatted,
+                pool,
+                workers,
+                chunk_size,
+                start_time,
+                end_time,
+                byte_ranges.get(file_name, (None, None)),
+            )
+            for file_name in file_names
+        ]
+        if len(streams) == 1:
+            merged = streams[0]
+        else:
+            merged = heapq.merge(*streams, key=itemgetter(0))
+        for _, packet in merged:
+            yield packet
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def read_capture(
+    file_name,
+    formatted,
+    pool=None,
+    workers=1,
+    chunk_size=100000,
+    start_time=None,
+    end_time=None,
+    byte_range=(None, None),
+):
+    """Decode the packets of one capture
+
+    Args:
+        file_name (str): name of the .pcap or .pcapng file
+        formatted (bool): True to get dicts (decode_packet), False to get raw fields
+        pool (multiprocessing.Pool): processes decoding the packets (.pcap files only)
+        workers (int): number of processes in the pool
+        chunk_size (int): number of packets decoded at once by a process
+        start_time (float): only keep the packets captured from this timestamp
+        end_time (float): only keep the packets captured until this timestamp
+        byte_range (tuple): (start, end) offsets the reading is limited to (.pcap
+            files only)
+    Yields:
+        tuple: (timestamp, decoded packet), in file order
+    """
+    if pool is not None and not is_pcapng(file_name):
+        yield from read_parallel(
+            file_name,
+            pool,
+            workers,
+            chunk_size,
+            formatted,
+            start_time,
+            end_time,
+            byte_range,
         )
+        return
+    decode = decode_packet if formatted else decode_fields
+    for ts, buf in read_capture_records(
+        file_name, start_time, end_time, byte_range=byte_range
+    ):
+        yield ts, decode(ts, buf, file_name)
+
 
-        try:
-            data["paquets"][index].update({"type": eth.type})
-        except AttributeError:
-            data["paquets"][index].update({"type": None})
-
-        try:
-            data["paquets"][index].update({"ip_src": inet_to_str(ip.src)})
-            data["paquets"][index].update({"ip_dst": inet_to_str(ip.dst)})
-        except (AttributeError, IndexError):
-            data["paquets"][index].update({"ip_src": None})
-            data["paquets"][index].update({"ip_dst": None})
-
-        # try:
-        #     data["paquets"][index].update({"ttl": ip.ttl})
-        # except (AttributeError, IndexError):
-        #     data["paquets"][index].update({"ttl": None})
-
-        try:
-            tcp = ip.data
-            data["paquets"][index].update({"port_src": tcp.sport})
-            data["paquets"][index].update({"port_dst": tcp.dport})
-        except (AttributeError, IndexError):
-            data["paquets"][index].update({"port_src": None})
-            data["paquets"][index].update({"port_dst": None})
-
-        index += 1
-
-
-data_string = json.dumps(data)
-
-print("Creating json file...")
-dt_string = datetime.now().strftime("%d-%m-%Y_%H:%M:%S")
-with open("data/json_data_" + dt_string + ".json", "w") as outfile:
-    outfile.write(data_string)
-end = time()
-print("Done in", (end - start) / 60, "min")
+def decode_chunk(chunk):
+    """Decode the packets of a range of a .pcap file (run by the worker processes)
+
+    Args:
+        chunk (tuple): (file name, start offset, end offset, True to format the
+            packets, start time, end time)
+    Returns:
+        list: (timestamp, decoded packet) of the range, in capture order
+    """
+    file_name, start, end, formatted, start_time, end_time = chunk
+    decode = decode_packet if formatted else decode_fields
+    return [
+        (ts, decode(ts, buf, file_name))
+        for ts, buf in read_records(file_name, start, end)
+        if in_period(ts, start_time, end_time)
+    ]
+
+
+def read_parallel(
+    file_name,
+    pool,
+    workers,
+    chunk_size,
+    formatted,
+    start_time=None,
+    end_time=None,
+    byte_range=(None, None),
+):
+    """Decode the packets of a .pcap file with several processes
+
+    The file is split on record boundaries in chunks of `chunk_size` packets. The
+    chunks are given back in file order, so the packets come out exactly as with a
+    single process. At most two chunks per worker are waiting to be consumed.
+
+    Args:
+        file_name (str): name of the .pcap file
+        pool (multiprocessing.Pool): processes decoding the packets
+        workers (int): number of processes in the pool
+        chunk_size (int): number of packets in each chunk
+        formatted (bool): True to get dicts (decode_packet), False to get raw fields
+        start_time (float): only keep the packets captured from this timestamp
+        end_time (float): only keep the packets captured until this timestamp
+        byte_range (tuple): (start, end) offsets the reading is limited to
+    Yields:
+        tuple: (timestamp, decoded packet), in capture order
+    """
+    range_start, range_end = narrow_range(
+        find_range(file_name, start_time, end_time), byte_range
+    )
+    if range_start is not None and range_end is not None and range_start >= range_end:
+        return
+    chunks = iter(
+        (file_name, start, end, formatted, start_time, end_time)
+        for start, end in split_records(file_name, chunk_size, range_start, range_end)
+    )
+    pending = deque(
+        pool.apply_async(decode_chunk, (chunk,))
+        for chunk in islice(chunks, 2 * workers)
+    )
+    while pending:
+        decoded = pending.popleft().get()
+        for chunk in islice(chunks, 1):
+            pending.append(pool.apply_async(decode_chunk, (chunk,)))
+        yield from decoded
+
+
+def write_json(packets, output_file_name):
+    """Write all the packets in a single .json document
+
+    Args:
+        packets (iterable): data about the packets
+        output_file_name (str): name of the .json file
+    Returns:
+        int: number of packets written
+    """
+    data = {}
+    data["paquets"] = list(packets)
+    data_string = json.dumps(data)
+    with open(output_file_name, "w") as outfile:
+        outfile.write(data_string)
+    return len(data["paquets"])
+
+
+def write_ndjson(packets, output_file_name, batch_size=10000, append=False):
+    """Write the packets in a .ndjson file (one packet per line) as they are decoded
+
+    Only `batch_size` serialized packets are kept in memory at a time.
+
+    Args:
+        packets (iterable): data about the packets
+        output_file_name (str): name of the .ndjson file
+        batch_size (int): number of lines written at once
+        append (bool): True to add the packets at the end of the file
+    Returns:
+        int: number of packets written
+    """
+    n_packets = 0
+    batch = []
+    with open(output_file_name, "a" if append else "w") as outfile:
+        for packet in packets:
+            batch.append(json.dumps(packet) + "\n")
+            if len(batch) >= batch_size:
+                outfile.writelines(batch)
+                n_packets += len(batch)
+                batch = []
+        outfile.writelines(batch)
+        n_packets += len(batch)
+    return n_packets
+
+
+def checkpoint_file_name(output_file_name):
+    """Name of the checkpoint file of an output file"""
+    return output_file_name + ".ckpt"
+
+
+def load_checkpoint(output_file_name):
+    """Load how far each capture was read when the output file was last written
+
+    Args:
+        output_file_name (str): name of the .ndjson or .npz file
+    Returns:
+        dict: name of the capture linked to its "offset", number of "packets" and
+            "fingerprint" (see pcap_file.scan_new_records), and for a .npz file the
+            "parts" written by the resumed runs (see packet_columns.part_file_name),
+            empty if there is no checkpoint
+    """
+    try:
+        with open(checkpoint_file_name(output_file_name)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(output_file_name, checkpoint):
+    """Save how far each capture was read (the file is replaced atomically)
+
+    Args:
+        output_file_name (str): name of the .ndjson or .npz file
+        checkpoint (dict): name of the capture linked to its "offset", number of
+            "packets" and "fingerprint", and the "parts" of a .npz file
+    """
+    temporary_file_name = checkpoint_file_name(output_file_name) + ".tmp"
+    with open(temporary_file_name, "w") as file:
+        json.dump(checkpoint, file, indent=4)
+    os.replace(temporary_file_name, checkpoint_file_name(output_file_name))
+
+
+def npz_part_file_names(output_file_name):
+    """Names of the parts written by the resumed runs of a .npz file, in order
+
+    Args:
+        output_file_name (str): name of the .npz file
+    Returns:
+        list: names of the parts listed in the checkpoint, empty if there is none
+    """
+    directory = os.path.dirname(output_file_name)
+    return [
+        os.path.join(directory, part)
+        for part in load_checkpoint(output_file_name).get("parts", [])
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract data from .pcap files and store it in data/"
+    )
+    parser.add_argument(
+        "file_names", nargs="+", help="names of the .pcap or .pcapng files"
+    )
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="write one packet per line while decoding (constant memory)",
+    )
+    output_format.add_argument(
+        "--npz",
+        action="store_true",
+        help="write typed columns in a compact .npz file",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="number of lines written at once in --ndjson mode",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes decoding the packets",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="number of packets decoded at once by each process",
+    )
+    parser.add_argument(
+        "--start",
+        type=parse_time,
+        help="only keep the packets captured from this date",
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_time,
+        help="only keep the packets captured until this date",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="name of the output file, by default a new file in data/",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="only decode the packets added to the .pcap files since the last run "
+        "and append them to --output (.ndjson or .npz)",
+    )
+    args = parser.parse_args()
+
+    if args.npz:
+        extension = ".npz"
+    elif args.ndjson:
+        extension = ".ndjson"
+    else:
+        extension = ".json"
+    output_file_name = args.output
+    if output_file_name is None:
+        dt_string = datetime.now().strftime("%d-%m-%Y_%H:%M:%S")
+        prefix = "data/npz_data_" if args.npz else "data/json_data_"
+        output_file_name = prefix + dt_string + extension
+    elif args.npz and not output_file_name.endswith(".npz"):
+        # numpy adds it when saving: the checkpoint has to find the same file
+        output_file_name += ".npz"
+
+    print("Extracting data...")
+    start = time()
+    byte_ranges = None
+    append = False
+    if args.resume:
+        if args.output is None or extension == ".json":
+            parser.error("--resume needs --output and --ndjson or --npz")
+        if args.start is not None or args.end is not None:
+            # the checkpoint is saved after the packets left out of the period, which
+            # would never be read again
+            parser.error("--resume can not be used with --start or --end")
+        if any(is_pcapng(file_name) for file_name in args.file_names):
+            parser.error("--resume only works with .pcap files")
+        checkpoint = load_checkpoint(output_file_name)
+        append = bool(checkpoint) and os.path.exists(output_file_name)
+        if not append:
+            checkpoint = {}
+        scans = {
+            file_name: scan_new_records(file_name, checkpoint.get(file_name))
+            for file_name in args.file_names
+        }
+        byte_ranges = {
+            file_name: (scan["start"], scan["end"]) for file_name, scan in scans.items()
+        }
+        for file_name, scan in scans.items():
+            checkpoint[file_name] = {
+                "offset": scan["offset"],
+                "packets": scan["packets"],
+                "fingerprint": scan["fingerprint"],
+            }
+
+    if args.npz:
+        print("Creating npz file...")
+        npz_file_name = output_file_name
+        if append:
+            # the file already written is left as it is
+            parts = checkpoint.get("parts", [])
+            npz_file_name = part_file_name(output_file_name, len(parts) + 1)
+        n_packets = write_npz(
+            read_fields(
+                args.file_names,
+                args.workers,
+                args.chunk_size,
+                args.start,
+                args.end,
+                byte_ranges,
+            ),
+            npz_file_name,
+        )
+        if append and n_packets:
+            checkpoint["parts"] = parts + [os.path.basename(npz_file_name)]
+        elif append:
+            # no new packets, no empty part
+            os.remove(npz_file_name)
+    else:
+        packets = read_packets(
+            args.file_names,
+            args.workers,
+            args.chunk_size,
+            args.start,
+            args.end,
+            byte_ranges,
+        )
+        if args.ndjson:
+            print("Creating ndjson file...")
+            n_packets = write_ndjson(packets, output_file_name, args.batch_size, append)
+        else:
+            print("Creating json file...")
+            n_packets = write_json(packets, output_file_name)
+    if args.resume:
+        save_checkpoint(output_file_name, checkpoint)
+    print(n_packets, "packets written in", output_file_name)
+    end = time()
+    for function, info in address_cache_info().items():
+        if info.hits or info.misses:
+            print(
+                "%s cache: %d hits, %d misses (%d addresses)"
+                % (function, info.hits, info.misses, info.currsize)
+            )
+    print("Done in", (end - start) / 60, "min")
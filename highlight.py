@@ -0,0 +1,106 @@
+"""
+Nodes and edges emphasized when clicking on a node of the graph
+
+Clicking on a device emphasizes its neighbours and, for the communications through
+the router, the external devices and their networks (or, for an external device, the
+devices of the local network it talked to). Instead of storing these lists for every
+node, they are computed from the graph when a node is clicked.
+"""
+
+from collections.abc import Mapping
+
+
+class HighlightMapping(Mapping):
+    """Index of the nodes linked to the nodes and edges to emphasize when clicking on them
+
+    Only the links through the router are stored: everything else is read from the
+    adjacency of the graph. Networks (prefixes) can not be clicked.
+
+    Parameters
+    ----------
+    router : int
+        index of the router in list_nodes
+    graph : networkx.Graph, optional
+        graph of the network, by default None (set by main.create_graph)
+    """
+
+    def __init__(self, router, graph=None):
+        self.router = router
+        self.graph = graph
+        self.networks = set()
+        self.wan_peers = {}
+
+    def add_wan_link(self, device_index, network_index, local_index):
+        """Record a communication between a local and an external device
+
+        Parameters
+        ----------
+        device_index : int
+            index of the external device
+        network_index : int
+            index of the network of the external device
+        local_index : int
+            index of the device of the local network
+        """
+        self.networks.add(network_index)
+        self.wan_peers.setdefault(device_index, set()).add(local_index)
+        self.wan_peers.setdefault(local_index, set()).add(device_index)
+
+    def network_of(self, device_index):
+        """Index of the network of an external device, None for local devices"""
+        if device_index == self.router:
+            return None
+        for neighbor in self.graph[device_index]:
+            if neighbor in self.networks:
+                return neighbor
+        return None
+
+    def __getitem__(self, node):
+        if node not in self:
+            raise KeyError(node)
+        router = self.router
+        highlighted = {node}
+        network = self.network_of(node)
+        if network is not None:
+            # external device: its network, the router and the local devices it
+            # talked to
+            highlighted |= {
+                network,
+                router,
+                (node, network),
+                (network, node),
+                (network, router),
+                (router, network),
+            }
+            for local in self.wan_peers.get(node, ()):
+                highlighted |= {local, (local, router), (router, local)}
+            return highlighted
+        for neighbor in self.graph[node]:
+            if neighbor not in self.networks:
+                highlighted |= {neighbor, (node, neighbor), (neighbor, node)}
+        for device in self.wan_peers.get(node, ()):
+            network = self.network_of(device)
+            highlighted |= {
+                device,
+                network,
+                (device, network),
+                (network, device),
+                (network, router),
+                (router, network),
+            }
+        return highlighted
+
+    def __contains__(self, node):
+        return (
+            self.graph is not None and node in self.graph and node not in self.networks
+        )
+
+    def __iter__(self):
+        if self.graph is None:
+            return iter(())
+        return (node for node in self.graph if node not in self.networks)
+
+    def __len__(self):
+        if self.graph is None:
+            return 0
+        return self.graph.number_of_nodes() - len(self.networks & set(self.graph))
@@ -0,0 +1,157 @@
+"""
+Networks of the IP addresses of the devices beyond the router
+
+The devices beyond the router are grouped by network. The networks are given by a
+table of CIDR blocks (such as the /24 of a partner or the ranges of a cloud provider),
+the most specific block containing an address being its network. The addresses
+outside of the table are grouped by their class (first octet for class A, first two
+octets for class B and first three octets for class C).
+
+The table is a text file with one CIDR block per line, optionally followed by the
+name of the network (blocks with the same name are the same network). Empty lines and
+lines starting with # are ignored:
+
+    # cloud provider
+    3.0.0.0/9 cloud
+    52.0.0.0/10 cloud
+    203.0.113.0/24
+"""
+
+from bisect import bisect_right
+import ipaddress
+
+
+def ip_to_int(ip):
+    """Convert a dotted IPv4 address to an integer
+
+    Parameters
+    ----------
+    ip : str
+        IPv4 address
+
+    Returns
+    -------
+    int
+        the address as a 32 bits integer
+    """
+    a, b, c, d = ip.split(".")
+    return (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+
+
+def classful_prefix(ip):
+    """Network of an IPv4 address according to its class
+
+    Parameters
+    ----------
+    ip : int
+        IPv4 address as an integer
+
+    Returns
+    -------
+    str
+        first octet for class A addresses (and for the addresses outside of classes
+        A, B and C), first two octets for class B and first three for class C
+    """
+    first_octet = ip >> 24
+    if 128 <= first_octet < 192:
+        return "%d.%d" % (first_octet, (ip >> 16) & 255)
+    if 192 <= first_octet < 224:
+        return "%d.%d.%d" % (first_octet, (ip >> 16) & 255, (ip >> 8) & 255)
+    return str(first_octet)
+
+
+class NetworkTable:
+    """Longest prefix match of IPv4 addresses over a table of CIDR blocks
+
+    The nested blocks are flattened in disjoint intervals of addresses, each one
+    labelled with the most specific block covering it, so that finding the network
+    of an address is a binary search over the starts of the intervals.
+
+    Parameters
+    ----------
+    networks : iterable, optional
+        (CIDR block, name) pairs, name being None to use the block itself, by
+        default none (classful networks only)
+    """
+
+    def __init__(self, networks=()):
+        blocks = []
+        for cidr, name in networks:
+            network = ipaddress.IPv4Network(cidr, strict=False)
+            start = int(network.network_address)
+            blocks.append((start, start + network.num_addresses, name or str(network)))
+        self.starts = []
+        self.ends = []
+        self.names = []
+        # outer blocks first, so that the blocks they contain are on top of them
+        blocks.sort(key=lambda block: (block[0], -block[1]))
+        stack = []
+        position = 0
+        for start, end, name in blocks:
+            while stack and stack[-1][0] <= start:
+                outer_end, outer_name = stack.pop()
+                self._add_interval(position, outer_end, outer_name)
+                position = max(position, outer_end)
+            if stack:
+                self._add_interval(position, start, stack[-1][1])
+            stack.append((end, name))
+            position = start
+        while stack:
+            outer_end, outer_name = stack.pop()
+            self._add_interval(position, outer_end, outer_name)
+            position = max(position, outer_end)
+
+    def _add_interval(self, start, end, name):
+        if start < end:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.names.append(name)
+
+    @classmethod
+    def load(cls, file_name):
+        """Read a table of CIDR blocks (see the format above)
+
+        Parameters
+        ----------
+        file_name : str
+            name of the file
+
+        Returns
+        -------
+        NetworkTable
+            the table
+
+        Raises
+        ------
+        ValueError
+            if a line is not an IPv4 CIDR block
+        """
+        networks = []
+        with open(file_name) as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                cidr, *name = line.split(None, 1)
+                networks.append((cidr, name[0] if name else None))
+        return cls(networks)
+
+    def lookup(self, ip):
+        """Network of an IPv4 address
+
+        Parameters
+        ----------
+        ip : str
+            IPv4 address
+
+        Returns
+        -------
+        str
+            name of the most specific block of the table containing the address,
+            its classful network if there is none
+        """
+        ip = ip_to_int(ip)
+        i = bisect_right(self.starts, ip) - 1
+        if i >= 0 and ip < self.ends[i]:
+            return self.names[i]
+        return classful_prefix(ip)
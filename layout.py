@@ -0,0 +1,453 @@
+"""
+Positions of the nodes of the graph, computed with numpy
+
+Each subnetwork is drawn as a disc: the node of the network in the middle and its
+devices on concentric rings around it. The first ring has a radius of 1/3 and holds up
+to RING_CAPACITY devices; larger subnetworks get more rings, further out, so that the
+devices stay at least MIN_SPACING apart.
+
+The discs are either placed on a grid whose rows and columns are as large as their
+largest disc (they never overlap), or moved by a force-directed layout of the graph of
+the subnetworks (see force_layout).
+
+When nodes are added to a graph already drawn (see follow.py), extend_layout only
+places the new ones: the nodes already drawn stay where they are.
+"""
+
+from itertools import count
+
+import numpy as np
+
+RING_RADIUS = 1 / 3
+RING_CAPACITY = 64
+MIN_SPACING = 2 * np.pi * RING_RADIUS / RING_CAPACITY
+
+
+def ring_capacities(n_devices):
+    """Radius and capacity of enough rings for a number of devices
+
+    Parameters
+    ----------
+    n_devices : int
+        number of devices of the largest subnetwork
+
+    Returns
+    -------
+    numpy.ndarray
+        radius of each ring
+    numpy.ndarray
+        number of devices each ring can hold
+    """
+    n_rings = 1
+    while True:
+        radii = RING_RADIUS + MIN_SPACING * np.arange(n_rings)
+        capacities = np.floor(2 * np.pi * radii / MIN_SPACING + 1e-9).astype(np.int64)
+        if capacities.sum() >= n_devices:
+            return radii, capacities
+        n_rings *= 2
+
+
+def ring_offsets(counts):
+    """Positions of the devices of the subnetworks around their center
+
+    The devices of a ring are evenly spread on it, starting from the top.
+
+    Parameters
+    ----------
+    counts : numpy.ndarray
+        number of devices of each subnetwork
+
+    Returns
+    -------
+    numpy.ndarray
+        (x, y) offset of each device, the devices of each subnetwork following
+        the ones of the previous subnetwork
+    numpy.ndarray
+        radius of the outer ring of each subnetwork (RING_RADIUS without devices)
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    radii, capacities = ring_capacities(counts.max(initial=0))
+    ring_ends = np.cumsum(capacities)
+    ring_starts = ring_ends - capacities
+
+    subnetwork = np.repeat(np.arange(len(counts)), counts)
+    # position of each device in its subnetwork
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ring = np.searchsorted(ring_ends, position, side="right")
+    # the last ring of a subnetwork is not always full
+    n_ring = np.minimum(capacities[ring], counts[subnetwork] - ring_starts[ring])
+    angle = (position - ring_starts[ring]) * (1 / n_ring) * 2 * np.pi
+    offsets = np.column_stack(
+        (np.sin(angle) * radii[ring], np.cos(angle) * radii[ring])
+    )
+
+    extents = np.full(len(counts), RING_RADIUS)
+    has_devices = counts > 0
+    extents[has_devices] = radii[
+        np.searchsorted(ring_ends, counts[has_devices] - 1, side="right")
+    ]
+    return offsets, extents
+
+
+def grid_centers(extents, lifted=None):
+    """Centers of the subnetworks on a grid
+
+    The subnetworks fill the columns one after the other (the first one alone in
+    its column). Each column is as wide and each row as high as the largest
+    subnetwork it contains, with a margin of half its radius around it: subnetworks
+    with a single ring are one apart.
+
+    Parameters
+    ----------
+    extents : numpy.ndarray
+        radius of each subnetwork
+    lifted : int, optional
+        position of a subnetwork moved up in its column, by default none
+
+    Returns
+    -------
+    numpy.ndarray
+        (x, y) center of each subnetwork
+    """
+    n_subnetworks = len(extents)
+    dim = max(1, round(np.sqrt(n_subnetworks)))
+    i = np.arange(n_subnetworks)
+    columns = (i - 1) // dim
+    rows = i % dim
+    sizes = np.maximum(1, 3 * extents)
+
+    first_column = columns.min()
+    columns -= first_column
+    widths = np.zeros(columns.max() + 1)
+    np.maximum.at(widths, columns, sizes)
+    heights = np.zeros(rows.max() + 1)
+    np.maximum.at(heights, rows, sizes)
+    # with subnetworks of a single ring, the centers are on the integer grid
+    x = np.cumsum(widths) - widths / 2 - widths[0] / 2 + first_column
+    y = np.cumsum(heights) - heights / 2 - heights[0] / 2
+    centers = np.column_stack((x[columns], y[rows]))
+    if lifted is not None:
+        centers[lifted, 1] += dim / 2.5
+    return centers
+
+
+def balanced_cells(positions, n_strips):
+    """Group points in cells holding as many points each
+
+    The points are cut in strips along x, and each strip in as many cells along y.
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        (x, y) position of each point
+    n_strips : int
+        number of strips (and of cells in each strip)
+
+    Returns
+    -------
+    numpy.ndarray
+        cell of each point
+    numpy.ndarray
+        position of each point in its cell
+    """
+    n_points = len(positions)
+    strips = np.empty(n_points, dtype=np.int64)
+    strips[np.argsort(positions[:, 0], kind="stable")] = (
+        np.arange(n_points) * n_strips // n_points
+    )
+    strip_sizes = np.bincount(strips, minlength=n_strips)
+    rank = np.empty(n_points, dtype=np.int64)
+    rank[np.lexsort((positions[:, 1], strips))] = np.arange(n_points) - np.repeat(
+        np.cumsum(strip_sizes) - strip_sizes, strip_sizes
+    )
+    cells = strips * n_strips + rank * n_strips // strip_sizes[strips]
+
+    cell_sizes = np.bincount(cells, minlength=n_strips * n_strips)
+    slots = np.empty(n_points, dtype=np.int64)
+    slots[np.argsort(cells, kind="stable")] = np.arange(n_points) - np.repeat(
+        np.cumsum(cell_sizes) - cell_sizes, cell_sizes
+    )
+    return cells, slots
+
+
+def repulsion(positions, masses, distance):
+    """Repulsion of groups of points by the other points of their group
+
+    Parameters
+    ----------
+    positions : numpy.ndarray
+        (x, y) position of the points, shaped (groups, points, 2)
+    masses : numpy.ndarray
+        mass of the points, shaped (groups, points)
+    distance : float
+        ideal distance between two points
+
+    Returns
+    -------
+    numpy.ndarray
+        displacement of each point, shaped like positions
+    """
+    dx = positions[:, :, None, 0] - positions[:, None, :, 0]
+    dy = positions[:, :, None, 1] - positions[:, None, :, 1]
+    # a point does not repel itself, its delta being 0
+    strength = distance**2 * masses[:, None, :] / (dx * dx + dy * dy).clip(1e-9)
+    return np.stack(((dx * strength).sum(axis=2), (dy * strength).sum(axis=2)), axis=2)
+
+
+def force_layout(centers, extents, links, weights, iterations=50):
+    """Move the subnetworks with a force-directed layout (Fruchterman-Reingold)
+
+    Linked subnetworks attract each other and all subnetworks repel each other,
+    the larger ones more. Like in the Barnes-Hut algorithm, the repulsion of far
+    away subnetworks is approximated: the n subnetworks are grouped in about n^(2/3)
+    cells of as many subnetworks (see balanced_cells), the cells repel each other
+    from their center of mass and only the subnetworks of the same cell repel each
+    other one by one, so that a step costs about n^(4/3) instead of n^2.
+
+    Parameters
+    ----------
+    centers : numpy.ndarray
+        initial (x, y) center of each subnetwork (see grid_centers)
+    extents : numpy.ndarray
+        radius of each subnetwork
+    links : numpy.ndarray
+        pairs of positions of linked subnetworks
+    weights : numpy.ndarray
+        number of links between the devices of each pair
+    iterations : int, optional
+        number of steps of the layout, by default 50
+
+    Returns
+    -------
+    numpy.ndarray
+        (x, y) center of each subnetwork
+    """
+    positions = np.array(centers, dtype=float)
+    n_subnetworks = len(positions)
+    if n_subnetworks < 2:
+        return positions
+    sizes = np.maximum(1, 3 * extents)
+    distance = sizes.mean()
+    masses = sizes / distance
+    n_strips = max(1, int(round(n_subnetworks ** (1 / 3))))
+    n_cells = n_strips * n_strips
+    weights = np.log1p(weights)
+    temperature = np.ptp(positions, axis=0).max() / 10 + distance
+    cooling = (0.01) ** (1 / iterations)
+    for _ in range(iterations):
+        cells, slots = balanced_cells(positions, n_strips)
+
+        # repulsion between the cells, from their center of mass
+        cell_masses = np.bincount(cells, masses, n_cells)
+        centers_of_mass = (
+            np.column_stack(
+                (
+                    np.bincount(cells, masses * positions[:, 0], n_cells),
+                    np.bincount(cells, masses * positions[:, 1], n_cells),
+                )
+            )
+            / cell_masses.clip(1e-9)[:, None]
+        )
+        displacement = repulsion(centers_of_mass[None], cell_masses[None], distance)[0][
+            cells
+        ]
+
+        # repulsion inside each cell, the cells being padded with massless points
+        members = np.full((n_cells, slots.max() + 1), n_subnetworks)
+        members[cells, slots] = np.arange(n_subnetworks)
+        padded_positions = np.vstack((positions, [[0, 0]]))
+        padded_masses = np.append(masses, 0)
+        near = repulsion(padded_positions[members], padded_masses[members], distance)
+        displacement += near[cells, slots]
+
+        # attraction of the linked subnetworks
+        if len(links):
+            delta = positions[links[:, 0]] - positions[links[:, 1]]
+            length = np.sqrt((delta**2).sum(axis=1))
+            pull = delta * (length * weights / distance)[:, None]
+            np.add.at(displacement, links[:, 0], -pull)
+            np.add.at(displacement, links[:, 1], pull)
+
+        length = np.sqrt((displacement**2).sum(axis=1)).clip(1e-9)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return positions
+
+
+def subnetwork_links(graph, subnetworks):
+    """Pairs of subnetworks whose devices are linked
+
+    Parameters
+    ----------
+    graph : networkx.Graph
+        graph of the network
+    subnetworks : dict
+        index of the subnetwork associated to all devices in the subnetwork
+
+    Returns
+    -------
+    numpy.ndarray
+        pairs of positions (in subnetworks) of linked subnetworks
+    numpy.ndarray
+        number of links between the devices of each pair
+    """
+    keys = list(subnetworks)
+    n_nodes = max(
+        [max(graph, default=0), max(keys)]
+        + [max(devices) for devices in subnetworks.values() if devices]
+    )
+    membership = np.full(n_nodes + 1, -1)
+    for position, key in enumerate(keys):
+        membership[key] = position
+    for position, key in enumerate(keys):
+        membership[subnetworks[key]] = position
+    edges = np.array(graph.edges, dtype=int).reshape(-1, 2)
+    if len(edges) == 0:
+        return np.zeros((0, 2), dtype=int), np.zeros(0)
+    pairs = np.sort(membership[edges], axis=1)
+    pairs = pairs[(pairs[:, 0] != pairs[:, 1]) & (pairs[:, 0] >= 0)]
+    links, weights = np.unique(pairs, axis=0, return_counts=True)
+    return links, weights
+
+
+def subnetwork_layout(subnetworks, scale=1, graph=None):
+    """Position of every node
+
+    Parameters
+    ----------
+    subnetworks : dict
+        index of the subnetwork associated to all devices in the subnetwork (the
+        subnetwork 0 being the local network)
+    scale : float, optional
+        scale of the graph, by default 1
+    graph : networkx.Graph, optional
+        graph of the network to place the subnetworks with force_layout, by default
+        they are placed on a grid
+
+    Returns
+    -------
+    dict
+        index of the nodes linked to their (x, y) position
+    """
+    keys = list(subnetworks)
+    counts = np.array([len(subnetworks[key]) for key in keys], dtype=np.int64)
+    offsets, extents = ring_offsets(counts)
+    lifted = keys.index(0) if 0 in subnetworks else None
+    centers = grid_centers(extents, lifted)
+    if graph is not None:
+        links, weights = subnetwork_links(graph, subnetworks)
+        centers = force_layout(centers, extents, links, weights)
+    positions = (
+        np.concatenate((centers, np.repeat(centers, counts, axis=0) + offsets)) * scale
+    )
+    nodes = keys + [device for key in keys for device in subnetworks[key]]
+    # the devices are placed after the centers: a network that is also a device of
+    # another subnetwork (the router) stays a device
+    return dict(zip(nodes, map(tuple, positions.tolist())))
+
+
+def free_ring_places(offsets, n_new):
+    """Places on the rings of a subnetwork that no device takes yet
+
+    The places of a ring are RING_CAPACITY apart on the first ring (like the devices
+    of a full ring), starting from the top. A place is taken if a device is less than
+    one place away from it, the devices of a ring that is not full being further
+    apart. Rings are added if there are not enough free places.
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        (x, y) offset of the devices already placed around the node of the subnetwork
+    n_new : int
+        number of places needed
+
+    Returns
+    -------
+    numpy.ndarray
+        (x, y) offset of the first n_new free places
+    """
+    n_devices = len(offsets) + n_new
+    while True:
+        radii, capacities = ring_capacities(n_devices)
+        ring_starts = np.cumsum(capacities) - capacities
+        ring = np.abs(
+            np.sqrt((offsets**2).sum(axis=1))[:, None] - radii[None, :]
+        ).argmin(axis=1)
+        # position of each device on its ring, in places
+        position = (
+            np.arctan2(offsets[:, 0], offsets[:, 1])
+            % (2 * np.pi)
+            * capacities[ring]
+            / (2 * np.pi)
+        )
+        taken = np.zeros(capacities.sum(), dtype=bool)
+        for neighbor in (np.floor(position + 1e-6), np.ceil(position - 1e-6)):
+            taken[ring_starts[ring] + neighbor.astype(np.int64) % capacities[ring]] = (
+                True
+            )
+        free = np.flatnonzero(~taken)
+        if len(free) >= n_new:
+            break
+        n_devices = capacities.sum() + 1
+    free = free[:n_new]
+    ring = np.searchsorted(ring_starts + capacities, free, side="right")
+    angle = (free - ring_starts[ring]) / capacities[ring] * 2 * np.pi
+    return np.column_stack((np.sin(angle) * radii[ring], np.cos(angle) * radii[ring]))
+
+
+def extend_layout(positions, subnetworks, scale=1):
+    """Position of every node, the nodes already placed staying where they are
+
+    The new subnetworks go on the free cells of a grid one apart (like subnetworks of
+    a single ring in grid_centers): a cell is free if no node lies within half a cell
+    of its center. The new devices of a subnetwork go on the free places of the rings
+    around its node (see free_ring_places), or are spread on them like in
+    subnetwork_layout if it has no device yet.
+
+    Parameters
+    ----------
+    positions : dict
+        index of the nodes already placed linked to their (x, y) position
+    subnetworks : dict
+        index of the subnetwork associated to all devices in the subnetwork
+    scale : float, optional
+        scale of the graph, by default 1
+
+    Returns
+    -------
+    dict
+        index of the nodes linked to their (x, y) position
+    """
+    positions = dict(positions)
+    placed = np.array(list(positions.values()), dtype=float).reshape(-1, 2) / scale
+    occupied = set(map(tuple, np.rint(placed).astype(np.int64).tolist()))
+    dim = max(1, round(np.sqrt(len(subnetworks))))
+    # cells in the order of grid_centers: column after column
+    cells = (divmod(i, dim) for i in count())
+    for key in subnetworks:
+        if key in positions:
+            continue
+        cell = next(cell for cell in cells if cell not in occupied)
+        occupied.add(cell)
+        positions[key] = (cell[0] * scale, cell[1] * scale)
+
+    for key, devices in subnetworks.items():
+        new_devices = [device for device in devices if device not in positions]
+        if not new_devices:
+            continue
+        center = np.array(positions[key], dtype=float) / scale
+        offsets = (
+            np.array(
+                [positions[device] for device in devices if device in positions],
+                dtype=float,
+            ).reshape(-1, 2)
+            / scale
+            - center
+        )
+        if len(offsets):
+            new_offsets = free_ring_places(offsets, len(new_devices))
+        else:
+            new_offsets, _ = ring_offsets([len(new_devices)])
+        new_positions = (center + new_offsets) * scale
+        positions.update(zip(new_devices, map(tuple, new_positions.tolist())))
+    return positions
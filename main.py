@@ -1,10 +1,30 @@
 """Takes a .json file with log data and plots a graph representing the topology of the network
 Usage:
 =====
-    python3 main.py file_name.json save_file_name
+    python3 main.py file_name.json save_file_name [--start DATE] [--end DATE]
+                    [--networks file_name] [--workers N] [--chunk-size N]
+                    [--window SECONDS] [--step SECONDS] [--layout {grid,force}]
+                    [--collections] [--follow] [--interval SECONDS]
 
-    file_name: name of the file (with the relative path) from which we want data
+    file_name: name of the file (with the relative path) from which we want data (.json, .ndjson or .npz)
     save_file_name: name of the file where data are saved
+    --start, --end: only use the packets captured during this period (timestamp or
+        local date such as '2023-06-26 10:00')
+    --networks: table of the CIDR blocks grouping the devices beyond the router (see
+        ip_networks.py), by default they are grouped by class
+    --workers: number of processes grouping the packets in flows, by default 1
+    --chunk-size: number of packets grouped at once by each process, by default 100000
+    --window: also save snapshots of the graph over sliding windows of this many
+        seconds (see snapshots.py, the packets are then grouped by a single process)
+    --step: time between two snapshots in seconds, by default the length of a window
+    --layout: place the networks on a grid (grid, by default) or with a
+        force-directed layout of the links between them (force, see layout.py)
+    --collections: draw the nodes and the edges as two collections (faster for big
+        graphs, see collection_graph.py), the nodes can not be dragged
+    --follow: follow a .ndjson file still being written by from_pcap_to_json.py
+        --resume and update the graph as packets are added (see follow.py), the data
+        are saved when the figure is closed
+    --interval: time between two reads of the file with --follow, by default 5 seconds
 """
 
 __authors__ = "Clara Moy"
@@ -12,17 +32,28 @@ __contact__ = "c.m0y@yahoo.com"
 __copyright__ = "MIT"
 __date__ = "2023-06-26"
 
-import math
-import sys
+import argparse
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from multiprocessing import Pool
 from time import time
 
+from collection_graph import CollectionGraph
+from from_pcap_to_json import npz_part_file_names, parse_time
+from highlight import HighlightMapping
+from ip_networks import classful_prefix, ip_to_int, NetworkTable
 import json
+from layout import subnetwork_layout
 import matplotlib.pyplot as plt
 from modified_netgraph import NewInteractiveGraph
 import networkx as nx
+from node_registry import NodeRegistry
 import numpy as np
 import pandas as pd
+from packet_columns import PacketColumns
 import pickle
+from snapshots import build_snapshots, SnapshotStepper
 from zoom import ZoomPan
 
 __authors__ = "Clara Moy"
@@ -33,15 +64,11 @@ __date__ = "2023-06-26"
 
 np.seterr(divide="ignore", invalid="ignore")
 
-list_nodes = []
-subnetworks = {0: []}
-mac = {}
-ipv4 = {}
-table = {}
-mapping = {}
+ROUTER = 0
 
-router = 0
-mac[router] = []
+
+class RouterNotFoundError(ValueError):
+    """No device of the capture looks like the router"""
 
 
 def extract_data(data_file_name, ethertypes_data_file_name):
@@ -50,7 +77,7 @@ def extract_data(data_file_name, ethertypes_data_file_name):
     Parameters
     ----------
     data_file_name : str
-        file name of the .json file obtained after executing from_json_to_pacp.py
+        file name of the .json, .ndjson or .npz file obtained after executing from_json_to_pacp.py
     ethertypes_data_file_name : str
         name of the ethertypes data file
 
@@ -63,7 +90,15 @@ def extract_data(data_file_name, ethertypes_data_file_name):
     """
     print("Extracting data...")
 
-    data = load_json(data_file_name)
+    if data_file_name.endswith(".npz"):
+        # with the parts written by from_pcap_to_json.py --resume
+        data = {
+            "paquets": PacketColumns.load(
+                data_file_name, npz_part_file_names(data_file_name)
+            )
+        }
+    else:
+        data = load_json(data_file_name)
     ethertypes_data = load_json(ethertypes_data_file_name)
     return data, ethertypes_data
 
@@ -71,190 +106,747 @@ def extract_data(data_file_name, ethertypes_data_file_name):
 def load_json(file_name):
     """Load data from a /json file
 
+    .ndjson files (one packet per line) are not loaded in memory: the packets are
+    read lazily each time they are iterated over.
+
     Parameters
     ----------
     file_name : str
-        name of the .json file
+        name of the .json or .ndjson file
 
     Returns
     -------
     dict
         data from the .json file sored in a dictionnary
     """
+    if file_name.endswith(".ndjson"):
+        return {"paquets": NDJSONPackets(file_name)}
     with open(file_name) as file:
         return json.load(file)
 
 
-def find_router(data, mac, list_nodes, router):
-    """Find the router
+class NDJSONPackets:
+    """Packets of a .ndjson file, decoded one line at a time when iterated over
 
     Parameters
     ----------
-    data : dict
+    file_name : str
+        name of the .ndjson file
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def __iter__(self):
+        with open(self.file_name) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_from(self, offset):
+        """Decode the complete lines after an offset (the last line may still be
+        being written)
+
+        Parameters
+        ----------
+        offset : int
+            offset of the first line to read
+
+        Returns
+        -------
+        list
+            packets of the complete lines
+        int
+            offset after the last complete line
+        """
+        packets = []
+        with open(self.file_name, "rb") as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    packets.append(json.loads(line))
+        return packets, offset
+
+
+def capture_period(packets):
+    """Find the timestamps of the first and last packets of the capture
+
+    Parameters
+    ----------
+    packets : iterable
         data about the packets
-    mac : dict
-        dict containing the mac adresses of the nodes associated to their index in list_nodes
-    list_nodes : list
-        list of the identifiers of the nodes (MAC or IP adresses)
-    router : int
-        index of the router in list_nodes
+
+    Returns
+    -------
+    str
+        timestamp of the first packet (None if there is no packet)
+    str
+        timestamp of the last packet (None if there is no packet)
+    """
+    if isinstance(packets, PacketColumns):
+        if len(packets) == 0:
+            return None, None
+        return packets.ts_to_str(0), packets.ts_to_str(-1)
+    if isinstance(packets, list):
+        if not packets:
+            return None, None
+        return packets[0]["ts"], packets[-1]["ts"]
+    capture_beginning = capture_end = None
+    for packet in packets:
+        if capture_beginning is None:
+            capture_beginning = packet["ts"]
+        capture_end = packet["ts"]
+    return capture_beginning, capture_end
+
+
+class PeriodPackets:
+    """Packets captured during a period of time, filtered each time they are iterated over
+
+    Parameters
+    ----------
+    packets : iterable
+        data about the packets
+    start : str
+        beginning of the period (formatted like the "ts" of the packets) or None
+    end : str
+        end of the period (formatted like the "ts" of the packets) or None
+    """
+
+    def __init__(self, packets, start, end):
+        self.packets = packets
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        for packet in self.packets:
+            if (self.start is None or packet["ts"] >= self.start) and (
+                self.end is None or packet["ts"] <= self.end
+            ):
+                yield packet
+
+
+def select_period(packets, start_time=None, end_time=None):
+    """Keep only the packets captured during a period of time
+
+    Parameters
+    ----------
+    packets : iterable
+        data about the packets
+    start_time : float, optional
+        beginning of the period (timestamp), by default the beginning of the capture
+    end_time : float, optional
+        end of the period (timestamp), by default the end of the capture
+
+    Returns
+    -------
+    iterable
+        data about the packets captured during the period
+    """
+    if start_time is None and end_time is None:
+        return packets
+    if isinstance(packets, PacketColumns):
+        ts = packets["ts"]
+        mask = np.ones(len(packets), dtype=bool)
+        if start_time is not None:
+            mask &= ts >= start_time
+        if end_time is not None:
+            mask &= ts <= end_time
+        return packets.select(mask)
+    # "ts" strings are compared directly: their format keeps the chronological order
+    start = None if start_time is None else str(datetime.fromtimestamp(start_time))
+    end = None if end_time is None else str(datetime.fromtimestamp(end_time))
+    selected = PeriodPackets(packets, start, end)
+    if isinstance(packets, list):
+        return list(selected)
+    return selected
+
+
+FLOW_FIELDS = ("src", "dst", "type", "ip_src", "ip_dst", "port_src", "port_dst")
+COUNT, FIRST_TS, LAST_TS, LAST_POSITION, BYTES = range(5)
+HTTP_PORTS = (80, 443)
+NO_ETHERTYPE = 65536
+TABLE_COLUMNS = ["distance", "port src", "port dst", "device dst", "packets", "bytes"]
+
+
+def port_bucket(port):
+    """Group the ports the way they are shown in the tables
+
+    Parameters
+    ----------
+    port : int or None
+        port of a packet
+
+    Returns
+    -------
+    int, str or None
+        the port if it is a well-known port (up to 1024), ">1024" otherwise
+    """
+    if port is not None and port > 1024:
+        return ">1024"
+    return port
+
+
+def aggregate_flows(packets):
+    """Group the packets in flows
+
+    Packets with the same MAC addresses, ethertype, IP addresses and port buckets
+    give the same nodes, edges, table rows and mapping: they are only counted.
+
+    Parameters
+    ----------
+    packets : iterable
+        data about the packets
+
+    Returns
+    -------
+    dict
+        flows (tuples of the values of FLOW_FIELDS), in the order in which they were
+        first seen, linked to their number of packets, the timestamps of their first
+        and last packets, the position of their last packet and their number of bytes
+    """
+    if isinstance(packets, PacketColumns):
+        # the timestamps are only formatted for the first and last packets of the flows
+        rows = packets.rows()
+    else:
+        rows = (
+            (
+                packet["ts"],
+                packet["src"],
+                packet["dst"],
+                packet["type"],
+                packet["ip_src"],
+                packet["ip_dst"],
+                packet["port_src"],
+                packet["port_dst"],
+                packet.get("length"),
+            )
+            for packet in packets
+        )
+    flows = {}
+    for position, row in enumerate(rows):
+        ts = row[0]
+        flow = row[1:6] + (port_bucket(row[6]), port_bucket(row[7]))
+        # files written before the length was recorded count no bytes
+        length = row[8] or 0
+        stats = flows.get(flow)
+        if stats is None:
+            flows[flow] = [1, ts, ts, position, length]
+        else:
+            stats[COUNT] += 1
+            stats[LAST_TS] = ts
+            stats[LAST_POSITION] = position
+            stats[BYTES] += length
+    if isinstance(packets, PacketColumns):
+        for stats in flows.values():
+            stats[FIRST_TS] = str(datetime.fromtimestamp(stats[FIRST_TS]))
+            stats[LAST_TS] = str(datetime.fromtimestamp(stats[LAST_TS]))
+    return flows
+
+
+def add_gateway_candidates(gateway_candidates, flows):
+    """Record the http and https answers of the flows
+
+    A router forwards the answers of the web servers of several networks: they come
+    from its MAC address with IPv4 addresses from different (classful) networks. The
+    IPv6 addresses are left out, so that a local server answering on both IPv4 and
+    IPv6 is not taken for the router.
+
+    Parameters
+    ----------
+    gateway_candidates : dict
+        MAC addresses linked to the set of the networks of their IPv4 addresses,
+        updated in place
+    flows : dict
+        flows of the drawn packets (see aggregate_flows)
+    """
+    for flow in flows:
+        # the MAC address, IP address and port of the sender are in the flow
+        if flow[5] not in HTTP_PORTS:
+            continue
+        prefixes = gateway_candidates.setdefault(flow[0], set())
+        ip_src = flow[3]
+        if ip_src is not None and ":" not in ip_src and ip_src != "0.0.0.0":
+            prefixes.add(classful_prefix(ip_to_int(ip_src)))
+
+
+def find_gateways(gateway_candidates):
+    """Find the MAC addresses of the router
+
+    Parameters
+    ----------
+    gateway_candidates : dict
+        MAC addresses linked to the set of the networks of their IPv4 addresses (see
+        add_gateway_candidates), in the order in which they were first seen
+
+    Returns
+    -------
+    list
+        MAC addresses sending answers from several IPv4 networks, in the order in which
+        they were first seen (the only candidate if there is a single one)
 
     Raises
     ------
-    NotImplementedError
+    RouterNotFoundError
         if the router is not found
     """
-    print("Finding router...")
-    router_ip = find_http_communication(data, mac, router)
-    for potential_router in mac[router]:
-        try:
-            index = mac[router].index(potential_router)
-            for ip in router_ip[index]:
-                try:
-                    for other_ip in router_ip[index]:
-                        if (
-                            ip is not None
-                            and ip != "0.0.0.0"
-                            and other_ip is not None
-                            and other_ip != "0.0.0.0"
-                        ):
-                            if ip[:3] != other_ip[:3]:
-                                mac[router] = [potential_router]
-                                router_ip = []
-                                break
-                except IndexError:
-                    break
-        except ValueError:
-            break
+    gateways = [
+        src for src, prefixes in gateway_candidates.items() if len(prefixes) > 1
+    ]
+    if not gateways and len(gateway_candidates) == 1:
+        gateways = list(gateway_candidates)
+    if not gateways:
+        raise RouterNotFoundError(
+            "Failed to find the router: no device sent http or https answers from "
+            "several IPv4 networks. Use a capture (or a period) with web traffic "
+            "going through the router."
+        )
+    return gateways
 
-    if len(mac[router]) != 1:
-        raise NotImplementedError("Failed to find router")
-    else:
-        list_nodes.append(mac[router][0])
 
+def add_router(gateways, list_nodes, mac, router):
+    """Add the router to the nodes
 
-def create_graph(
-    data,
-    ethertypes_data,
-    list_nodes,
-    mac,
-    ipv4,
-    subnetworks,
-    mapping,
-    table,
-):
-    """Create graph
+    All the MAC addresses of the router (several interfaces, or redundant gateways)
+    are the same node.
+
+    Parameters
+    ----------
+    gateways : list
+        MAC addresses of the router (see find_gateways)
+    list_nodes : NodeRegistry
+        list of the identifiers of the nodes (MAC or IP adresses), still empty
+    mac : dict
+        dict containing the mac adresses of the nodes associated to their index in list_nodes
+    router : int
+        index of the router in list_nodes
+    """
+    list_nodes.append(gateways[0])
+    for gateway in gateways[1:]:
+        list_nodes.add_alias(gateway, router)
+    mac[router] = gateways
+
+
+def ethertype_table(ethertypes_data):
+    """Build a lookup table of the names of the ethertypes
 
     Parameters
     ----------
-    data : dict
-        data about the packets
     ethertypes_data : dict
         ethertypes
+
+    Returns
+    -------
+    list
+        name of each ethertype at its index, "unknown" for the ethertypes that are
+        not in ethertypes_data. The name for packets without ethertype is at index
+        NO_ETHERTYPE.
+    """
+    names = ["unknown"] * (NO_ETHERTYPE + 1)
+    for eth_type, name in ethertypes_data.items():
+        if eth_type == "None":
+            names[NO_ETHERTYPE] = name
+        elif eth_type.isdigit() and int(eth_type) < NO_ETHERTYPE:
+            names[int(eth_type)] = name
+    return names
+
+
+def get_ethertype(ethertypes, eth_type):
+    """Name of the ethertype of a packet
+
+    Parameters
+    ----------
+    ethertypes : list
+        lookup table of the ethertypes (see ethertype_table)
+    eth_type : int or None
+        ethertype of the packet
+
+    Returns
+    -------
+    str
+        name of the ethertype
+    """
+    if eth_type is None:
+        return ethertypes[NO_ETHERTYPE]
+    return ethertypes[eth_type]
+
+
+def is_multicast(ip):
+    """Check if an IP address is a multicast address (224.0.0.0/4 or ff02::/16)"""
+    if ":" in ip:
+        return ip[:5] == "ff02:"
+    return 224 <= int(ip[: ip.index(".")]) < 240
+
+
+def is_drawn(packet):
+    """Check if a packet links two devices (no multicast nor broadcast)
+
+    PacketColumns.unicast_mask does the same on all the packets at once.
+    """
+    return (
+        packet["ip_src"] is not None
+        and packet["ip_dst"] is not None
+        and not is_multicast(packet["ip_src"])
+        and not is_multicast(packet["ip_dst"])
+        and packet["src"] != "ff:ff:ff:ff:ff:ff"
+        and packet["dst"] != "ff:ff:ff:ff:ff:ff"
+    )
+
+
+def set_last_ipv4(flows, ethertypes, list_nodes, ipv4):
+    """Give each MAC address the IP address of the last packet it was seen in
+
+    process_data keeps the IP address of the last packet of each device, but the
+    flows are processed in the order of their first packet.
+
+    Parameters
+    ----------
+    flows : dict
+        drawn flows linked to their stats (see aggregate_flows)
+    ethertypes : list
+        lookup table of the ethertypes (see ethertype_table)
     list_nodes : list
         list of the identifiers of the nodes (MAC or IP adresses)
-    mac : dict
-        contain all already seen mac adresses associated to their index in list_nodes
     ipv4 : dict
         contain all ipV4 adresses associated with their index in list_nodes
+    """
+    for flow, stats in sorted(flows.items(), key=lambda item: item[1][LAST_POSITION]):
+        packet = dict(zip(FLOW_FIELDS, flow))
+        ethertype = get_ethertype(ethertypes, packet["type"])
+        for src_or_dst in ("src", "dst"):
+            index = list_nodes.index(packet[src_or_dst])
+            ipv4[index] = [None]
+            ipv4_device = packet["ip_" + src_or_dst]
+            if ethertype != "ipV6" and ipv4_device is not None:
+                ipv4[index].append(ipv4_device)
+
+
+def merge_flows(flows, new_flows, position_offset=0):
+    """Add the flows of packets captured after the ones already grouped
+
+    Parameters
+    ----------
+    flows : dict
+        flows linked to their stats (see aggregate_flows), updated in place
+    new_flows : dict
+        flows of the new packets linked to their stats
+    position_offset : int, optional
+        number of packets grouped in flows before the new ones, by default 0
+    """
+    for flow, stats in new_flows.items():
+        known = flows.get(flow)
+        if known is None:
+            flows[flow] = [
+                stats[COUNT],
+                stats[FIRST_TS],
+                stats[LAST_TS],
+                stats[LAST_POSITION] + position_offset,
+                stats[BYTES],
+            ]
+        else:
+            known[COUNT] += stats[COUNT]
+            known[LAST_TS] = stats[LAST_TS]
+            known[LAST_POSITION] = stats[LAST_POSITION] + position_offset
+            known[BYTES] += stats[BYTES]
+
+
+class GraphBuilder:
+    """Builds the graph of a network from batches of packets
+
+    The packets of each batch are grouped in flows (see aggregate_flows) and
+    candidates for the router are collected at the same time. finalize adds the flows
+    fed since its last call to the graph, the tables and the mapping, finding the
+    router the first time. Builders fed with different packets (parts of a capture
+    decoded by different processes, or several captures) can be merged before or
+    after being finalized.
+
+    Parameters
+    ----------
+    ethertypes_data : dict
+        ethertypes
+    networks : NetworkTable, optional
+        networks of the devices beyond the router, by default their classful
+        networks
+
+    Attributes
+    ----------
+    graph : networkx.Graph
+        graph of the network
+    list_nodes : NodeRegistry
+        list of the identifiers of the nodes (MAC or IP adresses)
     subnetworks : dict
         index of the subnetwork associated to all devices in the subnetwork
-    mapping : dict
-        contains mapping data linked to the index of the node
+    mac : dict
+        mac adresses of the nodes associated to their index in list_nodes
+    ipv4 : dict
+        ip adresses of the nodes associated to their index in list_nodes
     table : dict
-        index in list_nodes linked to the info wanted in the table
-
-    Returns
-    -------
-    networkx.classes.graph.Graph
-        the graph we want to plot
+        index in list_nodes linked to the rows of its table
+    mapping : HighlightMapping
+        nodes and edges to emphasize when clicking on a node
+    flow_edges : dict
+        flows added to the graph linked to the edges they are drawn with
     """
-    print("Creating graph...")
-
-    ports = {}
-    prefix_to_router_index = {}
-    graph = nx.Graph()
-    for packet in data["paquets"]:
-        try:
-            ethertype = ethertypes_data[str(packet["type"])]
-        except (KeyError, TypeError):
-            ethertype = "unknown"
-        if (
-            packet["ip_src"] is not None
-            and packet["ip_dst"] is not None
-            and packet["ip_src"][:4] != "ff02"
-            and packet["ip_dst"][:4] != "ff02"
-            and packet["ip_src"][:3] not in [str(i) for i in range(224, 240)]
-            and packet["ip_dst"][:3] not in [str(i) for i in range(224, 240)]
-            and packet["src"] != "ff:ff:ff:ff:ff:ff"
-            and packet["dst"] != "ff:ff:ff:ff:ff:ff"
-        ):
+
+    __slots__ = (
+        "ethertypes",
+        "networks",
+        "graph",
+        "list_nodes",
+        "subnetworks",
+        "mac",
+        "ipv4",
+        "table",
+        "mapping",
+        "prefix_to_router_index",
+        "flows",
+        "pending_flows",
+        "gateway_candidates",
+        "n_packets",
+        "flow_edges",
+    )
+
+    def __init__(self, ethertypes_data, networks=None):
+        self.ethertypes = ethertype_table(ethertypes_data)
+        self.networks = NetworkTable() if networks is None else networks
+        self.graph = nx.Graph()
+        self.list_nodes = NodeRegistry()
+        self.subnetworks = {0: []}
+        self.mac = {ROUTER: []}
+        self.ipv4 = {}
+        self.table = {}
+        self.mapping = HighlightMapping(ROUTER, self.graph)
+        self.prefix_to_router_index = {}
+        # every flow fed to the builder (to merge it into another one) and the ones
+        # not added to the graph yet
+        self.flows = {}
+        self.pending_flows = {}
+        self.gateway_candidates = {}
+        self.n_packets = 0
+        self.flow_edges = {}
+
+    def feed(self, packets):
+        """Group a batch of packets in flows
+
+        Parameters
+        ----------
+        packets : iterable
+            data about the packets, captured after the ones already fed
+
+        Returns
+        -------
+        dict
+            flows of the batch that are drawn, linked to their stats (see
+            aggregate_flows)
+        """
+        if isinstance(packets, PacketColumns):
+            packets = packets.select(packets.unicast_mask())
+            flows = aggregate_flows(packets)
+            n_packets = len(packets)
+        else:
+            flows = aggregate_flows(packets)
+            n_packets = sum(stats[COUNT] for stats in flows.values())
+            flows = {
+                flow: stats
+                for flow, stats in flows.items()
+                if is_drawn(dict(zip(FLOW_FIELDS, flow)))
+            }
+        # from the drawn packets only, whatever the format
+        add_gateway_candidates(self.gateway_candidates, flows)
+        self._add_flows(flows, n_packets)
+        return flows
+
+    def merge(self, other):
+        """Add the packets fed to another builder
+
+        Parameters
+        ----------
+        other : GraphBuilder
+            builder fed with packets captured after the ones of this builder
+
+        Returns
+        -------
+        GraphBuilder
+            this builder
+        """
+        for src, prefixes in other.gateway_candidates.items():
+            self.gateway_candidates.setdefault(src, set()).update(prefixes)
+        self._add_flows(other.flows, other.n_packets)
+        return self
+
+    def _add_flows(self, flows, n_packets):
+        merge_flows(self.flows, flows, self.n_packets)
+        merge_flows(self.pending_flows, flows, self.n_packets)
+        self.n_packets += n_packets
+
+    def finalize(self):
+        """Add the flows fed since the last call to the graph
+
+        Returns
+        -------
+        networkx.classes.graph.Graph
+            the graph we want to plot
+
+        Raises
+        ------
+        RouterNotFoundError
+            if the router is not found (the flows are kept for the next call)
+        """
+        print("Creating graph...")
+        if len(self.list_nodes) == 0:
+            print("Finding router...")
+            add_router(
+                find_gateways(self.gateway_candidates),
+                self.list_nodes,
+                self.mac,
+                ROUTER,
+            )
+        ports = {}
+        for flow, stats in self.pending_flows.items():
+            packet = dict(zip(FLOW_FIELDS, flow))
+            ethertype = get_ethertype(self.ethertypes, packet["type"])
             src_index, src_dist_index, src_ntwk_index, port_src = process_data(
                 packet,
                 "src",
-                list_nodes,
-                mac,
+                self.list_nodes,
+                self.mac,
                 ethertype,
-                ipv4,
+                self.ipv4,
                 ports,
-                prefix_to_router_index,
-                subnetworks,
+                self.prefix_to_router_index,
+                self.subnetworks,
+                self.networks,
             )
             dst_index, dst_dist_index, dst_ntwk_index, port_dst = process_data(
                 packet,
                 "dst",
-                list_nodes,
-                mac,
+                self.list_nodes,
+                self.mac,
                 ethertype,
-                ipv4,
+                self.ipv4,
                 ports,
-                prefix_to_router_index,
-                subnetworks,
+                self.prefix_to_router_index,
+                self.subnetworks,
+                self.networks,
             )
             update_table(
-                table, list_nodes, src_dist_index, port_src, dst_dist_index, port_dst
+                self.table,
+                self.list_nodes,
+                src_dist_index,
+                port_src,
+                dst_dist_index,
+                port_dst,
+                stats[COUNT],
+                stats[BYTES],
             )
-            update_mapping(
-                src_index, src_ntwk_index, src_dist_index, dst_index, graph, mapping
+            self.flow_edges[flow] = update_mapping(
+                src_index,
+                src_ntwk_index,
+                src_dist_index,
+                dst_index,
+                self.graph,
+                self.mapping,
             )
-            update_mapping(
-                dst_index, dst_ntwk_index, dst_dist_index, src_index, graph, mapping
+            self.flow_edges[flow] += update_mapping(
+                dst_index,
+                dst_ntwk_index,
+                dst_dist_index,
+                src_index,
+                self.graph,
+                self.mapping,
             )
-    ipv4[router] = None
-    ports[router] = None
-    return graph
+        set_last_ipv4(self.pending_flows, self.ethertypes, self.list_nodes, self.ipv4)
+        self.mac[ROUTER] = ", ".join(self.list_nodes.names(ROUTER))
+        self.ipv4[ROUTER] = None
+        self.pending_flows = {}
+        return self.graph
+
+
+def feed_chunk(packets):
+    """Group a chunk of packets in flows (run by the worker processes)
+
+    Parameters
+    ----------
+    packets : iterable
+        data about the packets of the chunk
+
+    Returns
+    -------
+    GraphBuilder
+        builder fed with the packets, to merge in the builder of the graph
+    """
+    # only the flows are merged: the ethertypes and networks are not needed here
+    builder = GraphBuilder({})
+    builder.feed(packets)
+    return builder
 
 
-def find_http_communication(data, mac, router):
-    """Find if the packet contains a http communication
+def split_packets(packets, chunk_size):
+    """Split packets in chunks of consecutive packets
 
     Parameters
     ----------
-    data : dict
+    packets : iterable
         data about the packets
-    mac : dict
-        dict containing the mac adresses of the nodes associated to their index in list_nodes
-    router : int
-        index of the router in list_nodes
+    chunk_size : int
+        number of packets in each chunk
+
+    Yields
+    ------
+    PacketColumns or list
+        packets of each chunk
+    """
+    if isinstance(packets, PacketColumns):
+        yield from packets.chunks(chunk_size)
+        return
+    packets = iter(packets)
+    chunk = list(islice(packets, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(packets, chunk_size))
+
+
+def feed_parallel(builder, packets, workers, chunk_size=100000):
+    """Feed packets to a builder, grouping them in flows with several processes
+
+    The packets are split in chunks of consecutive packets, grouped in flows by the
+    worker processes. Their builders are merged in the order of the chunks, so the
+    nodes get the same indices as when the packets are fed at once. At most two
+    chunks per worker are waiting to be merged.
+
+    Parameters
+    ----------
+    builder : GraphBuilder
+        builder of the graph
+    packets : iterable
+        data about the packets
+    workers : int
+        number of processes grouping the packets
+    chunk_size : int, optional
+        number of packets grouped at once by each process, by default 100000
 
     Returns
     -------
-    list
-        list of the ip adresses with http or https communications linked with the router
+    GraphBuilder
+        the builder
     """
-    router_ip = []
-    for packet in data["paquets"]:
-        if packet["port_src"] == 80 or packet["port_src"] == 443:
-            src = packet["src"]
-            if src not in mac[router]:
-                mac[router].append(src)
-                index = mac[router].index(src)
-                router_ip.append([])
-            index = mac[router].index(src)
-            ip = packet["ip_src"]
-            if ip not in router_ip[index]:
-                router_ip[index].append(ip)
-    return router_ip
+    if workers <= 1:
+        builder.feed(packets)
+        return builder
+    chunks = split_packets(packets, chunk_size)
+    with Pool(workers) as pool:
+        pending = deque(
+            pool.apply_async(feed_chunk, (chunk,))
+            for chunk in islice(chunks, 2 * workers)
+        )
+        while pending:
+            part = pending.popleft().get()
+            for chunk in islice(chunks, 1):
+                pending.append(pool.apply_async(feed_chunk, (chunk,)))
+            builder.merge(part)
+    return builder
 
 
 def process_data(
@@ -267,6 +859,7 @@ def process_data(
     port,
     prefix_to_router_index,
     subnetworks,
+    networks,
 ):
     """_summary_
 
@@ -294,6 +887,8 @@ def process_data(
         associate network prefix to the index of ther router of the network
     subnetworks : list of lists
         list of list of nodes grouped by subnetwork
+    networks : NetworkTable
+        networks of the devices beyond the router
 
     Returns
     -------
@@ -320,25 +915,23 @@ def process_data(
         else:
             ipv4[index] = [ipv4_device]
     port_device = packet["port_" + src_or_dst]
-    if port_device is not None and port_device > 1024:
+    # ports of the flows are already grouped (see port_bucket)
+    if isinstance(port_device, int) and port_device > 1024:
         port_device = ">1024"
     if index in port.keys():
         if port_device not in port[index]:
             port[index].append(port_device)
     else:
         port[index] = [port_device]
+    if index == 0 and ethertype == "ipV6":
+        # only the IPv4 addresses beyond the router are drawn
+        return index, index, 0, port_device
     if index == 0:
         if ipv4_device not in list_nodes:
             list_nodes.append(ipv4_device)
         new_index = list_nodes.index(ipv4_device)
         ipv4[new_index] = ipv4_device
-        parsed_ip = ipv4_device.split(".")
-        if parsed_ip[0] in [str(i) for i in range(1, 128)]:
-            prefix = parsed_ip[0]
-        elif parsed_ip[0] in [str(i) for i in range(128, 192)]:
-            prefix = parsed_ip[0] + "." + parsed_ip[1]
-        elif parsed_ip[0] in [str(i) for i in range(192, 224)]:
-            prefix = parsed_ip[0] + "." + parsed_ip[1] + "." + parsed_ip[2]
+        prefix = networks.lookup(ipv4_device)
         if prefix not in prefix_to_router_index.keys():
             list_nodes.append(prefix)
             ntwk_index = list_nodes.index(prefix)
@@ -355,13 +948,25 @@ def process_data(
         return index, index, 0, port_device
 
 
-def update_table(table, list_nodes, src_index, port_src, dst_index, port_dst):
+def update_table(
+    table,
+    list_nodes,
+    src_index,
+    port_src,
+    dst_index,
+    port_dst,
+    n_packets=1,
+    n_bytes=0,
+):
     """Update table
 
+    Each row of the table of a node is a (port src, port dst, device dst) triple,
+    linked to the number of packets and bytes sent with it.
+
     Parameters
     ----------
     table : dict
-        index in list_nodes linked to the info wanted in the table
+        index in list_nodes linked to the rows of its table
     list_nodes : list
         list of the identifiers of the nodes (MAC or IP adresses)
     src_index : int
@@ -372,24 +977,20 @@ def update_table(table, list_nodes, src_index, port_src, dst_index, port_dst):
         index in list_nodes of the destination of the packet
     port_dst : int or str
         port of the destination of the packet
+    n_packets : int, optional
+        number of packets sent, by default 1
+    n_bytes : int, optional
+        number of bytes sent, by default 0
     """
-    if src_index not in table.keys():
-        table[src_index] = {
-            "distance": [],
-            "port src": [],
-            "port dst": [],
-            "device dst": [],
-        }
-    if (
-        port_src is not None
-        and port_src not in table[src_index]["port src"]
-        and port_dst not in table[src_index]["port dst"]
-        and list_nodes[dst_index] not in table[src_index]["device dst"]
-    ):
-        table[src_index]["distance"].append("")
-        table[src_index]["port src"].append(port_src)
-        table[src_index]["port dst"].append(port_dst)
-        table[src_index]["device dst"].append(list_nodes[dst_index])
+    rows = table.setdefault(src_index, {})
+    if port_src is not None:
+        row = (port_src, port_dst, list_nodes[dst_index])
+        counts = rows.get(row)
+        if counts is None:
+            rows[row] = [n_packets, n_bytes]
+        else:
+            counts[0] += n_packets
+            counts[1] += n_bytes
 
 
 def update_mapping(
@@ -400,7 +1001,7 @@ def update_mapping(
     graph,
     mapping,
 ):
-    """Update mapping with path from device_1 to device_2
+    """Add the link from device_1 to device_2 to the graph and to the mapping
 
     Parameters
     ----------
@@ -414,110 +1015,37 @@ def update_mapping(
         index of the mac adress of the device (device_2) in list_nodes
     graph : networkx.Graph
         The graph that wee want to map
-    mapping : dict
-        contains mapping data linked to the index of the node
+    mapping : HighlightMapping
+        nodes and edges to emphasize when clicking on a node
+
+    Returns
+    -------
+    list
+        edges of the link
     """
-    if device_1_index in mapping.keys():
-        if device_1_index not in mapping[device_1_index]:
-            mapping[device_1_index] = [
-                device_1_index,
-                device_2_index,
-                (device_1_index, device_2_index),
-                (device_2_index, device_1_index),
-            ]
-        elif device_2_index not in mapping[device_1_index]:
-            mapping[device_1_index] += [
-                device_2_index,
-                (device_1_index, device_2_index),
-                (device_2_index, device_1_index),
-            ]
-    else:
-        mapping[device_1_index] = [
-            device_1_index,
-            device_2_index,
-            (device_1_index, device_2_index),
-            (device_2_index, device_1_index),
-        ]
-    graph.add_edge(device_1_index, device_2_index)
-    if device_1_index == 0:
-        graph.add_edge(device_1_dist_index, device_1_ntwk_index)
-        graph.add_edge(device_1_ntwk_index, device_1_index)
-        update_mapping_wan(
-            device_1_dist_index,
-            device_1_ntwk_index,
-            device_2_index,
-            device_1_index,
-            mapping,
-        )
-        update_mapping_wan(
-            device_2_index,
-            device_1_index,
-            device_1_dist_index,
-            device_1_ntwk_index,
-            mapping,
-        )
+    edges = [(device_1_index, device_2_index)]
+    # device_1 is beyond the router
+    if device_1_dist_index != device_1_index:
+        edges.append((device_1_dist_index, device_1_ntwk_index))
+        edges.append((device_1_ntwk_index, device_1_index))
+        mapping.add_wan_link(device_1_dist_index, device_1_ntwk_index, device_2_index)
+    graph.add_edges_from(edges)
+    return edges
 
 
-def update_mapping_wan(
-    device_1_index, router_1_index, device_2_index, router_2_index, mapping
+def adjust_layout(
+    graph,
+    list_nodes,
+    subnetworks,
+    mac,
+    ipv4,
+    table,
+    mapping,
+    save_file_name,
+    snapshots=None,
+    force_layout=False,
+    collections=False,
 ):
-    """Update mapping for devices beyond the router
-
-    Parameters
-    ----------
-    device_1_index : int
-        index of device_1 in list_nodes
-    router_1_index : int
-        index of the first router linked with device_1
-    device_2_index : int
-        index of device_2 in list_nodes
-    router_2_index : int
-        index of the first router linked with device_2
-    mapping : dict
-        contains mapping data linked to the index of the node
-    """
-    if device_1_index in mapping.keys():
-        if device_1_index not in mapping[device_1_index]:
-            mapping[device_1_index] = [
-                router_1_index,
-                device_1_index,
-                router_2_index,
-                device_2_index,
-                (router_1_index, router_2_index),
-                (device_1_index, router_1_index),
-                (device_2_index, router_2_index),
-                (router_2_index, router_1_index),
-                (router_1_index, device_1_index),
-                (router_2_index, device_2_index),
-            ]
-        elif device_2_index not in mapping[device_1_index]:
-            mapping[device_1_index] += [
-                device_2_index,
-                (router_2_index, device_2_index),
-                (device_2_index, router_2_index),
-            ]
-            if (router_1_index, router_2_index) not in mapping[device_1_index]:
-                mapping[device_1_index] += [
-                    router_2_index,
-                    (router_1_index, router_2_index),
-                    (router_2_index, router_1_index),
-                ]
-    else:
-        mapping[device_1_index] = [
-            router_2_index,
-            device_2_index,
-            router_1_index,
-            device_1_index,
-            (router_1_index, router_2_index),
-            (device_1_index, router_1_index),
-            (device_2_index, router_2_index),
-            (router_2_index, router_1_index),
-            (router_1_index, device_1_index),
-            (router_2_index, device_2_index),
-        ]
-
-
-def adjust_layout(graph, list_nodes, subnetworks, mac, ipv4, table, mapping):
     """All layout operations
 
     Parameters
@@ -533,9 +1061,19 @@ def adjust_layout(graph, list_nodes, subnetworks, mac, ipv4, table, mapping):
     ipv4 : dict
         contain all ipV4 adresses associated with their index in list_nodes
     table : dict
-        index in list_nodes linked to the info wanted in the table
-    mapping : dict
-        contains mapping data linked to the index of the node
+        index in list_nodes linked to the rows of its table
+    mapping : HighlightMapping
+        nodes and edges to emphasize when clicking on a node
+    save_file_name : str
+        name of the file where data are saved (without the .fig.pckl extension)
+    snapshots : list of dicts, optional
+        snapshots of the graph over time (see snapshots.build_snapshots), by default
+        none
+    force_layout : bool, optional
+        place the subnetworks with a force-directed layout instead of a grid, by
+        default False
+    collections : bool, optional
+        draw the graph with collections (see plot_graph), by default False
 
     Returns
     -------
@@ -545,11 +1083,22 @@ def adjust_layout(graph, list_nodes, subnetworks, mac, ipv4, table, mapping):
     print("Adjusting layout...")
 
     node_color = set_colors(graph, subnetworks)
-    layout = set_layout(subnetworks)
+    layout = set_layout(subnetworks, graph=graph if force_layout else None)
     annotations = set_annotations(list_nodes, mac, ipv4)
-    change_table_type(table)
-    save_data(node_color, graph, layout, table, mapping, annotations)
-    return plot_graph(node_color, graph, layout, table, mapping, annotations)
+    tables = change_table_type(table)
+    save_data(
+        save_file_name,
+        node_color,
+        graph,
+        layout,
+        tables,
+        mapping,
+        annotations,
+        snapshots=snapshots,
+    )
+    return plot_graph(
+        node_color, graph, layout, tables, mapping, annotations, collections=collections
+    )
 
 
 def set_colors(graph, subnetworks):
@@ -578,41 +1127,28 @@ def set_colors(graph, subnetworks):
     return node_color
 
 
-def set_layout(subnetworks, scale=1):
+def set_layout(subnetworks, scale=1, graph=None):
     """Set layout for the graph
 
+    Each subnetwork is a disc of rings around its node, more rings for more devices
+    (see layout.py).
+
     Parameters
     ----------
     subnetworks : dict
         index of the subnetwork associated to all devices in the subnetwork
     scale : float, optional
         scale of the graph (allows to change nodes size), by default 1
+    graph : networkx.Graph, optional
+        graph whose links pull the subnetworks together (force-directed layout), by
+        default the subnetworks are placed on a grid
 
     Returns
     -------
     dict
         index of the nodes in list_nodes linked to their position in the graph
     """
-    layout = {}
-    i = 0
-    n_subnetworks = len(subnetworks)
-    dim = round(math.sqrt(n_subnetworks))
-    for subnetwork in subnetworks.keys():
-        if subnetwork == 0:
-            add = dim * scale / 2.5
-        else:
-            add = 0
-        column = round((i - 1) // dim)
-        layout[subnetwork] = (column * scale, i % dim * scale + add)
-        angles = np.linspace(0, 1, len(subnetworks[subnetwork]) + 1)[:-1] * 2 * np.pi
-        for j in range(len(subnetworks[subnetwork])):
-            angle = angles[j]
-            layout[subnetworks[subnetwork][j]] = (
-                (math.sin(angle) / 3 + column) * scale,
-                (math.cos(angle) / 3 + i % dim) * scale + add,
-            )
-        i += 1
-    return layout
+    return subnetwork_layout(subnetworks, scale, graph)
 
 
 def set_annotations(list_nodes, mac, ipv4):
@@ -651,13 +1187,30 @@ def change_table_type(table):
     Parameters
     ----------
     table : dict
-        index in list_nodes linked to the info wanted in the table
+        index in list_nodes linked to the rows of its table
+
+    Returns
+    -------
+    dict
+        index in list_nodes linked to its table as a pandas.DataFrame
     """
-    for index in table.keys():
-        table[index] = pd.DataFrame(table[index])
+    tables = {}
+    for index, rows in table.items():
+        tables[index] = pd.DataFrame(
+            [
+                ("", port_src, port_dst, device_dst, n_packets, n_bytes)
+                for (port_src, port_dst, device_dst), (
+                    n_packets,
+                    n_bytes,
+                ) in rows.items()
+            ],
+            columns=TABLE_COLUMNS,
+        )
+    return tables
 
 
 def save_data(
+    save_file_name,
     node_color,
     graph,
     layout,
@@ -666,11 +1219,14 @@ def save_data(
     annotations,
     edge_width=0.6,
     edge_color="black",
+    snapshots=None,
 ):
     """Save data in a .json file
 
     Parameters
     ----------
+    save_file_name : str
+        name of the file where data are saved (without the .fig.pckl extension)
     node_color : dict
         index of the nodes in list_nodes linked to their color in the graph
     graph : networkx.Graph
@@ -678,30 +1234,33 @@ def save_data(
     layout : dict
         index of the nodes in list_nodes linked to their position in the graph
     table : dict
-        index in list_nodes linked to the info wanted in the table
-    mapping : dict
-        contains mapping data linked to the index of the node
+        index in list_nodes linked to its table as a pandas.DataFrame
+    mapping : HighlightMapping
+        nodes and edges to emphasize when clicking on a node
     annotations : dict
         index of the nodes in list_nodes linked to their annotation in the graph
     edge_width : float, optional
         width of the edges in the graph, by default 0.6
     edge_color : str, optional
         color of the edges in the graph, by default "black"
+    snapshots : list of dicts, optional
+        snapshots of the graph over time (see snapshots.build_snapshots), by default
+        none
     """
-    with open(sys.argv[2] + ".fig.pckl", "wb") as file:
-        pickle.dump(
-            {
-                "node_color": node_color,
-                "graph": graph,
-                "layout": layout,
-                "edge_width": edge_width,
-                "edge_color": edge_color,
-                "table": table,
-                "mapping": mapping,
-                "annotations": annotations,
-            },
-            file,
-        )
+    data = {
+        "node_color": node_color,
+        "graph": graph,
+        "layout": layout,
+        "edge_width": edge_width,
+        "edge_color": edge_color,
+        "table": table,
+        "mapping": mapping,
+        "annotations": annotations,
+    }
+    if snapshots is not None:
+        data["snapshots"] = snapshots
+    with open(save_file_name + ".fig.pckl", "wb") as file:
+        pickle.dump(data, file)
 
 
 def plot_graph(
@@ -713,6 +1272,7 @@ def plot_graph(
     annotations,
     edge_width=0.6,
     edge_color="black",
+    collections=False,
 ):
     """Plot the graph
 
@@ -725,26 +1285,30 @@ def plot_graph(
     layout : dict
         index of the nodes in list_nodes linked to their position in the graph
     table : dict
-        index in list_nodes linked to the info wanted in the table
-    mapping : dict
-        contains mapping data linked to the index of the node
+        index in list_nodes linked to its table as a pandas.DataFrame
+    mapping : HighlightMapping
+        nodes and edges to emphasize when clicking on a node
     annotations : dict
         index of the nodes in list_nodes linked to their annotation in the graph
     edge_width : float, optional
         width of the edges in the graph, by default 0.6
     edge_color : str, optional
         color of the edges in the graph, by default "black"
+    collections : bool, optional
+        draw all the nodes and all the edges as two collections (much faster for
+        large graphs, but the nodes can not be dragged), by default False
 
     Returns
     -------
-    modified_netgraph.NewInteractiveGraph
+    modified_netgraph.NewInteractiveGraph or collection_graph.CollectionGraph
         figure to plot
     matplotlib.axes._axes.Axes
         axes
     """
     fig, ax = plt.subplots()
 
-    fig = NewInteractiveGraph(
+    graph_class = CollectionGraph if collections else NewInteractiveGraph
+    fig = graph_class(
         graph,
         node_layout=layout,
         node_color=node_color,
@@ -763,25 +1327,135 @@ def plot_graph(
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plot the graph of the network from the data of a capture"
+    )
+    parser.add_argument("file_name", help="name of the .json, .ndjson or .npz file")
+    parser.add_argument("save_file_name", help="name of the file where data are saved")
+    parser.add_argument(
+        "--start",
+        type=parse_time,
+        help="only use the packets captured from this date",
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_time,
+        help="only use the packets captured until this date",
+    )
+    parser.add_argument(
+        "--networks",
+        help="table of the CIDR blocks grouping the devices beyond the router",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes grouping the packets in flows",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="number of packets grouped at once by each process",
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        help="also save snapshots of the graph over windows of this many seconds",
+    )
+    parser.add_argument(
+        "--step",
+        type=float,
+        help="time between two snapshots in seconds, by default the window",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["grid", "force"],
+        default="grid",
+        help="place the subnetworks on a grid or with a force-directed layout",
+    )
+    parser.add_argument(
+        "--collections",
+        action="store_true",
+        help="draw the nodes and the edges as two collections (faster for large graphs)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="update the graph as packets are added to the .ndjson file",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="time between two reads of the file with --follow (in seconds)",
+    )
+    args = parser.parse_args()
+
+    if args.follow:
+        # imported here: follow.py imports this module
+        from follow import follow
+
+        if not args.file_name.endswith(".ndjson"):
+            parser.error("--follow needs a .ndjson file")
+        if (
+            args.start is not None
+            or args.end is not None
+            or args.window is not None
+            or args.layout == "force"
+        ):
+            parser.error(
+                "--follow can not be used with --start, --end, --window or "
+                "--layout force"
+            )
+        networks = (
+            NetworkTable()
+            if args.networks is None
+            else NetworkTable.load(args.networks)
+        )
+        follower = follow(
+            args.file_name,
+            load_json("numbers/ethertypes.json"),
+            networks,
+            args.interval,
+            args.collections,
+        )
+        follower.save(args.save_file_name)
+        raise SystemExit
+
     start = time()
-    data, ethertypes_data = extract_data(sys.argv[1], "numbers/ethertypes.json")
-    find_router(data, mac, list_nodes, router)
-    graph = create_graph(
-        data,
-        ethertypes_data,
-        list_nodes,
-        mac,
-        ipv4,
-        subnetworks,
-        mapping,
-        table,
+    networks = (
+        NetworkTable() if args.networks is None else NetworkTable.load(args.networks)
     )
+    data, ethertypes_data = extract_data(args.file_name, "numbers/ethertypes.json")
+    data["paquets"] = select_period(data["paquets"], args.start, args.end)
+    builder = GraphBuilder(ethertypes_data, networks)
+    if args.window is None:
+        snapshots = None
+        feed_parallel(builder, data["paquets"], args.workers, args.chunk_size)
+        graph = builder.finalize()
+    else:
+        snapshots = build_snapshots(builder, data["paquets"], args.window, args.step)
+        graph = builder.graph
 
-    fig, ax = adjust_layout(graph, list_nodes, subnetworks, mac, ipv4, table, mapping)
+    fig, ax = adjust_layout(
+        graph,
+        builder.list_nodes,
+        builder.subnetworks,
+        builder.mac,
+        builder.ipv4,
+        builder.table,
+        builder.mapping,
+        args.save_file_name,
+        snapshots,
+        args.layout == "force",
+        args.collections,
+    )
+    if snapshots is not None:
+        stepper = SnapshotStepper(fig, snapshots)
 
     try:
-        capture_beginning = data["paquets"][0]["ts"]
-        capture_end = data["paquets"][-1]["ts"]
+        capture_beginning, capture_end = capture_period(data["paquets"])
         print("The capture started on", capture_beginning, "and ended on", capture_end)
     except KeyError:
         pass
@@ -6,10 +6,80 @@ from netgraph._main import (
     Graph,
     DraggableGraphWithGridMode,
 )
-import matplotlib as plt
+from netgraph._artists import EdgeArtist, NodeArtist
+from collections.abc import Mapping
+import numpy as np
 
+from artist_index import ArtistIndex
+from blit_overlay import BlitOverlay
 
-class EmphasizeOnClick(object):
+
+class ArtistToMapping(Mapping):
+    """Artists linked to the nodes and edges to emphasize, looked up in the mapping of
+    their node only when they are clicked
+
+    Parameters
+    ----------
+    artist_to_key : dict
+        artists linked to the ID of their node or edge
+    mapping : Mapping
+        IDs linked to the IDs of the nodes and edges to emphasize (values can be
+        computed on demand, see highlight.HighlightMapping)
+    """
+
+    def __init__(self, artist_to_key, mapping):
+        self.artist_to_key = artist_to_key
+        self.mapping = mapping
+
+    def __getitem__(self, artist):
+        return self.mapping[self.artist_to_key[artist]]
+
+    def __iter__(self):
+        return iter(self.artist_to_key)
+
+    def __len__(self):
+        return len(self.artist_to_key)
+
+    def __contains__(self, artist):
+        return artist in self.artist_to_key
+
+
+class IndexedArtists(object):
+    """Find the node and edge artists under the mouse with a spatial index (see
+    artist_index.py) instead of testing every artist. The hidden artists (see
+    snapshots.SnapshotStepper) are left out."""
+
+    artist_index = None
+
+    def _artists_under(self, event):
+        if self.artist_index is None:
+            self.artist_index = ArtistIndex(
+                list(self.node_artists.values()) + list(self.edge_artists.values())
+            )
+        return [
+            artist
+            for artist in self.artist_index.artists_at(event.xdata, event.ydata)
+            if artist.get_visible()
+        ]
+
+    def _invalidate_artist_index(self):
+        if self.artist_index is not None:
+            self.artist_index.invalidate()
+
+
+class BlittedArtists(object):
+    """Draw the annotations, tables and emphasized artists over the saved image of
+    the figure (see blit_overlay.py) instead of redrawing the whole graph."""
+
+    overlay = None
+
+    def _get_overlay(self):
+        if self.overlay is None:
+            self.overlay = BlitOverlay(self.ax)
+        return self.overlay
+
+
+class EmphasizeOnClick(IndexedArtists, BlittedArtists):
     """Emphasize matplotlib artists when clicking on them by desaturating all other artists."""
 
     def __init__(self, artist_to_mapping):
@@ -38,18 +108,22 @@ class EmphasizeOnClick(object):
 
     def _add_mapping(self, selected_artist):
         self.mapping = self.artist_to_mapping[selected_artist]
-        emphasized_artists = []
+        emphasized_artists = set()
         for value in self.mapping:
             if value in self.node_artists:
-                emphasized_artists.append(self.node_artists[value])
+                emphasized_artists.add(self.node_artists[value])
             elif value in self.edge_artists:
-                emphasized_artists.append(self.edge_artists[value])
+                emphasized_artists.add(self.edge_artists[value])
+        if self._get_overlay().blit:
+            self.overlay.emphasize(emphasized_artists)
+            return
         for artist in self.artists:
             if artist not in emphasized_artists:
                 artist.set_alpha(self._base_alpha[artist] / 5)
                 self.deemphasized_artists.append(artist)
 
     def _remove_mapping(self):
+        self._get_overlay().emphasize(None)
         for artist in self.deemphasized_artists:
             artist.set_alpha(self._base_alpha[artist])
         self.deemphasized_artists = []
@@ -57,18 +131,18 @@ class EmphasizeOnClick(object):
 
     def _on_release(self, event):
         if event.inaxes == self.ax:
-            for artist in self.emphasizeable_artists:
-                if artist.contains(event)[0]:
+            for artist in self._artists_under(event):
+                if artist in self.artist_to_mapping:
                     if self.mapping:
                         self._remove_mapping()
                     else:
                         self._add_mapping(artist)
-                    self.fig.canvas.draw()
+                    self.overlay.update()
                     break
             else:
                 if self.mapping:
                     self._remove_mapping()
-                    self.fig.canvas.draw()
+                    self.overlay.update()
 
 
 class EmphasizeOnClickGraph(Graph, EmphasizeOnClick):
@@ -131,7 +205,7 @@ class EmphasizeOnClickGraph(Graph, EmphasizeOnClick):
         self.mouseover_highlight_mapping = mouseover_highlight_mapping
 
 
-class TableOnHover(object):
+class TableOnHover(IndexedArtists, BlittedArtists):
     """Show or hide tabular information when hovering over matplotlib artists."""
 
     def __init__(self, artist_to_table, table_kwargs=None):
@@ -140,6 +214,9 @@ class TableOnHover(object):
             self.edge_artists.values()
         )
         self.table = None
+        self.tabled_artist = None
+        # tables already drawn, with the DataFrame they were drawn from
+        self.artist_to_table_artist = dict()
         self.table_fontsize = None
         self.table_kwargs = dict(
             # bbox = [1.1, 0.1, 0.5, 0.8],
@@ -166,37 +243,46 @@ class TableOnHover(object):
             self.table.remove()
         self.table = None
 
+    def _get_table(self, artist):
+        """Table of an artist, drawn the first time it is hovered (None if it has no
+        table)"""
+        df = self.artist_to_table.get(artist)
+        if df is None or df.empty:
+            return None
+        cached_df, table = self.artist_to_table_artist.get(artist, (None, None))
+        # the tables of follow.py are replaced when new packets are read
+        if cached_df is not df:
+            if table is not None:
+                table.remove()
+                self._get_overlay().remove(table)
+            table = self.ax.table(
+                cellText=df.values.tolist(),
+                rowLabels=df.index.values,
+                colLabels=df.columns.values,
+                **self.table_kwargs,
+            )
+            table.set_visible(False)
+            self._get_overlay().add(table, opaque=True)
+            self.artist_to_table_artist[artist] = (df, table)
+        return table
+
     def _on_motion(self, event):
         if event.inaxes == self.ax:
-            # on artist
-            selected_artist = None
-            for artist in self.artists:
-                if artist.contains(event)[0]:  # returns two arguments for some reason
-                    selected_artist = artist
-                    break
-
-            if selected_artist:
-                try:
-                    df = self.artist_to_table[selected_artist]
-                except KeyError:
-                    return
-                if not df.empty:
-                    self.table = self.ax.table(
-                        cellText=df.values.tolist(),
-                        rowLabels=df.index.values,
-                        colLabels=df.columns.values,
-                        **self.table_kwargs,
-                    )
-                    self.fig.canvas.draw_idle()
-
-            # not on any artist
-            if selected_artist is None:
-                if self.table:
-                    for children in self.ax.get_children():
-                        if type(children) == plt.table.Table:
-                            children.remove()
-                self.table = None
-                self.fig.canvas.draw_idle()
+            selected_artist = next(iter(self._artists_under(event)), None)
+            if selected_artist is self.tabled_artist:
+                return
+            self.tabled_artist = selected_artist
+            table = (
+                None if selected_artist is None else self._get_table(selected_artist)
+            )
+            if table is self.table:
+                return
+            if self.table is not None:
+                self.table.set_visible(False)
+            self.table = table
+            if table is not None:
+                table.set_visible(True)
+            self._get_overlay().update()
 
 
 class TableOnHoverGraph(Graph, TableOnHover):
@@ -223,7 +309,7 @@ class TableOnHoverGraph(Graph, TableOnHover):
             TableOnHover.__init__(self, self.artist_to_table)
 
 
-class AnnotateOnHover(object):
+class AnnotateOnHover(IndexedArtists, BlittedArtists):
     """Show or hide annotations when hovering on matplotlib artists."""
 
     def __init__(self, artist_to_annotation, annotation_fontdict=None):
@@ -232,51 +318,34 @@ class AnnotateOnHover(object):
         )
         self.artist_to_annotation = artist_to_annotation
         self.annotated_artists = set()
-        self.artist_to_text_object = dict()
         self.annotation_fontdict = dict(backgroundcolor="white", clip_on=False)
         if annotation_fontdict:
             self.annotation_fontdict.update(annotation_fontdict)
+        # a single text, updated with the annotation of the hovered artist
+        self.annotation = self.ax.text(-2, 0, "", **self.annotation_fontdict)
+        self.annotation.set_visible(False)
+        self._get_overlay().add(self.annotation)
+        self.hovered_artist = None
 
         self.fig.canvas.mpl_connect("motion_notify_event", self._on_motion)
 
     def _on_motion(self, event):
         if event.inaxes == self.ax:
-            # on artist
-            selected_artist = None
-            for artist in self.artists:
-                if artist.contains(event)[0]:  # returns two arguments for some reason
-                    selected_artist = artist
-                    break
-
-            if selected_artist:
-                params = self.annotation_fontdict.copy()
-                try:
-                    if isinstance(self.artist_to_annotation[selected_artist], str):
-                        self.artist_to_text_object[selected_artist] = self.ax.text(
-                            -2,
-                            0,
-                            self.artist_to_annotation[selected_artist],
-                            **params,
-                        )
-                    elif isinstance(self.artist_to_annotation[selected_artist], dict):
-                        params.update(self.artist_to_annotation[selected_artist].copy())
-                        self.artist_to_text_object[selected_artist] = self.ax.text(
-                            -2, 0, **params
-                        )
-                    self.fig.canvas.draw_idle()
-                except KeyError:
-                    return
-
-            # not on any artist
-            if selected_artist is None:
-                if self.artist_to_text_object != {}:
-                    for children in self.ax.get_children():
-                        if (
-                            type(children) == plt.text.Text
-                            and str(children)[:10] == "Text(-2, 0"
-                        ):
-                            children.remove()
-                self.fig.canvas.draw_idle()
+            selected_artist = next(iter(self._artists_under(event)), None)
+            if selected_artist is self.hovered_artist:
+                return
+            self.hovered_artist = selected_artist
+            annotation = self.artist_to_annotation.get(selected_artist)
+            if isinstance(annotation, str):
+                self.annotation.update(dict(self.annotation_fontdict, text=annotation))
+            elif isinstance(annotation, dict):
+                self.annotation.update(dict(self.annotation_fontdict, **annotation))
+            else:
+                annotation = None
+            if annotation is None and not self.annotation.get_visible():
+                return
+            self.annotation.set_visible(annotation is not None)
+            self._get_overlay().update()
 
 
 class AnnotateOnHoverGraph(Graph, AnnotateOnHover):
@@ -337,17 +406,20 @@ class NewInteractiveGraph(
             AnnotateOnHover.__init__(self, artist_to_annotation)
 
         if "mapping" in kwargs:
-            mapping = dict()
-            for key, linked_nodes in kwargs["mapping"].items():
+            # the nodes and edges to emphasize are only looked up when clicking
+            artist_to_key = dict()
+            for key in kwargs["mapping"]:
                 if key in self.nodes:
-                    mapping[self.node_artists[key]] = linked_nodes
+                    artist_to_key[self.node_artists[key]] = key
                 elif key in self.edges:
-                    mapping[self.edge_artists[key]] = linked_nodes
+                    artist_to_key[self.edge_artists[key]] = key
                 else:
                     raise ValueError(
-                        f"There is no node or edge with the ID {key} for the table '{linked_nodes}'."
+                        f"There is no node or edge with the ID {key} for the mapping."
                     )
-            EmphasizeOnClick.__init__(self, mapping)
+            EmphasizeOnClick.__init__(
+                self, ArtistToMapping(artist_to_key, kwargs["mapping"])
+            )
 
         if "tables" in kwargs:
             artist_to_table = dict()
@@ -363,6 +435,150 @@ class NewInteractiveGraph(
                         )
             TableOnHover.__init__(self, artist_to_table)
 
+    def add(self, graph, node_layout, node_color=None):
+        """Draw the nodes and edges of a graph that are not drawn yet, like the first
+        node and edge drawn (the nodes with their own color)
+
+        The artists already drawn stay where they are. The data structures of the
+        parent classes are updated like in netgraph.MutableGraph. The view is extended
+        to the new artists unless it was zoomed or panned.
+
+        Parameters
+        ----------
+        graph : networkx.Graph
+            graph containing the nodes and edges already drawn
+        node_layout : dict
+            nodes linked to their (x, y) position (at least the new ones)
+        node_color : dict, optional
+            nodes linked to their color, by default the color of the first node
+        """
+        nodes = [node for node in graph.nodes if node not in self.node_artists]
+        edges = [
+            (source, target)
+            for source, target in graph.edges
+            if (source, target) not in self.edge_artists
+            and (target, source) not in self.edge_artists
+        ]
+        if not nodes and not edges:
+            return
+        node_color = node_color or {}
+        node_artist = next(iter(self.node_artists.values()))
+        node_properties = dict(
+            shape=node_artist.shape,
+            radius=node_artist.radius,
+            facecolor=node_artist.get_facecolor(),
+            edgecolor=self._base_edgecolor[node_artist],
+            linewidth=self._base_linewidth[node_artist],
+            alpha=self._base_alpha[node_artist],
+            zorder=node_artist.get_zorder(),
+        )
+        new_artists = []
+        for node in nodes:
+            self.nodes.append(node)
+            self.node_positions[node] = np.array(node_layout[node], dtype=float)
+            artist = NodeArtist(
+                xy=self.node_positions[node],
+                **dict(
+                    node_properties,
+                    facecolor=node_color.get(node, node_properties["facecolor"]),
+                ),
+            )
+            self.node_artists[node] = artist
+            self._draggable_artist_to_node[artist] = node
+            self._draggable_artists.append(artist)
+            self.artist_to_key[artist] = node
+            new_artists.append(artist)
+
+        if edges:
+            edge_artist = next(iter(self.edge_artists.values()))
+            edge_properties = dict(
+                width=edge_artist.width,
+                facecolor=edge_artist.get_facecolor(),
+                alpha=self._base_alpha[edge_artist],
+                head_length=edge_artist.head_length,
+                head_width=edge_artist.head_width,
+                edgecolor=self._base_edgecolor[edge_artist],
+                linewidth=self._base_linewidth[edge_artist],
+                offset=edge_artist.offset,
+                zorder=edge_artist.get_zorder(),
+            )
+        edge_paths = self._update_straight_edge_paths(edges)
+        edge_paths.update(self._update_selfloop_paths(edges))
+        for edge in edges:
+            self.edges.append(edge)
+            self.edge_paths[edge] = edge_paths[edge]
+            artist = EdgeArtist(
+                midline=edge_paths[edge],
+                curved=len(edge_paths[edge]) > 2,
+                **edge_properties,
+            )
+            self.edge_artists[edge] = artist
+            self.artist_to_key[artist] = edge
+            new_artists.append(artist)
+
+        mapping = getattr(self, "artist_to_mapping", None)
+        for artist in new_artists:
+            self.ax.add_patch(artist)
+            self.artists.append(artist)
+            self._clickable_artists.append(artist)
+            self._selectable_artists.append(artist)
+            self._base_linewidth[artist] = artist._lw_data
+            self._base_edgecolor[artist] = artist.get_edgecolor()
+            self._base_facecolor[artist] = artist.get_facecolor()
+            self._base_alpha[artist] = artist.get_alpha()
+            if mapping is not None and self.artist_to_key[artist] in mapping.mapping:
+                mapping.artist_to_key[artist] = self.artist_to_key[artist]
+        # built again with the new artists on the next query
+        self.artist_index = None
+        # the view only follows the graph until it is zoomed or panned
+        self.ax.autoscale_view()
+
+    def set_hover_data(self, tables, annotations):
+        """Replace the tables and annotations shown when hovering over the nodes
+
+        Parameters
+        ----------
+        tables : dict
+            nodes linked to their table as a pandas.DataFrame
+        annotations : dict
+            nodes linked to their annotation
+        """
+        self.artist_to_table = {
+            self.node_artists[node]: table
+            for node, table in tables.items()
+            if node in self.node_artists
+        }
+        self.artist_to_annotation = {
+            self.node_artists[node]: annotation
+            for node, annotation in annotations.items()
+            if node in self.node_artists
+        }
+        # shown again on the next move of the mouse
+        self.tabled_artist = None
+        self.hovered_artist = None
+
+    def _on_press(self, event):
+        if event.inaxes == self.ax:
+            self._x0 = self._x1 = event.xdata
+            self._y0 = self._y1 = event.ydata
+            artists = self._artists_under(event)
+            if not artists:
+                self._currently_selecting = True
+            for artist in artists:
+                if artist in self._draggable_artist_to_node:
+                    self._currently_clicking_on_artist = artist
+                    break
+        else:
+            print("Warning: clicked outside axis limits!")
+
+    def _update_node_artists(self, nodes):
+        super()._update_node_artists(nodes)
+        self._invalidate_artist_index()
+
+    def _update_edge_artists(self, edge_paths=None):
+        super()._update_edge_artists(edge_paths)
+        self._invalidate_artist_index()
+
     def _on_release(self, event):
         if self._currently_dragging is False:
             if hasattr(self, "mapping"):
@@ -0,0 +1,80 @@
+"""
+Identifiers of the nodes with constant time lookups
+
+main.py refers to the nodes by their index in the list of their identifiers (MAC
+addresses, IP addresses and network prefixes). Looking an identifier up in a plain
+list goes through the whole list, which makes building the graph grow with the number
+of packets times the number of nodes.
+"""
+
+
+class NodeRegistry:
+    """Identifiers of the nodes in the order they were added, indexed by a dict
+
+    Identifiers keep their position (the order in which they were added), and `in`
+    and `index` are answered by the dict instead of scanning a list. Identifiers can
+    only be added, with append, so that the indices never go stale. A node can also
+    have aliases: other identifiers that are not listed but give its index.
+
+    Parameters
+    ----------
+    nodes : iterable, optional
+        identifiers already known, by default none
+    aliases : dict, optional
+        aliases linked to the index of their node, by default none
+    """
+
+    def __init__(self, nodes=(), aliases=None):
+        self._nodes = []
+        self._indices = {}
+        self.aliases = {}
+        for node in nodes:
+            self.append(node)
+        for alias, index in (aliases or {}).items():
+            self.add_alias(alias, index)
+
+    def append(self, node):
+        """Add an identifier at the end (a node already known keeps its first
+        position, like with list.index)"""
+        self._indices.setdefault(node, len(self._nodes))
+        self._nodes.append(node)
+
+    def add_alias(self, alias, index):
+        """Make an identifier give the index of a node already in the list"""
+        if alias in self._indices:
+            raise ValueError("%r is already known" % (alias,))
+        if not 0 <= index < len(self):
+            raise IndexError("no node at index %d" % index)
+        self._indices[alias] = index
+        self.aliases[alias] = index
+
+    def names(self, index):
+        """Identifier of a node followed by its aliases"""
+        return [self[index]] + [
+            alias for alias, alias_index in self.aliases.items() if alias_index == index
+        ]
+
+    def index(self, node):
+        """Position of a node (or of the node of an alias)"""
+        try:
+            return self._indices[node]
+        except KeyError:
+            raise ValueError("%r is not in list" % (node,))
+
+    def __contains__(self, node):
+        return node in self._indices
+
+    def __getitem__(self, index):
+        return self._nodes[index]
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._nodes)
+
+    def __reduce__(self):
+        return self.__class__, (self._nodes, self.aliases)
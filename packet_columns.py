@@ -0,0 +1,517 @@
+"""
+Compact columnar storage of the packets (.npz file)
+
+Each field of the packets is stored in its own typed numpy array: MAC addresses as
+uint64, IPv4 addresses and lengths as uint32, ports and ethertypes as uint16 and
+timestamps as float64. IPv6 addresses are stored apart (16 bytes each, only for IPv6
+packets) and the capture file of each packet is stored as an index in the list of the
+captures.
+Nothing is formatted when writing: addresses are only turned into strings when the
+packets are read back, once per distinct address.
+"""
+
+from array import array
+from datetime import datetime
+import socket
+
+import numpy as np
+
+HAS_TYPE = 1
+IPV4 = 2
+IPV6 = 4
+HAS_PORTS = 8
+
+BROADCAST_MAC = 0xFFFFFFFFFFFF
+IPV4_MULTICAST_PREFIX = 0xE  # 224.0.0.0/4
+IPV6_LINK_LOCAL_MULTICAST = 0xFF02  # ff02::/16
+
+
+def mac_to_str(address):
+    """Convert a MAC address stored as an integer to a printable string
+
+    Parameters
+    ----------
+    address : int
+        MAC address
+
+    Returns
+    -------
+    str
+        printable MAC address (e.g. '01:02:03:04:05:06')
+    """
+    hex_address = "%012x" % address
+    return ":".join(hex_address[i : i + 2] for i in range(0, 12, 2))
+
+
+def ipv4_to_str(address):
+    """Convert an IPv4 address stored as an integer to a printable string
+
+    Parameters
+    ----------
+    address : int
+        IPv4 address
+
+    Returns
+    -------
+    str
+        printable IPv4 address (e.g. '192.168.1.1')
+    """
+    return socket.inet_ntoa(int(address).to_bytes(4, "big"))
+
+
+class PacketColumnsWriter:
+    """Accumulate the raw fields of the packets in typed arrays and save them in a .npz file"""
+
+    def __init__(self):
+        self.ts = array("d")
+        self.src = array("Q")
+        self.dst = array("Q")
+        self.type = array("H")
+        self.flags = array("B")
+        self.ip_src = array("I")
+        self.ip_dst = array("I")
+        self.ip6_src = bytearray()
+        self.ip6_dst = bytearray()
+        self.port_src = array("H")
+        self.port_dst = array("H")
+        self.length = array("I")
+        self.capture = array("H")
+        self.captures = {}
+
+    def __len__(self):
+        return len(self.ts)
+
+    def append(self, fields):
+        """Add a packet
+
+        Parameters
+        ----------
+        fields : tuple
+            raw fields of the packet (see from_pcap_to_json.decode_fields)
+        """
+        ts, src, dst, eth_type, ip_src, ip_dst, port_src, port_dst, length, capture = (
+            fields
+        )
+        flags = 0
+        self.ts.append(ts)
+        self.src.append(int.from_bytes(src, "big"))
+        self.dst.append(int.from_bytes(dst, "big"))
+        if eth_type is not None:
+            flags |= HAS_TYPE
+            self.type.append(eth_type)
+        else:
+            self.type.append(0)
+        if ip_src is not None and len(ip_src) == 4:
+            flags |= IPV4
+            self.ip_src.append(int.from_bytes(ip_src, "big"))
+            self.ip_dst.append(int.from_bytes(ip_dst, "big"))
+        else:
+            if ip_src is not None:
+                flags |= IPV6
+                self.ip6_src += ip_src
+                self.ip6_dst += ip_dst
+            self.ip_src.append(0)
+            self.ip_dst.append(0)
+        if port_src is not None:
+            flags |= HAS_PORTS
+            self.port_src.append(port_src)
+            self.port_dst.append(port_dst)
+        else:
+            self.port_src.append(0)
+            self.port_dst.append(0)
+        self.flags.append(flags)
+        self.length.append(length)
+        if capture not in self.captures:
+            self.captures[capture] = len(self.captures)
+        self.capture.append(self.captures[capture])
+
+    def columns(self):
+        """Get the accumulated columns
+
+        Returns
+        -------
+        dict
+            name of the column linked to its numpy array
+        """
+        return {
+            "ts": np.frombuffer(self.ts, dtype=np.float64),
+            "src": np.frombuffer(self.src, dtype=np.uint64),
+            "dst": np.frombuffer(self.dst, dtype=np.uint64),
+            "type": np.frombuffer(self.type, dtype=np.uint16),
+            "flags": np.frombuffer(self.flags, dtype=np.uint8),
+            "ip_src": np.frombuffer(self.ip_src, dtype=np.uint32),
+            "ip_dst": np.frombuffer(self.ip_dst, dtype=np.uint32),
+            "ip6_src": np.frombuffer(self.ip6_src, dtype="S16"),
+            "ip6_dst": np.frombuffer(self.ip6_dst, dtype="S16"),
+            "port_src": np.frombuffer(self.port_src, dtype=np.uint16),
+            "port_dst": np.frombuffer(self.port_dst, dtype=np.uint16),
+            "length": np.frombuffer(self.length, dtype=np.uint32),
+            "capture": np.frombuffer(self.capture, dtype=np.uint16),
+            "captures": np.array(
+                ["" if capture is None else capture for capture in self.captures],
+                dtype=str,
+            ),
+        }
+
+    def save(self, file_name):
+        """Save the columns in a .npz file
+
+        Parameters
+        ----------
+        file_name : str
+            name of the .npz file
+        """
+        np.savez(file_name, **self.columns())
+
+
+def concatenate(first_columns, second_columns):
+    """Put the packets of two sets of columns one after the other
+
+    Parameters
+    ----------
+    first_columns : dict
+        name of the column linked to its numpy array
+    second_columns : dict
+        name of the column linked to its numpy array
+
+    Returns
+    -------
+    dict
+        name of the column linked to the concatenated numpy array
+    """
+    columns = {}
+    for name in second_columns:
+        if name not in ("capture", "captures"):
+            # files written before a column existed get zeros
+            first_column = first_columns.get(
+                name, np.zeros(len(first_columns["ts"]), second_columns[name].dtype)
+            )
+            columns[name] = np.concatenate((first_column, second_columns[name]))
+    # captures are stored as indexes in the list of the captures of each file
+    captures = list(first_columns.get("captures", [""]))
+    first_capture = first_columns.get(
+        "capture", np.zeros(len(first_columns["ts"]), dtype=np.uint16)
+    )
+    remap = []
+    for capture in second_columns["captures"]:
+        if capture not in captures:
+            captures.append(capture)
+        remap.append(captures.index(capture))
+    second_capture = np.array(remap, dtype=np.uint16)[second_columns["capture"]]
+    columns["capture"] = np.concatenate((first_capture, second_capture))
+    columns["captures"] = np.array(captures, dtype=str)
+    return columns
+
+
+def write_npz(packets_fields, output_file_name):
+    """Write the raw fields of the packets in a .npz file
+
+    Parameters
+    ----------
+    packets_fields : iterable
+        raw fields of the packets (see from_pcap_to_json.decode_fields)
+    output_file_name : str
+        name of the .npz file
+
+    Returns
+    -------
+    int
+        number of packets written
+    """
+    writer = PacketColumnsWriter()
+    for fields in packets_fields:
+        writer.append(fields)
+    writer.save(output_file_name)
+    return len(writer)
+
+
+def part_file_name(file_name, part):
+    """Name of the file holding the packets added to a .npz file by a resumed run
+
+    The packets already written are not read again: each run writes its own part
+    (file_name.1.npz, file_name.2.npz...), loaded after the file (see
+    PacketColumns.load).
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .npz file
+    part : int
+        number of the part, from 1
+
+    Returns
+    -------
+    str
+        name of the part
+    """
+    return file_name[: -len(".npz")] + ".%d.npz" % part
+
+
+class PacketColumns:
+    """Packets stored in typed columns
+
+    Iterating over it gives the same dicts as the .json files written by
+    from_pcap_to_json.py. Addresses are formatted once per distinct value.
+
+    Parameters
+    ----------
+    columns : dict
+        name of the column linked to its numpy array
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def load(cls, file_name, part_file_names=()):
+        """Load the columns of a .npz file
+
+        Parameters
+        ----------
+        file_name : str
+            name of the .npz file
+        part_file_names : iterable, optional
+            names of the .npz files whose packets follow the ones of the file (see
+            part_file_name), by default none
+
+        Returns
+        -------
+        PacketColumns
+            packets of the files, one after the other
+        """
+        with np.load(file_name) as npz:
+            columns = {name: npz[name] for name in npz.files}
+        for part in part_file_names:
+            with np.load(part) as npz:
+                columns = concatenate(columns, {name: npz[name] for name in npz.files})
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def select(self, mask):
+        """Keep only some of the packets
+
+        Parameters
+        ----------
+        mask : numpy.ndarray
+            boolean array, True for the packets to keep
+
+        Returns
+        -------
+        PacketColumns
+            selected packets
+        """
+        ipv6 = (self.columns["flags"] & IPV6) != 0
+        columns = {}
+        for name, column in self.columns.items():
+            if name in ("ip6_src", "ip6_dst"):
+                columns[name] = column[mask[ipv6]]
+            elif name == "captures":
+                columns[name] = column
+            else:
+                columns[name] = column[mask]
+        return PacketColumns(columns)
+
+    def chunks(self, chunk_size):
+        """Split the packets in chunks of consecutive packets
+
+        Parameters
+        ----------
+        chunk_size : int
+            number of packets in each chunk
+
+        Returns
+        -------
+        iterator
+            PacketColumns of each chunk (views on the columns)
+        """
+        return self.split(range(0, len(self), chunk_size))
+
+    def split(self, starts):
+        """Split the packets in runs of consecutive packets
+
+        Parameters
+        ----------
+        starts : iterable
+            increasing positions of the first packet of each run (the last run goes
+            to the end)
+
+        Yields
+        ------
+        PacketColumns
+            packets of each run (views on the columns)
+        """
+        starts = list(starts)
+        # position of the first IPv6 address of each packet in the ip6 columns
+        ipv6_positions = np.concatenate(
+            ([0], np.cumsum((self.columns["flags"] & IPV6) != 0))
+        )
+        for start, end in zip(starts, starts[1:] + [len(self)]):
+            columns = {}
+            for name, column in self.columns.items():
+                if name in ("ip6_src", "ip6_dst"):
+                    columns[name] = column[ipv6_positions[start] : ipv6_positions[end]]
+                elif name == "captures":
+                    columns[name] = column
+                else:
+                    columns[name] = column[start:end]
+            yield PacketColumns(columns)
+
+    def unicast_mask(self):
+        """Find the IP packets sent from one device to another
+
+        Multicast (224.0.0.0/4 and ff02::/16) and broadcast packets, and packets
+        without IP addresses, are left out.
+
+        Returns
+        -------
+        numpy.ndarray
+            boolean array, True for the unicast IP packets
+        """
+        flags = self.columns["flags"]
+        ipv4 = (flags & IPV4) != 0
+        ipv6 = (flags & IPV6) != 0
+        mask = ipv4 | ipv6
+        for name in ("ip_src", "ip_dst"):
+            mask &= ~(ipv4 & ((self.columns[name] >> 28) == IPV4_MULTICAST_PREFIX))
+        for name in ("ip6_src", "ip6_dst"):
+            # the addresses are 16 bytes long in memory, whatever their length
+            first_bytes = self.columns[name].view(np.uint8).reshape(-1, 16)[:, :2]
+            multicast = np.zeros(len(self), dtype=bool)
+            multicast[ipv6] = (
+                first_bytes[:, 0].astype(np.uint16) << 8 | first_bytes[:, 1]
+            ) == IPV6_LINK_LOCAL_MULTICAST
+            mask &= ~multicast
+        mask &= self.columns["src"] != BROADCAST_MAC
+        mask &= self.columns["dst"] != BROADCAST_MAC
+        return mask
+
+    def ts_to_str(self, position):
+        """Format the timestamp of a packet
+
+        Parameters
+        ----------
+        position : int
+            position of the packet in the columns
+
+        Returns
+        -------
+        str
+            timestamp, formatted like in the .json files
+        """
+        return str(datetime.fromtimestamp(self.columns["ts"][position]))
+
+    def _formatted(self, name, to_str):
+        """Format each distinct value of a column once
+
+        Returns
+        -------
+        list
+            formatted value of each packet
+        """
+        values, inverse = np.unique(self.columns[name], return_inverse=True)
+        formatted = [to_str(int(value)) for value in values]
+        return [formatted[i] for i in inverse.ravel()]
+
+    def _formatted_ipv6(self, name, flags):
+        """Format each distinct IPv6 address of a column once and spread them on the packets
+
+        Returns
+        -------
+        list
+            formatted address of each IPv6 packet, None for the others
+        """
+        addresses = [None] * len(self)
+        cache = {}
+        for position, address in zip(
+            np.flatnonzero(flags & IPV6), self.columns[name].tolist()
+        ):
+            if address not in cache:
+                cache[address] = socket.inet_ntop(
+                    socket.AF_INET6, address.ljust(16, b"\x00")
+                )
+            addresses[position] = cache[address]
+        return addresses
+
+    def rows(self):
+        """Go through the packets without building dicts
+
+        Yields
+        ------
+        tuple
+            (ts, src, dst, type, ip_src, ip_dst, port_src, port_dst, length, capture) of
+            each packet, formatted like in the .json files except the timestamp (float)
+        """
+        flags = self.columns["flags"]
+        src = self._formatted("src", mac_to_str)
+        dst = self._formatted("dst", mac_to_str)
+        ip_src = self._formatted("ip_src", ipv4_to_str)
+        ip_dst = self._formatted("ip_dst", ipv4_to_str)
+        ip6_src = self._formatted_ipv6("ip6_src", flags)
+        ip6_dst = self._formatted_ipv6("ip6_dst", flags)
+        ts = self.columns["ts"].tolist()
+        eth_types = self.columns["type"].tolist()
+        port_src = self.columns["port_src"].tolist()
+        port_dst = self.columns["port_dst"].tolist()
+        if "length" in self.columns:
+            length = self.columns["length"].tolist()
+        else:
+            length = [None] * len(self)
+        if "capture" in self.columns:
+            captures = [
+                capture if capture else None
+                for capture in self.columns["captures"].tolist()
+            ]
+            capture = [captures[i] for i in self.columns["capture"].tolist()]
+        else:
+            capture = [None] * len(self)
+        for i, packet_flags in enumerate(flags.tolist()):
+            if packet_flags & IPV4:
+                ips = ip_src[i], ip_dst[i]
+            else:
+                ips = ip6_src[i], ip6_dst[i]
+            if packet_flags & HAS_PORTS:
+                ports = port_src[i], port_dst[i]
+            else:
+                ports = None, None
+            yield (
+                ts[i],
+                src[i],
+                dst[i],
+                eth_types[i] if packet_flags & HAS_TYPE else None,
+                *ips,
+                *ports,
+                length[i],
+                capture[i],
+            )
+
+    def __iter__(self):
+        for row in self.rows():
+            (
+                ts,
+                src,
+                dst,
+                eth_type,
+                ip_src,
+                ip_dst,
+                port_src,
+                port_dst,
+                length,
+                capture,
+            ) = row
+            yield {
+                "src": src,
+                "dst": dst,
+                "ts": str(datetime.fromtimestamp(ts)),
+                "type": eth_type,
+                "ip_src": ip_src,
+                "ip_dst": ip_dst,
+                "port_src": port_src,
+                "port_dst": port_dst,
+                "length": length,
+                "capture": capture,
+            }
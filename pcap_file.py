@@ -0,0 +1,479 @@
+"""
+Low level access to the records of a .pcap file (and sequential reading of .pcapng files)
+
+A .pcap file is a 24 bytes global header followed by records, each made of a
+16 bytes header (seconds, micro or nanoseconds, captured length, original length)
+and of the captured bytes. Reading only the record headers allows to find the
+boundaries of the packets without decoding them.
+"""
+
+import mmap
+import os
+import struct
+
+import dpkt
+import numpy as np
+
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+GLOBAL_HEADER_LENGTH = 24
+RECORD_HEADER_LENGTH = 16
+
+# magic number (read as little endian) linked to (byte order, timestamp divisor)
+MAGICS = {
+    0xA1B2C3D4: ("<", 1e6),
+    0xA1B23C4D: ("<", 1e9),
+    0xD4C3B2A1: (">", 1e6),
+    0x4D3CB2A1: (">", 1e9),
+}
+
+
+def record_header_format(global_header):
+    """Find how the record headers of a .pcap file are encoded
+
+    Parameters
+    ----------
+    global_header : bytes
+        first 24 bytes of the file
+
+    Returns
+    -------
+    struct.Struct
+        structure of a record header (seconds, fraction of second, captured length)
+    float
+        divisor of the fraction of second
+
+    Raises
+    ------
+    ValueError
+        if the file is not a .pcap file
+    """
+    if len(global_header) < GLOBAL_HEADER_LENGTH:
+        raise ValueError("invalid tcpdump header")
+    (magic,) = struct.unpack_from("<I", global_header)
+    try:
+        byte_order, divisor = MAGICS[magic]
+    except KeyError:
+        raise ValueError("invalid tcpdump header")
+    return struct.Struct(byte_order + "III"), divisor
+
+
+def iter_record_headers(file_name, start=GLOBAL_HEADER_LENGTH):
+    """Go through the record headers of a .pcap file without reading the packets
+
+    The last record is ignored if it is incomplete (file still being written).
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    start : int, optional
+        offset of the first record to read, by default the first record of the file
+
+    Yields
+    ------
+    int
+        offset of the record in the file
+    float
+        timestamp of the record
+    int
+        offset of the next record in the file
+    """
+    with open(file_name, "rb") as f:
+        global_header = f.read(GLOBAL_HEADER_LENGTH)
+        header, divisor = record_header_format(global_header)
+        size = f.seek(0, 2)
+        if size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = start
+            while position + RECORD_HEADER_LENGTH <= size:
+                ts_sec, ts_frac, caplen = header.unpack_from(mm, position)
+                end = position + RECORD_HEADER_LENGTH + caplen
+                if end > size:
+                    break
+                yield position, ts_sec + ts_frac / divisor, end
+                position = end
+
+
+def split_records(file_name, chunk_size, start=None, end=None):
+    """Split a .pcap file in byte ranges on record boundaries
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    chunk_size : int
+        number of packets in each range
+    start : int, optional
+        offset of the first record to split, by default the first record of the file
+    end : int, optional
+        offset where to stop, by default the end of the file
+
+    Returns
+    -------
+    list of tuples
+        (start, end) offsets of each range, in file order
+    """
+    chunks = []
+    chunk_start = None
+    n_records = 0
+    if start is None:
+        start = GLOBAL_HEADER_LENGTH
+    for position, _, record_end in iter_record_headers(file_name, start):
+        if end is not None and position >= end:
+            break
+        end_of_chunk = record_end
+        if chunk_start is None:
+            chunk_start = position
+        n_records += 1
+        if n_records == chunk_size:
+            chunks.append((chunk_start, end_of_chunk))
+            chunk_start = None
+            n_records = 0
+    if chunk_start is not None:
+        chunks.append((chunk_start, end_of_chunk))
+    return chunks
+
+
+def read_records(file_name, start=None, end=None):
+    """Read the records of a .pcap file between two offsets
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    start : int, optional
+        offset of the first record to read, by default the first record of the file
+    end : int, optional
+        offset where to stop reading, by default the end of the file
+
+    Yields
+    ------
+    float
+        timestamp of the packet
+    bytes
+        captured bytes of the packet
+    """
+    with open(file_name, "rb") as f:
+        pcap = dpkt.pcap.Reader(f)
+        if start is not None:
+            f.seek(start)
+        if end is not None and f.tell() >= end:
+            return
+        for ts, buf in pcap:
+            yield ts, buf
+            if end is not None and f.tell() >= end:
+                break
+
+
+def in_period(ts, start_time=None, end_time=None):
+    """Check if a timestamp is between two bounds
+
+    Parameters
+    ----------
+    ts : float
+        timestamp
+    start_time : float, optional
+        lower bound (included), by default no bound
+    end_time : float, optional
+        upper bound (included), by default no bound
+
+    Returns
+    -------
+    bool
+        True if the timestamp is in the period
+    """
+    return (start_time is None or ts >= start_time) and (
+        end_time is None or ts <= end_time
+    )
+
+
+def index_file_name(file_name):
+    """Name of the sidecar index file of a .pcap file"""
+    return file_name + ".idx.npz"
+
+
+def build_index(file_name, step=1000):
+    """Record the offset and timestamp of every `step`-th packet of a .pcap file
+
+    Only the record headers are read (see iter_record_headers).
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    step : int, optional
+        number of packets between two entries of the index, by default 1000
+
+    Returns
+    -------
+    dict
+        offsets and timestamps of the entries, step, size and modification time of the file
+    """
+    stat = os.stat(file_name)
+    offsets = []
+    timestamps = []
+    for n_records, (position, ts, _) in enumerate(iter_record_headers(file_name)):
+        if n_records % step == 0:
+            offsets.append(position)
+            timestamps.append(ts)
+    return {
+        "offsets": np.array(offsets, dtype=np.uint64),
+        "timestamps": np.array(timestamps, dtype=np.float64),
+        "step": step,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+
+
+def load_index(file_name, step=1000):
+    """Load the sidecar index of a .pcap file, building it if it is missing or outdated
+
+    The index is saved next to the .pcap file (file_name.idx.npz) so that it is only
+    built once per version of the file.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    step : int, optional
+        number of packets between two entries of the index, by default 1000
+
+    Returns
+    -------
+    dict
+        index of the file (see build_index)
+    """
+    stat = os.stat(file_name)
+    try:
+        with np.load(index_file_name(file_name)) as npz:
+            index = {name: npz[name] for name in npz.files}
+        if (
+            int(index["step"]) == step
+            and int(index["size"]) == stat.st_size
+            and float(index["mtime"]) == stat.st_mtime
+        ):
+            return index
+    except (OSError, KeyError, ValueError):
+        pass
+    index = build_index(file_name, step)
+    try:
+        np.savez(index_file_name(file_name), **index)
+    except OSError:
+        pass
+    return index
+
+
+def narrow_range(first_range, second_range):
+    """Intersection of two byte ranges (None meaning no bound)
+
+    Parameters
+    ----------
+    first_range : tuple
+        (start, end) offsets
+    second_range : tuple
+        (start, end) offsets
+
+    Returns
+    -------
+    tuple
+        (start, end) offsets of the intersection
+    """
+    starts = [start for start, _ in (first_range, second_range) if start is not None]
+    ends = [end for _, end in (first_range, second_range) if end is not None]
+    return (max(starts) if starts else None, min(ends) if ends else None)
+
+
+def fingerprint(file_name):
+    """Identify a .pcap file by its global header and its first record header
+
+    Allows to notice that a file was replaced (rotated capture) since it was last read.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+
+    Returns
+    -------
+    str
+        hexadecimal form of the first 40 bytes of the file
+    """
+    with open(file_name, "rb") as f:
+        return f.read(GLOBAL_HEADER_LENGTH + RECORD_HEADER_LENGTH).hex()
+
+
+def scan_new_records(file_name, checkpoint=None):
+    """Find the records added to a .pcap file since a checkpoint
+
+    Only the record headers are read. An incomplete last record (file still being
+    written) is left for the next scan.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    checkpoint : dict, optional
+        "offset", "packets" and "fingerprint" of the file when it was last read, by
+        default None (read the whole file)
+
+    Returns
+    -------
+    dict
+        "start" and "end" offsets of the new records, and the "offset", "packets" and
+        "fingerprint" of the file once they are read
+    """
+    file_fingerprint = fingerprint(file_name)
+    start = GLOBAL_HEADER_LENGTH
+    n_records = 0
+    if (
+        checkpoint is not None
+        and checkpoint["fingerprint"] == file_fingerprint
+        and os.path.getsize(file_name) >= checkpoint["offset"]
+    ):
+        start = checkpoint["offset"]
+        n_records = checkpoint["packets"]
+    end = start
+    for _, _, end in iter_record_headers(file_name, start):
+        n_records += 1
+    return {
+        "start": start,
+        "end": end,
+        "offset": end,
+        "packets": n_records,
+        "fingerprint": file_fingerprint,
+    }
+
+
+def find_range(file_name, start_time=None, end_time=None, step=1000):
+    """Find the byte range of a .pcap file that contains a period of time
+
+    The packets are expected to be (mostly) in chronological order: the range starts
+    at the last indexed packet before `start_time` and stops at the first indexed
+    packet after `end_time`.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    start_time : float, optional
+        beginning of the period, by default the beginning of the capture
+    end_time : float, optional
+        end of the period, by default the end of the capture
+    step : int, optional
+        number of packets between two entries of the index, by default 1000
+
+    Returns
+    -------
+    int or None
+        offset of the first record to read (None for the beginning of the file)
+    int or None
+        offset where to stop reading (None for the end of the file)
+    """
+    if start_time is None and end_time is None:
+        return None, None
+    index = load_index(file_name, step)
+    offsets = index["offsets"]
+    timestamps = np.maximum.accumulate(index["timestamps"])
+    start = end = None
+    if start_time is not None:
+        i = np.searchsorted(timestamps, start_time, side="left") - 1
+        if i > 0:
+            start = int(offsets[i])
+    if end_time is not None:
+        j = np.searchsorted(timestamps, end_time, side="right")
+        if j < len(offsets):
+            end = int(offsets[j])
+    return start, end
+
+
+def read_period(
+    file_name, start_time=None, end_time=None, step=1000, byte_range=(None, None)
+):
+    """Read the records of a .pcap file captured during a period of time
+
+    Only the byte range given by the index (see find_range) is read.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap file
+    start_time : float, optional
+        beginning of the period, by default the beginning of the capture
+    end_time : float, optional
+        end of the period, by default the end of the capture
+    step : int, optional
+        number of packets between two entries of the index, by default 1000
+    byte_range : tuple, optional
+        (start, end) offsets the reading is limited to, by default the whole file
+
+    Yields
+    ------
+    float
+        timestamp of the packet
+    bytes
+        captured bytes of the packet
+    """
+    start, end = narrow_range(
+        find_range(file_name, start_time, end_time, step), byte_range
+    )
+    if start is not None and end is not None and start >= end:
+        return
+    for ts, buf in read_records(file_name, start, end):
+        if in_period(ts, start_time, end_time):
+            yield ts, buf
+
+
+def is_pcapng(file_name):
+    """Check if a capture file is a .pcapng file (whatever its extension)
+
+    Parameters
+    ----------
+    file_name : str
+        name of the capture file
+
+    Returns
+    -------
+    bool
+        True for a .pcapng file, False otherwise
+    """
+    with open(file_name, "rb") as f:
+        return f.read(4) == PCAPNG_MAGIC
+
+
+def read_capture_records(
+    file_name, start_time=None, end_time=None, step=1000, byte_range=(None, None)
+):
+    """Read the records of a .pcap or .pcapng file captured during a period of time
+
+    .pcap files use their index (see read_period). .pcapng files can not be indexed
+    and are read from the beginning.
+
+    Parameters
+    ----------
+    file_name : str
+        name of the .pcap or .pcapng file
+    start_time : float, optional
+        beginning of the period, by default the beginning of the capture
+    end_time : float, optional
+        end of the period, by default the end of the capture
+    step : int, optional
+        number of packets between two entries of the index, by default 1000
+    byte_range : tuple, optional
+        (start, end) offsets the reading is limited to (.pcap files only), by default
+        the whole file
+
+    Yields
+    ------
+    float
+        timestamp of the packet
+    bytes
+        captured bytes of the packet
+    """
+    if not is_pcapng(file_name):
+        yield from read_period(file_name, start_time, end_time, step, byte_range)
+        return
+    with open(file_name, "rb") as f:
+        for ts, buf in dpkt.pcapng.Reader(f):
+            if in_period(ts, start_time, end_time):
+                yield ts, buf
@@ -0,0 +1,357 @@
+"""
+Takes .pcap (or .pcapng) files and plots the graph of the network directly, without
+writing and reading back an intermediate .json file
+
+Usage:
+=====
+    python3 pcap_to_graph.py file_name [file_name ...] [-s save_file_name]
+                             [--workers N] [--chunk-size N] [--start DATE] [--end DATE]
+                             [--edge-width WIDTH] [--edge-color COLOR]
+                             [--networks file_name] [--layout {grid,force}]
+                             [--collections] [--cache-dir DIRECTORY] [--no-cache]
+                             [--follow] [--interval SECONDS]
+
+    file_name: name of the capture files (merged in chronological order)
+    -s, --save: name of the file where data are saved (see reload_image.py)
+    --workers, --chunk-size, --start, --end: see from_pcap_to_json.py (the packets are
+        also grouped in flows by --workers processes)
+    --edge-width, --edge-color: display of the edges
+    --networks: table of the CIDR blocks grouping the devices beyond the router (see
+        ip_networks.py), by default they are grouped by class
+    --layout, --collections: see main.py (display options, not part of the cache key)
+    --cache-dir: directory where the output of each stage is cached, by default cache/
+    --no-cache: do not read nor write the cache
+    --follow: follow a single .pcap file still being written and update the graph as
+        packets are added (see follow.py), the data are saved in -s when the figure
+        is closed
+    --interval: time between two reads of the file with --follow, by default 5 seconds
+
+The decoded packets and the graph are cached under a key made from the content of
+the capture files and the options they depend on: a rerun that only changes the
+display options skips decoding and graph building.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+from time import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from follow import check_followed_file, follow
+from from_pcap_to_json import parse_time, read_fields
+from ip_networks import NetworkTable
+import main
+from packet_columns import PacketColumns, PacketColumnsWriter
+
+np.seterr(divide="ignore", invalid="ignore")
+
+
+def file_hash(file_name):
+    """Hash the content of a file
+
+    Parameters
+    ----------
+    file_name : str
+        name of the file
+
+    Returns
+    -------
+    str
+        hexadecimal sha256 of the file
+    """
+    sha = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def cache_key(*parts):
+    """Build a cache key from the hashes of the input files and the stage options
+
+    Parameters
+    ----------
+    *parts : json serializable objects
+        everything the output of the stage depends on
+
+    Returns
+    -------
+    str
+        key of the stage
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def decode(file_names, workers, chunk_size, start_time, end_time):
+    """Decode the captures in memory
+
+    Returns
+    -------
+    PacketColumns
+        packets of the captures, in chronological order
+    """
+    print("Decoding packets...")
+    writer = PacketColumnsWriter()
+    for fields in read_fields(file_names, workers, chunk_size, start_time, end_time):
+        writer.append(fields)
+    return PacketColumns(writer.columns())
+
+
+def build_graph(packets, ethertypes_data, networks=None, workers=1, chunk_size=100000):
+    """Create the graph (finding the router) with main.GraphBuilder
+
+    Parameters
+    ----------
+    packets : PacketColumns
+        decoded packets
+    ethertypes_data : dict
+        ethertypes
+    networks : NetworkTable, optional
+        networks of the devices beyond the router, by default their classful
+        networks
+    workers : int, optional
+        number of processes grouping the packets in flows, by default 1
+    chunk_size : int, optional
+        number of packets grouped at once by each process, by default 100000
+
+    Returns
+    -------
+    dict
+        graph and everything needed to draw it
+    """
+    builder = main.GraphBuilder(ethertypes_data, networks)
+    main.feed_parallel(builder, packets, workers, chunk_size)
+    graph = builder.finalize()
+    return {
+        "graph": graph,
+        "list_nodes": builder.list_nodes,
+        "mac": builder.mac,
+        "ipv4": builder.ipv4,
+        "subnetworks": builder.subnetworks,
+        "mapping": builder.mapping,
+        "table": builder.table,
+    }
+
+
+class StageCache:
+    """Output of the stages of the pipeline saved on disk
+
+    Parameters
+    ----------
+    directory : str or None
+        directory of the cache, None to disable it
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, stage, key, extension):
+        """Name of the file where the output of a stage is cached"""
+        return os.path.join(self.directory, stage + "-" + key + extension)
+
+    def load_packets(self, key):
+        """Load decoded packets, None if they are not cached"""
+        if self.directory is None or not os.path.exists(
+            self.path("packets", key, ".npz")
+        ):
+            return None
+        return PacketColumns.load(self.path("packets", key, ".npz"))
+
+    def save_packets(self, key, packets):
+        """Cache decoded packets"""
+        if self.directory is not None:
+            np.savez(self.path("packets", key, ".npz"), **packets.columns)
+
+    def load_graph(self, key):
+        """Load a graph and its data, None if they are not cached"""
+        if self.directory is None or not os.path.exists(
+            self.path("graph", key, ".pckl")
+        ):
+            return None
+        with open(self.path("graph", key, ".pckl"), "rb") as file:
+            return pickle.load(file)
+
+    def save_graph(self, key, graph_data):
+        """Cache a graph and its data"""
+        if self.directory is not None:
+            with open(self.path("graph", key, ".pckl"), "wb") as file:
+                pickle.dump(graph_data, file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Plot the graph of the network from .pcap files"
+    )
+    parser.add_argument(
+        "file_names", nargs="+", help="names of the .pcap or .pcapng files"
+    )
+    parser.add_argument(
+        "-s", "--save", help="name of the file where data are saved (.fig.pckl)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes decoding the packets and grouping them in flows",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="number of packets decoded (and grouped) at once by each process",
+    )
+    parser.add_argument(
+        "--start", type=parse_time, help="only use the packets captured from this date"
+    )
+    parser.add_argument(
+        "--end", type=parse_time, help="only use the packets captured until this date"
+    )
+    parser.add_argument(
+        "--edge-width", type=float, default=0.6, help="width of the edges"
+    )
+    parser.add_argument("--edge-color", default="black", help="color of the edges")
+    parser.add_argument(
+        "--networks",
+        help="table of the CIDR blocks grouping the devices beyond the router",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=["grid", "force"],
+        default="grid",
+        help="place the subnetworks on a grid or with a force-directed layout",
+    )
+    parser.add_argument(
+        "--collections",
+        action="store_true",
+        help="draw the nodes and the edges as two collections (faster for large graphs)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="cache",
+        help="directory where the output of each stage is cached",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not read nor write the cache"
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="update the graph as packets are added to the .pcap file",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5,
+        help="time between two reads of the file with --follow (in seconds)",
+    )
+    args = parser.parse_args()
+
+    if args.follow:
+        if len(args.file_names) != 1:
+            parser.error("--follow needs a single capture file")
+        error = check_followed_file(args.file_names[0])
+        if error is not None:
+            parser.error(error)
+        if args.start is not None or args.end is not None or args.layout == "force":
+            parser.error(
+                "--follow can not be used with --start, --end or --layout force"
+            )
+        networks = (
+            NetworkTable()
+            if args.networks is None
+            else NetworkTable.load(args.networks)
+        )
+        follower = follow(
+            args.file_names[0],
+            main.load_json("numbers/ethertypes.json"),
+            networks,
+            args.interval,
+            args.collections,
+            args.edge_width,
+            args.edge_color,
+        )
+        if args.save is not None:
+            follower.save(args.save)
+        raise SystemExit
+
+    start = time()
+    cache = StageCache(None if args.no_cache else args.cache_dir)
+    ethertypes_data = main.load_json("numbers/ethertypes.json")
+    networks = (
+        NetworkTable() if args.networks is None else NetworkTable.load(args.networks)
+    )
+
+    if args.no_cache:
+        packets_key = graph_key = None
+    else:
+        print("Hashing captures...")
+        packets_key = cache_key(
+            [file_hash(file_name) for file_name in args.file_names],
+            args.file_names,
+            args.start,
+            args.end,
+        )
+        graph_key = cache_key(
+            packets_key,
+            ethertypes_data,
+            None if args.networks is None else file_hash(args.networks),
+        )
+
+    graph_data = cache.load_graph(graph_key)
+    if graph_data is None:
+        packets = cache.load_packets(packets_key)
+        if packets is None:
+            packets = decode(
+                args.file_names, args.workers, args.chunk_size, args.start, args.end
+            )
+            cache.save_packets(packets_key, packets)
+        else:
+            print("Packets loaded from the cache")
+        graph_data = build_graph(
+            packets, ethertypes_data, networks, args.workers, args.chunk_size
+        )
+        cache.save_graph(graph_key, graph_data)
+    else:
+        print("Graph loaded from the cache")
+
+    print("Adjusting layout...")
+    graph = graph_data["graph"]
+    node_color = main.set_colors(graph, graph_data["subnetworks"])
+    layout = main.set_layout(
+        graph_data["subnetworks"], graph=graph if args.layout == "force" else None
+    )
+    annotations = main.set_annotations(
+        graph_data["list_nodes"], graph_data["mac"], graph_data["ipv4"]
+    )
+    tables = main.change_table_type(graph_data["table"])
+    if args.save is not None:
+        main.save_data(
+            args.save,
+            node_color,
+            graph,
+            layout,
+            tables,
+            graph_data["mapping"],
+            annotations,
+            args.edge_width,
+            args.edge_color,
+        )
+    fig, ax = main.plot_graph(
+        node_color,
+        graph,
+        layout,
+        tables,
+        graph_data["mapping"],
+        annotations,
+        args.edge_width,
+        args.edge_color,
+        args.collections,
+    )
+    print("Done in", time() - start, "s")
+    plt.show()
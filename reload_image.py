@@ -3,26 +3,43 @@ Reloads data from main.py and plots them (allows to not recalculate data)
 
 Usage:
 =====
-    python3 reload_image.py file_name
+    python3 reload_image.py file_name [--collections]
 
     file_name: name of the file where data from main.py were saved
+    --collections: draw the nodes and the edges as two collections (faster for large
+    graphs)
+
+If main.py saved snapshots of the graph over time (--window), the right and left
+arrow keys step through them.
 """
 
+import argparse
+from collection_graph import CollectionGraph
 import pickle
 import matplotlib.pyplot as plt
-import sys
 from modified_netgraph import NewInteractiveGraph
+from snapshots import SnapshotStepper
 from zoom import ZoomPan
 import numpy as np
 
 np.seterr(divide="ignore", invalid="ignore")
 
-with open(sys.argv[1], "rb") as file:
+parser = argparse.ArgumentParser(description="Plot the graph saved by main.py")
+parser.add_argument("file_name", help="name of the file where data were saved")
+parser.add_argument(
+    "--collections",
+    action="store_true",
+    help="draw the nodes and the edges as two collections (faster for large graphs)",
+)
+args = parser.parse_args()
+
+with open(args.file_name, "rb") as file:
     data = pickle.load(file)
 
 fig, ax = plt.subplots()
 
-fig = NewInteractiveGraph(
+graph_class = CollectionGraph if args.collections else NewInteractiveGraph
+fig = graph_class(
     data["graph"],
     node_layout=data["layout"],
     node_color=data["node_color"],
@@ -33,6 +50,9 @@ fig = NewInteractiveGraph(
     annotations=data["annotations"],
 )
 
+if "snapshots" in data:
+    stepper = SnapshotStepper(fig, data["snapshots"])
+
 scale = 1.1
 zp = ZoomPan()
 figZoom = zp.zoom_factory(ax, base_scale=scale)
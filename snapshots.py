@@ -0,0 +1,308 @@
+"""
+Snapshots of the graph over sliding windows of time
+
+The capture is cut in periods of `step` seconds. The snapshot of a period is the graph
+of the flows seen during the last periods covering `window` seconds. Going from one
+snapshot to the next only adds the flows of the new period and drops the ones of the
+period leaving the window: each flow counts the periods of the window it was seen in,
+and each edge counts the active flows drawn with it, so an edge is shown as long as
+one of its flows is active.
+
+The snapshots are saved with the graph of the whole capture, as the edges added and
+removed since the previous snapshot, and reload_image.py steps through them with the
+arrow keys.
+"""
+
+from datetime import datetime
+import math
+
+import numpy as np
+
+from collection_graph import CollectionGraph
+from packet_columns import PacketColumns
+
+
+def packet_timestamp(ts):
+    """Timestamp of a packet from a .json or .ndjson file
+
+    Parameters
+    ----------
+    ts : str
+        "ts" of the packet (local date)
+
+    Returns
+    -------
+    float
+        timestamp
+    """
+    return datetime.fromisoformat(ts).timestamp()
+
+
+def split_periods(packets, step):
+    """Split packets in periods of time
+
+    The packets are expected in chronological order: a packet captured before the
+    one preceding it is counted in the period of that one.
+
+    Parameters
+    ----------
+    packets : iterable
+        data about the packets
+    step : float
+        length of the periods in seconds
+
+    Yields
+    ------
+    int
+        number of the period, the first one starting with the first packet
+    float
+        timestamp of the first packet
+    PacketColumns or list
+        packets of the period (periods without packets are skipped)
+    """
+    if isinstance(packets, PacketColumns):
+        if len(packets) == 0:
+            return
+        ts = packets["ts"]
+        periods = np.maximum.accumulate(((ts - ts[0]) // step).astype(np.int64))
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(periods)) + 1)).tolist()
+        for start, batch in zip(starts, packets.split(starts)):
+            yield int(periods[start]), float(ts[0]), batch
+        return
+    beginning = None
+    period = 0
+    batch = []
+    for packet in packets:
+        ts = packet_timestamp(packet["ts"])
+        if beginning is None:
+            beginning = ts
+        packet_period = int((ts - beginning) // step)
+        if packet_period > period:
+            yield period, beginning, batch
+            period = packet_period
+            batch = []
+        batch.append(packet)
+    if batch:
+        yield period, beginning, batch
+
+
+def edge_key(edge):
+    """Key of an edge of the (undirected) graph, whatever its direction"""
+    return tuple(sorted(edge))
+
+
+def sliding_diffs(period_flows, flow_edges, n_periods):
+    """Edges added and removed at each step of the window
+
+    Parameters
+    ----------
+    period_flows : list
+        flows drawn during each period
+    flow_edges : dict
+        flows linked to the edges they are drawn with
+    n_periods : int
+        number of periods in a window
+
+    Yields
+    ------
+    list
+        edges shown from this period (see edge_key)
+    list
+        edges hidden from this period
+    """
+    flow_count = {}
+    edge_count = {}
+    for period, flows in enumerate(period_flows):
+        # edges changed during the step, linked to whether they were shown before
+        changed = {}
+        if period >= n_periods:
+            for flow in period_flows[period - n_periods]:
+                flow_count[flow] -= 1
+                if flow_count[flow] > 0:
+                    continue
+                del flow_count[flow]
+                for edge in flow_edges[flow]:
+                    changed.setdefault(edge, True)
+                    edge_count[edge] -= 1
+                    if edge_count[edge] == 0:
+                        del edge_count[edge]
+        for flow in flows:
+            if flow not in flow_count:
+                flow_count[flow] = 0
+                for edge in flow_edges[flow]:
+                    changed.setdefault(edge, edge in edge_count)
+                    edge_count[edge] = edge_count.get(edge, 0) + 1
+            flow_count[flow] += 1
+        added = [
+            edge for edge, shown in changed.items() if not shown and edge in edge_count
+        ]
+        removed = [
+            edge for edge, shown in changed.items() if shown and edge not in edge_count
+        ]
+        yield added, removed
+
+
+def build_snapshots(builder, packets, window, step=None):
+    """Feed packets to a graph builder period by period and compute the snapshots
+
+    Parameters
+    ----------
+    builder : main.GraphBuilder
+        builder of the graph, finalized by the function
+    packets : iterable
+        data about the packets, in chronological order
+    window : float
+        length of the windows in seconds
+    step : float, optional
+        time between two snapshots in seconds, by default the length of the windows
+        (the windows do not overlap). The windows are rounded up to a whole number of
+        steps.
+
+    Returns
+    -------
+    list of dicts
+        beginning and end of each window ("start" and "end", formatted like the "ts"
+        of the packets) with the edges added and removed since the previous one
+        ("added" and "removed", see edge_key)
+    """
+    if step is None:
+        step = window
+    n_periods = max(1, math.ceil(window / step))
+    beginning = None
+    period_flows = []
+    for period, beginning, batch in split_periods(packets, step):
+        # periods without packets have no flow
+        period_flows += [[] for _ in range(period - len(period_flows))]
+        period_flows.append(list(builder.feed(batch)))
+    builder.finalize()
+
+    flow_edges = {
+        flow: [edge_key(edge) for edge in edges]
+        for flow, edges in builder.flow_edges.items()
+    }
+    snapshots = []
+    for period, (added, removed) in enumerate(
+        sliding_diffs(period_flows, flow_edges, n_periods)
+    ):
+        start = beginning + max(0, period - n_periods + 1) * step
+        end = beginning + (period + 1) * step
+        snapshots.append(
+            {
+                "start": str(datetime.fromtimestamp(start)),
+                "end": str(datetime.fromtimestamp(end)),
+                "added": added,
+                "removed": removed,
+            }
+        )
+    return snapshots
+
+
+class SnapshotStepper:
+    """Steps through the snapshots of a plotted graph with the arrow keys
+
+    The right arrow goes to the next snapshot, the left arrow to the previous one (or
+    back to the whole capture from the first one). Only the nodes and edges of the
+    snapshot are shown, the edges that appeared with it in red.
+
+    Parameters
+    ----------
+    plotted_graph : modified_netgraph.NewInteractiveGraph or CollectionGraph
+        plotted graph of the whole capture
+    snapshots : list of dicts
+        snapshots of the graph (see build_snapshots)
+    """
+
+    def __init__(self, plotted_graph, snapshots):
+        self.plotted_graph = plotted_graph
+        self.snapshots = snapshots
+        # the collections are changed through the rows of their arrays
+        self.collections = isinstance(plotted_graph, CollectionGraph)
+        if not self.collections:
+            self.edge_artists = {
+                edge_key(edge): artist
+                for edge, artist in plotted_graph.edge_artists.items()
+            }
+            self.base_colors = {
+                artist: artist.get_facecolor() for artist in self.edge_artists.values()
+            }
+        # -1 for the whole capture
+        self.position = -1
+        self.node_degrees = {}
+        self.new_edges = []
+        plotted_graph.fig.canvas.mpl_connect("key_press_event", self.on_key)
+
+    def on_key(self, event):
+        if event.key == "right" and self.position < len(self.snapshots) - 1:
+            self.go_to(self.position + 1)
+        elif event.key == "left" and self.position >= 0:
+            self.go_to(self.position - 1)
+
+    def go_to(self, position):
+        """Show a snapshot (-1 for the whole capture)"""
+        if self.position == -1:
+            # the snapshots are rebuilt from the first one
+            self._show_all(False)
+        if position == self.position + 1:
+            snapshot = self.snapshots[position]
+            hidden, shown = snapshot["removed"], snapshot["added"]
+        else:
+            snapshot = self.snapshots[self.position]
+            hidden, shown = snapshot["added"], snapshot["removed"]
+        for edge in hidden:
+            self._set_edge(edge, False)
+        for edge in shown:
+            self._set_edge(edge, True)
+        self._set_new_edges(False)
+        self.new_edges = []
+        self.position = position
+        ax = self.plotted_graph.ax
+        if position == -1:
+            self._show_all(True)
+            ax.set_title("")
+        else:
+            snapshot = self.snapshots[position]
+            self.new_edges = snapshot["added"]
+            self._set_new_edges(True)
+            ax.set_title(
+                "%s - %s (%d/%d)"
+                % (
+                    snapshot["start"],
+                    snapshot["end"],
+                    position + 1,
+                    len(self.snapshots),
+                )
+            )
+        if self.collections:
+            self.plotted_graph.update_colors()
+        self.plotted_graph.fig.canvas.draw_idle()
+
+    def _set_edge(self, edge, shown):
+        if self.collections:
+            self.plotted_graph.set_edges_visible([edge], shown)
+        else:
+            self.edge_artists[edge].set_visible(shown)
+        for node in set(edge):
+            degree = self.node_degrees.get(node, 0) + (1 if shown else -1)
+            self.node_degrees[node] = degree
+            if self.collections:
+                self.plotted_graph.set_nodes_visible([node], degree > 0)
+            else:
+                self.plotted_graph.node_artists[node].set_visible(degree > 0)
+
+    def _set_new_edges(self, red):
+        """Draw the edges of the snapshot that appeared with it in red, or not"""
+        if self.collections:
+            self.plotted_graph.set_edges_color(self.new_edges, "red" if red else None)
+            return
+        for edge in self.new_edges:
+            artist = self.edge_artists[edge]
+            artist.set_facecolor("red" if red else self.base_colors[artist])
+
+    def _show_all(self, shown):
+        if self.collections:
+            self.plotted_graph.show_all(shown)
+            return
+        for artist in self.edge_artists.values():
+            artist.set_visible(shown)
+        for artist in self.plotted_graph.node_artists.values():
+            artist.set_visible(shown)
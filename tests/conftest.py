@@ -0,0 +1,12 @@
+"""
+The tests import the scripts of the repository as modules and draw without a
+display
+"""
+
+import os
+import sys
+
+import matplotlib
+
+matplotlib.use("Agg")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
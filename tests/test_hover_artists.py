@@ -0,0 +1,154 @@
+"""
+Hovering and clicking must not add artists to the figure: the annotation is a single
+text and the tables are drawn once per node. The nodes hidden by the snapshots can not
+be hovered or clicked.
+"""
+
+import random
+
+from matplotlib.backend_bases import MouseEvent
+import matplotlib.pyplot as plt
+import networkx as nx
+import pandas as pd
+import pytest
+
+from collection_graph import CollectionGraph
+from modified_netgraph import NewInteractiveGraph
+
+N_EVENTS = 3000
+
+
+def make_graph_data():
+    """Small graph with an annotation and a table for every node, and a mapping"""
+    graph = nx.Graph()
+    graph.add_edges_from([(0, i) for i in range(1, 8)] + [(1, 2), (3, 4)])
+    layout = {node: ((node % 4) / 3, (node // 4) / 3) for node in graph}
+    annotations = {node: "node %d" % node for node in graph}
+    tables = {
+        node: pd.DataFrame(
+            [[port, node, 10 * port] for port in range(node + 1)],
+            columns=["port", "device", "bytes"],
+        )
+        for node in graph
+    }
+    mapping = {node: [node] + list(graph.edges(node)) for node in graph}
+    return graph, layout, annotations, tables, mapping
+
+
+def draw(graph_class):
+    graph, layout, annotations, tables, mapping = make_graph_data()
+    fig, ax = plt.subplots()
+    plotted_graph = graph_class(
+        graph,
+        node_layout=layout,
+        annotations=annotations,
+        tables=tables,
+        mapping=mapping,
+        ax=ax,
+    )
+    fig.canvas.draw()
+    points = [layout[node] for node in graph]
+    # middle of the edges, and empty space
+    points += [
+        ((layout[u][0] + layout[v][0]) / 2, (layout[u][1] + layout[v][1]) / 2)
+        for u, v in graph.edges
+    ]
+    points += [(0.5, 0.9), (0.2, 0.55)]
+    return fig, ax, plotted_graph, [ax.transData.transform(point) for point in points]
+
+
+def get_overlay(plotted_graph):
+    if isinstance(plotted_graph, NewInteractiveGraph):
+        return plotted_graph._get_overlay()
+    return plotted_graph.overlay
+
+
+def artist_counts(ax, plotted_graph):
+    return (
+        len(ax.get_children()),
+        len(ax.texts),
+        len(ax.tables),
+        len(get_overlay(plotted_graph).artists),
+    )
+
+
+def send(fig, name, x, y):
+    fig.canvas.callbacks.process(name, MouseEvent(name, fig.canvas, x, y, button=1))
+
+
+@pytest.mark.parametrize("graph_class", [NewInteractiveGraph, CollectionGraph])
+def test_artist_count_stays_constant(graph_class):
+    fig, ax, plotted_graph, points = draw(graph_class)
+    # the tables are built the first time their node is hovered
+    for x, y in points:
+        send(fig, "motion_notify_event", x, y)
+    counts = artist_counts(ax, plotted_graph)
+
+    rng = random.Random(0)
+    for i in range(N_EVENTS):
+        x, y = rng.choice(points)
+        send(fig, "motion_notify_event", x, y)
+        if i % 100 == 0:
+            send(fig, "button_press_event", x, y)
+            send(fig, "button_release_event", x, y)
+        assert artist_counts(ax, plotted_graph) == counts
+    plt.close(fig)
+
+
+@pytest.mark.parametrize("graph_class", [NewInteractiveGraph, CollectionGraph])
+def test_nothing_redone_on_the_same_node(graph_class):
+    fig, ax, plotted_graph, points = draw(graph_class)
+    x, y = points[1]
+    send(fig, "motion_notify_event", x, y)
+    overlay = get_overlay(plotted_graph)
+    updates = []
+    overlay.update = lambda: updates.append(True)
+    for _ in range(100):
+        send(fig, "motion_notify_event", x + 0.5, y)
+        send(fig, "motion_notify_event", x, y)
+    assert updates == []
+    plt.close(fig)
+
+
+def hide_node(plotted_graph, node):
+    """Hide a node and its edges like snapshots.SnapshotStepper"""
+    edges = [edge for edge in plotted_graph.edges if node in edge]
+    if isinstance(plotted_graph, NewInteractiveGraph):
+        plotted_graph.node_artists[node].set_visible(False)
+        for edge in edges:
+            plotted_graph.edge_artists[edge].set_visible(False)
+    else:
+        plotted_graph.set_nodes_visible([node], False)
+        plotted_graph.set_edges_visible(edges, False)
+        plotted_graph.update_colors()
+
+
+def emphasized(plotted_graph):
+    if isinstance(plotted_graph, NewInteractiveGraph):
+        return plotted_graph.mapping
+    return plotted_graph.emphasized
+
+
+@pytest.mark.parametrize("graph_class", [NewInteractiveGraph, CollectionGraph])
+def test_hidden_node_is_not_hovered_or_clicked(graph_class):
+    fig, ax, plotted_graph, points = draw(graph_class)
+    x, y = points[5]
+    send(fig, "motion_notify_event", x, y)
+    assert plotted_graph.annotation.get_visible()
+    assert plotted_graph.table is not None
+    send(fig, "button_press_event", x, y)
+    send(fig, "button_release_event", x, y)
+    assert emphasized(plotted_graph) is not None
+    send(fig, "button_press_event", x, y)
+    send(fig, "button_release_event", x, y)
+    assert emphasized(plotted_graph) is None
+
+    hide_node(plotted_graph, 5)
+    send(fig, "motion_notify_event", *points[-1])
+    send(fig, "motion_notify_event", x, y)
+    assert not plotted_graph.annotation.get_visible()
+    assert plotted_graph.table is None
+    send(fig, "button_press_event", x, y)
+    send(fig, "button_release_event", x, y)
+    assert emphasized(plotted_graph) is None
+    plt.close(fig)